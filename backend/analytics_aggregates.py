@@ -0,0 +1,284 @@
+"""
+Incremental analytics aggregates
+Mergeable running statistics behind the network, location and call drop analysis tables
+"""
+
+import argparse
+import csv
+import json
+import os
+import threading
+from typing import Dict, Iterable, List, Mapping, Optional
+
+ANALYTICS_SCHEMA_VERSION = 1
+
+# Grouping fields of each analysis table
+VIEWS = {
+    'network': ('network_type',),
+    'location': ('inout_travelling', 'operator'),
+    'calldrop': ('calldrop_category',),
+}
+
+# Groups kept in the aggregates but left out of a view's table, as the offline
+# analysis reported only known network types
+HIDDEN_GROUPS = {
+    'network': {('Unknown',)},
+}
+
+# File each view used to be exported to by the offline analysis
+VIEW_FILES = {
+    'network': 'network_performance_analysis.csv',
+    'location': 'location_performance_analysis.csv',
+    'calldrop': 'calldrop_impact_analysis.csv',
+}
+
+
+class RunningStats:
+    """Count, mean and sum of squared deviations of ratings (Welford), plus drop count
+
+    Two instances merge exactly (Chan et al.), so statistics computed per
+    source or per batch combine into the same numbers a full groupby gives.
+    """
+
+    __slots__ = ('count', 'mean', 'm2', 'drops', 'operators')
+
+    def __init__(self, count: int = 0, mean: float = 0.0, m2: float = 0.0, drops: int = 0,
+                 operators: Iterable[str] = ()):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+        self.drops = drops
+        self.operators = set(operators)
+
+    def add(self, rating: float, dropped: bool, operator: str):
+        self.count += 1
+        delta = rating - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (rating - self.mean)
+        self.drops += int(dropped)
+        self.operators.add(operator)
+
+    def merge(self, other: 'RunningStats'):
+        if not other.count:
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        self.drops += other.drops
+        self.operators |= other.operators
+
+    def copy(self) -> 'RunningStats':
+        return RunningStats(self.count, self.mean, self.m2, self.drops, self.operators)
+
+    @property
+    def std(self) -> float:
+        """Sample standard deviation, as pandas reports it"""
+        return (self.m2 / (self.count - 1)) ** 0.5 if self.count > 1 else float('nan')
+
+    def to_list(self) -> list:
+        return [self.count, self.mean, self.m2, self.drops, sorted(self.operators)]
+
+
+def read_rated_rows(file) -> List[dict]:
+    """Rows with a numeric rating and every grouping field, from a cleaned MyCall CSV stream"""
+    fields = {field for view in VIEWS.values() for field in view}
+    rows = []
+    for row in csv.DictReader(file):
+        try:
+            rating = float(row['rating'])
+        except (KeyError, TypeError, ValueError):
+            continue
+        if all(row.get(field) for field in fields):
+            rows.append({**{field: row[field] for field in fields}, 'rating': rating})
+    return rows
+
+
+def _merge_groups(target: Dict[tuple, RunningStats], groups: Mapping[tuple, RunningStats]):
+    for key, stats in groups.items():
+        if key in target:
+            target[key].merge(stats)
+        else:
+            target[key] = stats.copy()
+
+
+class AnalyticsAggregates:
+    """Per-source running statistics for every view, and their merged totals
+
+    Each source (usually one monthly file) keeps its own partial aggregates.
+    Appending rows costs O(new rows); replacing a source re-merges the few
+    partial groups instead of rereading any data. Totals are rebuilt off to
+    the side and swapped in, so readers never see a half-applied update.
+    """
+
+    def __init__(self, sources: Optional[Dict[str, Dict[str, Dict[tuple, RunningStats]]]] = None):
+        self.sources = sources or {}
+        self._lock = threading.Lock()
+        self.totals = self._merged(self.sources)
+
+    @staticmethod
+    def _merged(sources) -> Dict[str, Dict[tuple, RunningStats]]:
+        totals = {view: {} for view in VIEWS}
+        for partial in sources.values():
+            for view in VIEWS:
+                _merge_groups(totals[view], partial.get(view, {}))
+        return totals
+
+    @property
+    def records(self) -> int:
+        return sum(stats.count for stats in self.totals['calldrop'].values())
+
+    @staticmethod
+    def partial_from_records(records: Iterable[Mapping]) -> Dict[str, Dict[tuple, RunningStats]]:
+        """Aggregate rated rows with one Welford update per row and view"""
+        partial = {view: {} for view in VIEWS}
+        for record in records:
+            rating = record.get('rating')
+            if rating is None:
+                continue
+            dropped = record['calldrop_category'] == 'Call Dropped'
+            for view, fields in VIEWS.items():
+                key = tuple(str(record[field]) for field in fields)
+                stats = partial[view].get(key)
+                if stats is None:
+                    stats = partial[view][key] = RunningStats()
+                stats.add(float(rating), dropped, str(record['operator']))
+        return partial
+
+    @staticmethod
+    def partial_from_frame(frame) -> Dict[str, Dict[tuple, RunningStats]]:
+        """Aggregate a DataFrame of rated rows with one groupby per view"""
+        rated = frame[frame['rating'].notna()]
+        work = rated[['operator']].assign(
+            rating=rated['rating'].astype(float),
+            dropped=(rated['calldrop_category'] == 'Call Dropped').astype(int),
+        )
+        partial = {}
+        for view, fields in VIEWS.items():
+            keys = [rated[field].astype(str) for field in fields]
+            grouped = work.groupby(keys, observed=True, sort=False)
+            ratings = grouped['rating'].agg(['count', 'mean', 'var'])
+            drops = grouped['dropped'].sum()
+            operators = grouped['operator'].unique()
+            partial[view] = {
+                (key if isinstance(key, tuple) else (key,)): RunningStats(
+                    int(row['count']), float(row['mean']),
+                    float(row['var']) * (row['count'] - 1) if row['count'] > 1 else 0.0,
+                    int(drops[key]), (str(op) for op in operators[key]))
+                for key, row in ratings.iterrows()
+            }
+        return partial
+
+    def add(self, source: str, partial: Dict[str, Dict[tuple, RunningStats]], replace: bool = False):
+        """Merge a partial into ``source``; ``replace`` discards what the source held before"""
+        with self._lock:
+            sources = dict(self.sources)
+            replaced = replace and source in sources
+            if source in sources and not replace:
+                combined = {view: {key: stats.copy() for key, stats in sources[source][view].items()}
+                            for view in VIEWS}
+                for view in VIEWS:
+                    _merge_groups(combined[view], partial[view])
+                sources[source] = combined
+            else:
+                sources[source] = partial
+
+            if replaced:
+                # The source's old share has to leave the totals, so re-merge the partials
+                totals = self._merged(sources)
+            else:
+                totals = {view: {key: stats.copy() for key, stats in self.totals[view].items()}
+                          for view in VIEWS}
+                for view in VIEWS:
+                    _merge_groups(totals[view], partial[view])
+            self.sources = sources
+            self.totals = totals
+
+    def add_records(self, source: str, records: Iterable[Mapping], replace: bool = False):
+        self.add(source, self.partial_from_records(records), replace)
+
+    def add_frame(self, source: str, frame, replace: bool = False):
+        self.add(source, self.partial_from_frame(frame), replace)
+
+    def remove(self, source: str):
+        with self._lock:
+            sources = {name: partial for name, partial in self.sources.items() if name != source}
+            self.totals = self._merged(sources)
+            self.sources = sources
+
+    def table(self, view: str) -> List[dict]:
+        """Rows of an analysis table, laid out like its offline CSV export"""
+        fields = VIEWS[view]
+        groups = self.totals[view]
+        total = sum(stats.count for stats in groups.values())
+        hidden = HIDDEN_GROUPS.get(view, set())
+        rows = []
+        for key in sorted(set(groups) - hidden):
+            stats = groups[key]
+            row = dict(zip(fields, key))
+            row['Records'] = stats.count
+            if view == 'location':
+                row['Avg_Rating'] = round(stats.mean, 2)
+            else:
+                row['Avg_Rating'] = round(stats.mean, 3)
+                row['Rating_Std'] = round(stats.std, 3) if stats.count > 1 else None
+            if view == 'calldrop':
+                row['Operators'] = len(stats.operators)
+                row['Percentage'] = round(100 * stats.count / total, 1)
+            else:
+                row['Call_Drops'] = stats.drops
+                row['Call_Drop_Rate'] = round(100 * stats.drops / stats.count, 1)
+            rows.append(row)
+        return rows
+
+    def write_csv(self, view: str, path: str):
+        rows = self.table(view)
+        with open(path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0]) if rows else list(VIEWS[view]))
+            writer.writeheader()
+            writer.writerows(rows)
+
+    def save(self, path: str):
+        state = {
+            'schema_version': ANALYTICS_SCHEMA_VERSION,
+            'sources': {
+                source: {view: [list(key) + stats.to_list() for key, stats in groups.items()]
+                         for view, groups in partial.items()}
+                for source, partial in self.sources.items()
+            },
+        }
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> 'AnalyticsAggregates':
+        with open(path) as f:
+            state = json.load(f)
+        if state.get('schema_version') != ANALYTICS_SCHEMA_VERSION:
+            raise ValueError(f"Unsupported analytics schema version: {state.get('schema_version')}")
+        sources = {}
+        for source, partial in state['sources'].items():
+            sources[source] = {}
+            for view, fields in VIEWS.items():
+                n_keys = len(fields)
+                sources[source][view] = {tuple(row[:n_keys]): RunningStats(*row[n_keys:])
+                                         for row in partial.get(view, [])}
+        return cls(sources)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the analysis tables from the ingest store's aggregates")
+    parser.add_argument('--store', default='mycall_store', help="Ingest store directory")
+    parser.add_argument('--out-dir', default='../data', help="Where to write the analysis CSVs")
+    args = parser.parse_args()
+
+    from ingest import IngestStore
+
+    aggregates = IngestStore(args.store).analytics
+    for view, name in VIEW_FILES.items():
+        aggregates.write_csv(view, os.path.join(args.out_dir, name))
+        print(f"✅ {name}: {len(aggregates.totals[view])} groups")
+    print(f"📊 {aggregates.records:,} rated calls across {len(aggregates.sources)} sources")
@@ -0,0 +1,172 @@
+"""
+Micro-batching scheduler for single-row predictions
+Collects concurrent requests for a short window and scores them with one vectorized call
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+# Histogram bucket upper bounds
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+WAIT_MS_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 25.0, 50.0, 100.0)
+
+
+class SchedulerOverloaded(Exception):
+    """Raised when the request queue is full"""
+
+
+class Histogram:
+    """Cumulative-bucket histogram with count, sum and max"""
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def to_dict(self) -> dict:
+        labels = [str(bound) for bound in self.buckets] + ['+Inf']
+        return {
+            'count': self.count,
+            'mean': round(self.total / self.count, 4) if self.count else 0.0,
+            'max': round(self.max, 4),
+            'buckets': dict(zip(labels, self.counts)),
+        }
+
+
+def _fail(entries: list, error: Exception):
+    """Resolve the futures of (item, future, enqueued) entries with error"""
+    for _, future, _ in entries:
+        if not future.done():
+            future.set_exception(error)
+
+
+class MicroBatchScheduler:
+    """Queue single-row predictions and score them in batches
+
+    A worker waits for the first queued item, then keeps collecting until
+    ``max_batch_size`` items or ``max_wait_ms`` have passed, and awaits
+    ``predict_batch`` on the whole batch, which should run the model off the
+    event loop. The queue is bounded; ``submit`` raises SchedulerOverloaded
+    instead of growing it.
+    """
+
+    def __init__(self, predict_batch: Callable[[List[Any]], Awaitable[Sequence[Any]]],
+                 max_batch_size: int = 256, max_wait_ms: float = 2.0,
+                 max_queue_size: int = 4096, workers: int = 1):
+        self.predict_batch = predict_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_queue_size = max_queue_size
+        self.workers = workers
+        self.batch_sizes = Histogram(BATCH_SIZE_BUCKETS)
+        self.queue_wait_ms = Histogram(WAIT_MS_BUCKETS)
+        self.rejected = 0
+        self.failed_batches = 0
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self):
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        # Workers fail the batch they are collecting or scoring as they are cancelled
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+        # Fail anything still queued rather than leaving callers waiting
+        queued = []
+        while self._queue is not None and not self._queue.empty():
+            queued.append(self._queue.get_nowait())
+        _fail(queued, SchedulerOverloaded("Scheduler stopped"))
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def submit(self, item: Any) -> Any:
+        """Queue one item and wait for its entry of the predict_batch result"""
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((item, future, time.perf_counter()))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise SchedulerOverloaded("Prediction queue is full")
+        return await future
+
+    async def _collect(self, batch: list):
+        """Fill batch in place, so a cancelled worker still knows which items it took"""
+        loop = asyncio.get_running_loop()
+        batch.append(await self._queue.get())
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+    async def _worker(self):
+        batch: list = []
+        try:
+            while True:
+                batch = []
+                await self._collect(batch)
+                started = time.perf_counter()
+                for _, _, enqueued in batch:
+                    self.queue_wait_ms.observe((started - enqueued) * 1000.0)
+                self.batch_sizes.observe(len(batch))
+
+                try:
+                    predictions = await self.predict_batch([item for item, _, _ in batch])
+                except Exception as e:
+                    self.failed_batches += 1
+                    logger.error(f"Micro-batch of {len(batch)} failed: {str(e)}")
+                    _fail(batch, e)
+                    continue
+
+                for (_, future, _), prediction in zip(batch, predictions):
+                    # The caller may have gone away (client disconnect cancels the future)
+                    if not future.done():
+                        future.set_result(prediction)
+        except asyncio.CancelledError:
+            # Stopped while collecting or scoring: those callers would otherwise wait forever
+            _fail(batch, SchedulerOverloaded("Scheduler stopped"))
+            raise
+
+    def stats(self) -> dict:
+        return {
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000.0,
+            'queue_depth': self.queue_depth,
+            'max_queue_size': self.max_queue_size,
+            'rejected': self.rejected,
+            'failed_batches': self.failed_batches,
+            'batch_size': self.batch_sizes.to_dict(),
+            'queue_wait_ms': self.queue_wait_ms.to_dict(),
+        }
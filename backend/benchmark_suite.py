@@ -0,0 +1,291 @@
+"""
+Benchmark and load-test suite for the prediction service
+Microbenchmarks of the serving hot path, an in-process ASGI load generator and a stored baseline
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+BASELINE_PATH = 'benchmark_baseline.json'
+DEFAULT_BATCH_SIZES = (1, 10, 100, 1000, 10000)
+
+# A result this much worse than its baseline fails the run
+DEFAULT_THRESHOLD = 0.25
+
+
+def measure(fn: Callable[[], object], min_time: float = 0.05, repeat: int = 5) -> float:
+    """Median seconds per call of fn, each repeat looping long enough to time reliably"""
+    number = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time:
+            break
+        number *= 2 if elapsed <= 0 else max(2, int(min_time / elapsed) + 1)
+
+    runs = [elapsed / number]
+    for _ in range(repeat - 1):
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        runs.append((time.perf_counter() - started) / number)
+    return statistics.median(runs)
+
+
+def percentile(values: List[float], q: float) -> float:
+    return float(np.percentile(values, q)) if values else 0.0
+
+
+def result(value: float, unit: str, higher_is_better: bool = False) -> dict:
+    return {'value': round(value, 6), 'unit': unit, 'higher_is_better': higher_is_better}
+
+
+def request_pool(records: List[dict], size: int, seed: int = 42) -> List[dict]:
+    """Request bodies drawn from the validation rows, coordinates jittered so the cache misses"""
+    rng = np.random.default_rng(seed)
+    picks = rng.integers(0, len(records), size=size)
+    jitter = rng.uniform(-0.05, 0.05, size=(size, 2))
+    pool = []
+    for i, (dlat, dlon) in zip(picks, jitter):
+        record = {key: value for key, value in records[i].items() if key != 'rating'}
+        record['latitude'] = round(record['latitude'] + dlat, 6)
+        record['longitude'] = round(record['longitude'] + dlon, 6)
+        pool.append(record)
+    return pool
+
+
+def micro_benchmarks(api, requests: List[dict], batch_sizes) -> Dict[str, dict]:
+    """Feature encoding, model scoring per batch size and response serialization"""
+    serving = api.get_serving_model()
+    encoder = serving.encoder
+    results = {}
+
+    fields = ('operator', 'network_type', 'inout_travelling', 'calldrop_category',
+              'latitude', 'longitude', 'state_name', 'month')
+    one = [requests[0][field] for field in fields]
+    results['encode_one'] = result(measure(lambda: encoder.encode_one(*one)) * 1e6, 'us')
+
+    for size in batch_sizes:
+        batch = (requests * (size // len(requests) + 1))[:size]
+        X = encoder.encode_many(batch)
+        results[f'encode_many_{size}'] = result(measure(lambda: encoder.encode_many(batch)) * 1e6 / size,
+                                                'us/row')
+        results[f'predict_matrix_{size}'] = result(measure(lambda: serving.predict_matrix(X)) * 1e6 / size,
+                                                   'us/row')
+        if serving.tree_engine is not None and hasattr(serving.model, 'predict'):
+            # The sklearn model the tree engine replaced, for comparison
+            results[f'model_predict_{size}'] = result(measure(lambda: serving.model.predict(X)) * 1e6 / size,
+                                                      'us/row')
+        results[f'predict_with_interval_{size}'] = result(
+            measure(lambda: serving.predict_with_interval(batch)) * 1e6 / size, 'us/row')
+
+    request = api.PredictionRequest(**requests[0])
+    content = {
+        "predicted_rating": 3.42, "confidence_interval": "±0.40 rating points",
+        "interval_low": 3.02, "interval_high": 3.82,
+        "input_summary": {"operator": request.operator, "network": request.network_type,
+                          "location": request.inout_travelling, "quality": request.calldrop_category,
+                          "state": request.state_name,
+                          "coordinates": f"({request.latitude}, {request.longitude})"},
+        "model_info": {**serving.response_info, "prediction_confidence": "High"},
+        "timestamp": "2023-03-01T12:00:00"
+    }
+    results['request_validate'] = result(
+        measure(lambda: api.PredictionRequest.model_validate(requests[0])) * 1e6, 'us')
+    # The /predict path, and the pydantic validate-and-dump it replaced
+    results['response_serialize'] = result(measure(lambda: api.FastJSONResponse(content)) * 1e6, 'us')
+    results['response_validate_serialize'] = result(
+        measure(lambda: api.PredictionResponse(**content).model_dump_json()) * 1e6, 'us')
+    return results
+
+
+async def asgi_request(app, method: str, path: str, body: bytes = b'',
+                       query: bytes = b'') -> tuple:
+    """Send one HTTP request straight into an ASGI app; returns (status, body)"""
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+        'method': method, 'scheme': 'http', 'path': path, 'raw_path': path.encode(),
+        'root_path': '', 'query_string': query,
+        'headers': [(b'host', b'benchmark'), (b'content-type', b'application/json'),
+                    (b'content-length', str(len(body)).encode())],
+        'client': ('127.0.0.1', 0), 'server': ('benchmark', 80),
+    }
+    sent = False
+    status = 0
+    chunks = []
+
+    async def receive():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {'type': 'http.request', 'body': body, 'more_body': False}
+        # The request is complete; park until the app is done
+        await asyncio.sleep(3600)
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        nonlocal status
+        if message['type'] == 'http.response.start':
+            status = message['status']
+        elif message['type'] == 'http.response.body':
+            chunks.append(message.get('body', b''))
+
+    await app(scope, receive, send)
+    return status, b''.join(chunks)
+
+
+async def run_load(app, bodies: List[bytes], concurrency: int, total: int, path: str) -> Dict[str, dict]:
+    """Drive ``total`` requests through the ASGI app from ``concurrency`` clients"""
+    latencies: List[float] = []
+    errors = 0
+    next_index = 0
+
+    async def client():
+        nonlocal errors, next_index
+        while next_index < total:
+            body = bodies[next_index % len(bodies)]
+            next_index += 1
+            started = time.perf_counter()
+            status, _ = await asgi_request(app, 'POST', path, body)
+            latencies.append(time.perf_counter() - started)
+            if status != 200:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    wall = time.perf_counter() - started
+
+    label = f'load_c{concurrency}'
+    return {
+        f'{label}_throughput': result(len(latencies) / wall, 'req/s', higher_is_better=True),
+        f'{label}_p50': result(percentile(latencies, 50) * 1000, 'ms'),
+        f'{label}_p95': result(percentile(latencies, 95) * 1000, 'ms'),
+        f'{label}_p99': result(percentile(latencies, 99) * 1000, 'ms'),
+        f'{label}_error_rate': result(errors / max(len(latencies), 1), 'ratio'),
+    }
+
+
+async def load_tests(api, requests: List[dict], concurrencies, total: int,
+                     path: str = '/predict') -> Dict[str, dict]:
+    """One load-test run per concurrency level, inside a single app lifespan"""
+    bodies = [json.dumps(request).encode() for request in requests]
+    results = {}
+    # Run the app's lifespan so the micro-batch scheduler is up, as under uvicorn
+    async with api.lifespan(api.app):
+        for concurrency in concurrencies:
+            # Every level starts cold, so none is scored from an earlier level's cache entries
+            if api.cache is not None:
+                api.cache.clear()
+            results.update(await run_load(api.app, bodies, concurrency, total, path))
+    return results
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], threshold: float) -> List[str]:
+    """Names of results worse than their baseline by more than threshold"""
+    regressions = []
+    for name, current in results.items():
+        base = baseline.get(name)
+        if base is None or not base['value']:
+            continue
+        change = current['value'] / base['value'] - 1
+        worse = -change if current['higher_is_better'] else change
+        if current['unit'] == 'ratio':
+            # Error rates: any new errors count, relative change is meaningless near zero
+            worse = current['value'] - base['value']
+        if worse > threshold:
+            regressions.append(name)
+    return regressions
+
+
+def print_results(results: Dict[str, dict], baseline: Optional[Dict[str, dict]]):
+    print("📊 BENCHMARK RESULTS:")
+    print(f"   {'benchmark':32s} {'value':>12s}  {'unit':7s} {'baseline':>12s} {'change':>8s}")
+    for name, current in results.items():
+        base = (baseline or {}).get(name)
+        if base and base['value']:
+            change = f"{(current['value'] / base['value'] - 1) * 100:+.1f}%"
+            base_value = f"{base['value']:.3f}"
+        else:
+            change = base_value = '-'
+        print(f"   {name:32s} {current['value']:12.3f}  {current['unit']:7s} {base_value:>12s} {change:>8s}")
+
+
+def load_baseline(path: str) -> Optional[Dict[str, dict]]:
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)['results']
+
+
+def save_baseline(path: str, results: Dict[str, dict]):
+    with open(path, 'w') as f:
+        json.dump({
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'machine': {'python': platform.python_version(), 'processor': platform.processor(),
+                        'cpus': os.cpu_count()},
+            'results': results,
+        }, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the prediction service and check for regressions")
+    parser.add_argument('suite', nargs='?', default='all', choices=['micro', 'load', 'all'])
+    parser.add_argument('--batch-sizes', default=','.join(map(str, DEFAULT_BATCH_SIZES)),
+                        help="Comma separated batch sizes for the model benchmarks")
+    parser.add_argument('--concurrency', default='1,16,64', help="Comma separated client counts")
+    parser.add_argument('--requests', type=int, default=2000, help="Requests per load-test run")
+    parser.add_argument('--baseline', default=BASELINE_PATH, help="Baseline JSON to compare against")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="Allowed relative slowdown before a result counts as a regression")
+    parser.add_argument('--save-baseline', action='store_true', help="Store these results as the new baseline")
+    parser.add_argument('--require-baseline', action='store_true',
+                        help="Fail when there is no baseline to compare against (for CI)")
+    args = parser.parse_args()
+
+    # Importing the API loads the configured model and validation data
+    import fastapi_backend as api
+
+    if api.registry.active is None:
+        raise SystemExit("❌ No model loaded; set MODEL_PATH")
+    records = api.validation_records or [
+        dict(zip(('operator', 'network_type', 'inout_travelling', 'calldrop_category'), values))
+        | {'latitude': 12.97, 'longitude': 77.59, 'state_name': 'Karnataka', 'month': 'March'}
+        for values in [('Airtel', '4G', 'Indoor', 'Satisfactory'), ('RJio', '4G', 'Outdoor', 'Call Dropped')]
+    ]
+    pool = request_pool(records, 4096)
+
+    results = {}
+    if args.suite in ('micro', 'all'):
+        results.update(micro_benchmarks(api, pool, [int(size) for size in args.batch_sizes.split(',')]))
+    if args.suite in ('load', 'all'):
+        concurrencies = [int(c) for c in args.concurrency.split(',')]
+        results.update(asyncio.run(load_tests(api, pool, concurrencies, args.requests)))
+
+    baseline = load_baseline(args.baseline)
+    print_results(results, baseline)
+
+    if args.save_baseline:
+        save_baseline(args.baseline, results)
+        print(f"✅ Baseline saved as '{args.baseline}'")
+    elif baseline is not None:
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"❌ {len(regressions)} regressions beyond {args.threshold:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+        print(f"✅ No regressions beyond {args.threshold:.0%} of the baseline")
+    elif args.require_baseline:
+        print(f"❌ No baseline at '{args.baseline}'; record one on this machine with --save-baseline")
+        sys.exit(1)
+    else:
+        print(f"⚠️  No baseline at '{args.baseline}'; run with --save-baseline to create one")
@@ -38,6 +38,19 @@ fi
 
 echo "✅ ML model found"
 
+# Convert the pickle to the memory-mappable bundle the API prefers
+if [ ! -f "voice_call_quality_model_bundle/manifest.json" ] || [ "voice_call_quality_model.pkl" -nt "voice_call_quality_model_bundle/manifest.json" ]; then
+    echo "📦 Building model bundle..."
+    python model_bundle.py voice_call_quality_model.pkl voice_call_quality_model_bundle
+
+    if [ $? -ne 0 ]; then
+        echo "❌ Failed to build model bundle"
+        exit 1
+    fi
+fi
+
+echo "✅ Model bundle ready"
+
 # Start the FastAPI server
 echo "🌐 Starting FastAPI server..."
 echo "   - API will be available at: http://localhost:8000"
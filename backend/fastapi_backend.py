@@ -1,30 +1,280 @@
-
 """
 Voice Call Quality Prediction API
 FastAPI backend for real-time call quality predictions
 """
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Header, File, Query, UploadFile
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field
-from typing import Optional, List
-import pickle
+from pydantic import BaseModel, Field, ValidationError
+from typing import Optional, List, Any
+from contextlib import asynccontextmanager
+import asyncio
+import fcntl
+import io
 import numpy as np
 import uvicorn
 from datetime import datetime
 import logging
+import os
+import signal
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from analytics_aggregates import VIEWS, AnalyticsAggregates, read_rated_rows
+from batch_scheduler import MicroBatchScheduler, SchedulerOverloaded
+from feature_encoder import MONTH_MAPPING
+from inference_executor import ExecutorOverloaded, InferenceExecutor
+from metrics import Metrics, MetricsMiddleware, stage
+from model_bundle import is_bundle
+from prediction_cache import PredictionCache
+from model_registry import (
+    ModelRegistry, ServingModel, artifact_signature, artifact_version, attach_interval,
+    attach_prediction_table, attach_tree_engine, load_model_artifact
+)
+from prediction_table import read_validation_records
+from spatial_index import SpatialIndex
+from stream_scoring import CsvChunks, NdjsonChunks, is_utf8, month_from_filename, score_chunks
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Model artifact location: a bundle directory, or the legacy pickle
+MODEL_PATH = os.getenv('MODEL_PATH') or (
+    'voice_call_quality_model_bundle' if is_bundle('voice_call_quality_model_bundle')
+    else 'voice_call_quality_model.pkl'
+)
+
+# Optional lookup-table serving mode
+PREDICTION_TABLE_ENABLED = os.getenv('PREDICTION_TABLE', '0') == '1'
+PREDICTION_TABLE_DIR = os.getenv('PREDICTION_TABLE_DIR', '.')
+PREDICTION_TABLE_RESOLUTION = float(os.getenv('PREDICTION_TABLE_RESOLUTION', '1.0'))
+PREDICTION_TABLE_DTYPE = os.getenv('PREDICTION_TABLE_DTYPE', 'float32')
+
+# Flat-array tree engine, used in place of model.predict when the model compiles
+TREE_ENGINE_ENABLED = os.getenv('TREE_ENGINE', '1') == '1'
+
+# Prediction intervals: 'auto' (per-tree spread for random forests) or 'residual' (constant width)
+PREDICTION_INTERVAL = os.getenv('PREDICTION_INTERVAL', 'auto')
+PREDICTION_INTERVAL_COVERAGE = float(os.getenv('PREDICTION_INTERVAL_COVERAGE', '0.8'))
+
+# Cleaned data used for startup checks and as the reload smoke set
+VALIDATION_CSV = os.getenv('VALIDATION_CSV', '../data/cleaned_mycall_data.csv')
+SMOKE_MAX_MAE = float(os.getenv('SMOKE_MAX_MAE', '1.0'))
+
+# Hot reload: admin endpoint token and artifact watcher
+ADMIN_TOKEN = os.getenv('ADMIN_TOKEN')
+MODEL_WATCH_ENABLED = os.getenv('MODEL_WATCH', '0') == '1'
+MODEL_WATCH_INTERVAL = float(os.getenv('MODEL_WATCH_INTERVAL', '5'))
+
+# Micro-batching of concurrent /predict calls
+MICROBATCH_ENABLED = os.getenv('MICROBATCH', '1') == '1'
+MICROBATCH_MAX_SIZE = int(os.getenv('MICROBATCH_MAX_SIZE', '256'))
+MICROBATCH_MAX_WAIT_MS = float(os.getenv('MICROBATCH_MAX_WAIT_MS', '2'))
+MICROBATCH_QUEUE_SIZE = int(os.getenv('MICROBATCH_QUEUE_SIZE', '4096'))
+
+# Inference executor: 'thread' or 'process' pool with a bounded number of pending tasks
+INFERENCE_EXECUTOR = os.getenv('INFERENCE_EXECUTOR', 'thread')
+INFERENCE_WORKERS = int(os.getenv('INFERENCE_WORKERS', '0')) or None
+INFERENCE_MAX_PENDING = int(os.getenv('INFERENCE_MAX_PENDING', '0')) or None
+RETRY_AFTER_SECONDS = os.getenv('RETRY_AFTER_SECONDS', '1')
+
+# Prediction cache; coordinates are rounded to this many decimals before lookup and scoring
+PREDICTION_CACHE_ENABLED = os.getenv('PREDICTION_CACHE', '1') == '1'
+PREDICTION_CACHE_SIZE = int(os.getenv('PREDICTION_CACHE_SIZE', '100000'))
+PREDICTION_CACHE_TTL = float(os.getenv('PREDICTION_CACHE_TTL', '3600'))
+PREDICTION_CACHE_PRECISION = int(os.getenv('PREDICTION_CACHE_PRECISION', '4'))
+
+# Spatial index of historical calls for /nearby-calls
+SPATIAL_INDEX_ENABLED = os.getenv('SPATIAL_INDEX', '1') == '1'
+SPATIAL_INDEX_CELL_DEGREES = float(os.getenv('SPATIAL_INDEX_CELL_DEGREES', '0.25'))
+NEARBY_MAX_K = int(os.getenv('NEARBY_MAX_K', '100'))
+
+# Running analysis aggregates kept current by ingest.py (read only here; built from
+# VALIDATION_CSV when absent), and the API's own state for sources added via /admin/analytics
+ANALYTICS_STATE = os.getenv('ANALYTICS_STATE', 'mycall_store/analytics.json')
+ANALYTICS_API_STATE = os.getenv('ANALYTICS_API_STATE', 'analytics_api.json')
+
+# Set by prefork_server.py in its workers; model reloads then go through the master
+PREFORK_MASTER_PID = int(os.getenv('PREFORK_MASTER_PID', '0')) or None
+
+# Per-stage latency histograms and counters exposed on /metrics
+METRICS_ENABLED = os.getenv('METRICS', '1') == '1'
+
+# Rows parsed and scored per chunk by /predict/stream
+STREAM_CHUNK_ROWS = int(os.getenv('STREAM_CHUNK_ROWS', '5000'))
+
+validation_records = read_validation_records(VALIDATION_CSV) if os.path.exists(VALIDATION_CSV) else []
+
+metrics = Metrics()
+
+spatial_index = None
+if SPATIAL_INDEX_ENABLED and validation_records:
+    spatial_index = SpatialIndex.from_records(validation_records, SPATIAL_INDEX_CELL_DEGREES)
+    logger.info(f"Spatial index built over {len(spatial_index):,} historical calls")
+
+def load_analytics() -> Optional[AnalyticsAggregates]:
+    """Ingest store aggregates (or the validation rows), overlaid with sources added through the API"""
+    sources = {}
+    if os.path.exists(ANALYTICS_STATE):
+        sources.update(AnalyticsAggregates.load(ANALYTICS_STATE).sources)
+    elif validation_records:
+        base = AnalyticsAggregates()
+        base.add_records(os.path.basename(VALIDATION_CSV), validation_records)
+        sources.update(base.sources)
+    if os.path.exists(ANALYTICS_API_STATE):
+        sources.update(AnalyticsAggregates.load(ANALYTICS_API_STATE).sources)
+    return AnalyticsAggregates(sources) if sources else None
+
+def analytics_signatures() -> tuple:
+    return artifact_signature(ANALYTICS_STATE), artifact_signature(ANALYTICS_API_STATE)
+
+def append_api_analytics(source: str, rows: List[dict], replace: bool):
+    """Add rows to the API's analytics state file
+
+    The file is read, updated and rewritten under an exclusive lock, so
+    appends sent to different worker processes never overwrite each other.
+    """
+    with open(ANALYTICS_API_STATE + '.lock', 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        aggregates = (AnalyticsAggregates.load(ANALYTICS_API_STATE) if os.path.exists(ANALYTICS_API_STATE)
+                      else AnalyticsAggregates())
+        aggregates.add_records(source, rows, replace)
+        aggregates.save(ANALYTICS_API_STATE)
+
+analytics = load_analytics()
+analytics_signature = analytics_signatures()
+if analytics is not None:
+    logger.info(f"Analytics aggregates loaded: {analytics.records:,} calls from {len(analytics.sources)} sources")
+
+def response_model_info(serving: ServingModel) -> dict:
+    """The model_info fields shared by every response of one model version"""
+    return {
+        "model": serving.model_name,
+        "accuracy": f"{serving.performance_metrics['r2_score']:.1%}",
+        "interval_method": serving.interval.kind,
+        "interval_coverage": float(serving.interval.coverage),
+        "version": serving.version
+    }
+
+def load_serving_model(path: str) -> ServingModel:
+    """Load an artifact and attach the configured inference accelerators"""
+    model_data = load_model_artifact(path)
+    serving = ServingModel(path, model_data, artifact_version(path, model_data))
+    if METRICS_ENABLED:
+        serving.stage_observer = metrics.inference_observer()
+    if serving.geo_aggregates is not None:
+        logger.info(f"Geo aggregates loaded: {len(serving.geo_aggregates):,} clusters, "
+                    f"{serving.geo_aggregates.nbytes / 1e6:.1f} MB")
+
+    if TREE_ENGINE_ENABLED:
+        sample = (serving.encoder.encode_many(validation_records) if validation_records
+                  else serving.encoder.sample_rows(512))
+        try:
+            serving.tree_engine = attach_tree_engine(serving, sample)
+        except Exception as e:
+            logger.error(f"Tree engine unavailable, serving from model.predict: {str(e)}")
+
+    if PREDICTION_TABLE_ENABLED and serving.encoder.uses_geo_aggregates:
+        logger.warning(f"PREDICTION_TABLE=1 ignored: model {serving.version} uses geo aggregate features, "
+                       f"which the lookup table cannot represent; serving from the model")
+    elif PREDICTION_TABLE_ENABLED:
+        try:
+            serving.prediction_table = attach_prediction_table(
+                serving, PREDICTION_TABLE_DIR, PREDICTION_TABLE_RESOLUTION,
+                PREDICTION_TABLE_DTYPE, validation_records
+            )
+        except Exception as e:
+            logger.error(f"Prediction table unavailable, serving from model: {str(e)}")
+
+    try:
+        serving.interval = attach_interval(serving, PREDICTION_INTERVAL_COVERAGE, PREDICTION_INTERVAL)
+    except Exception as e:
+        logger.error(f"Interval calibration failed, using the test RMSE: {str(e)}")
+
+    serving.response_info = response_model_info(serving)
+    return serving
+
+# Load the trained model
+registry = ModelRegistry(load_serving_model, validation_records, SMOKE_MAX_MAE)
+try:
+    registry.load(MODEL_PATH)
+    logger.info("Model loaded successfully")
+except FileNotFoundError:
+    logger.error("Model file not found")
+except ValueError as e:
+    logger.error(f"Model failed validation: {str(e)}")
+
+cache = PredictionCache(PREDICTION_CACHE_SIZE, PREDICTION_CACHE_TTL) if PREDICTION_CACHE_ENABLED else None
+if cache is not None:
+    # A new model makes every cached prediction stale
+    registry.add_listener(lambda previous, current: cache.clear())
+
+executor = InferenceExecutor(
+    kind=INFERENCE_EXECUTOR,
+    workers=INFERENCE_WORKERS,
+    max_pending=INFERENCE_MAX_PENDING,
+    loader=load_serving_model,
+    model_path=MODEL_PATH
+)
+
+async def predict_pinned(items: List[tuple]) -> np.ndarray:
+    """Score (serving model, request) pairs on the executor, one call per model version
+
+    Returns an (n, 2) array of predictions and interval half-widths.
+    """
+    predictions = np.empty((len(items), 2))
+    groups = {}
+    for i, (serving, _) in enumerate(items):
+        groups.setdefault(id(serving), (serving, []))[1].append(i)
+    for serving, indices in groups.values():
+        predictions[indices] = await executor.predict(serving, [items[i][1] for i in indices], interval=True)
+    return predictions
+
+scheduler = MicroBatchScheduler(
+    predict_pinned,
+    max_batch_size=MICROBATCH_MAX_SIZE,
+    max_wait_ms=MICROBATCH_MAX_WAIT_MS,
+    max_queue_size=MICROBATCH_QUEUE_SIZE
+) if MICROBATCH_ENABLED else None
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start the micro-batch scheduler and, when enabled, the model artifact watcher"""
+    if scheduler is not None:
+        await scheduler.start()
+    watcher = None
+    if MODEL_WATCH_ENABLED:
+        watcher = asyncio.create_task(registry.watch(MODEL_PATH, MODEL_WATCH_INTERVAL))
+        logger.info(f"Watching {MODEL_PATH} for new models every {MODEL_WATCH_INTERVAL}s")
+    yield
+    if watcher is not None:
+        watcher.cancel()
+    if scheduler is not None:
+        await scheduler.stop()
+    executor.shutdown()
+
 # Initialize FastAPI app
+class FastJSONResponse(JSONResponse):
+    """JSON response encoded with orjson when it is installed"""
+
+    def render(self, content: Any) -> bytes:
+        if orjson is None:
+            return super().render(content)
+        return orjson.dumps(content)
+
 app = FastAPI(
     title="Voice Call Quality Prediction API",
     description="ML-powered API for predicting telecom call quality ratings",
     version="2.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse
 )
 
 # Add CORS middleware
@@ -36,18 +286,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Load the trained model
-try:
-    with open('voice_call_quality_model.pkl', 'rb') as f:
-        model_data = pickle.load(f)
-    model = model_data['model']
-    feature_columns = model_data['feature_columns']
-    performance_metrics = model_data['performance_metrics']
-    feature_importance = model_data['feature_importance']
-    logger.info("Model loaded successfully")
-except FileNotFoundError:
-    logger.error("Model file not found")
-    model = None
+# Outermost, so request timing covers CORS handling too
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware, metrics=metrics)
 
 # Pydantic models for request/response
 class PredictionRequest(BaseModel):
@@ -70,11 +311,32 @@ class PredictionRequest(BaseModel):
 
 class PredictionResponse(BaseModel):
     predicted_rating: float = Field(..., description="Predicted call quality rating (1-5)")
-    confidence_interval: str = Field(..., description="Prediction confidence")
+    confidence_interval: str = Field(..., description="Prediction interval half-width")
+    interval_low: float = Field(..., description="Lower bound of the prediction interval")
+    interval_high: float = Field(..., description="Upper bound of the prediction interval")
     input_summary: dict = Field(..., description="Summary of input parameters")
     model_info: dict = Field(..., description="Model performance information")
     timestamp: str = Field(..., description="Prediction timestamp")
 
+class BatchPredictionRequest(BaseModel):
+    requests: List[Any] = Field(..., max_length=10000,
+                                description="Prediction requests, each shaped like the /predict body")
+
+class BatchPredictionItem(BaseModel):
+    index: int = Field(..., description="Position of the item in the request array")
+    predicted_rating: Optional[float] = Field(None, description="Predicted call quality rating (1-5)")
+    interval_low: Optional[float] = Field(None, description="Lower bound of the prediction interval")
+    interval_high: Optional[float] = Field(None, description="Upper bound of the prediction interval")
+    error: Optional[str] = Field(None, description="Validation error for this item")
+
+class BatchPredictionResponse(BaseModel):
+    predictions: List[BatchPredictionItem] = Field(..., description="Results in request order")
+    total: int
+    succeeded: int
+    failed: int
+    model_info: dict = Field(..., description="Model performance information")
+    timestamp: str = Field(..., description="Prediction timestamp")
+
 class ModelInfoResponse(BaseModel):
     model_name: str
     accuracy: float
@@ -82,68 +344,98 @@ class ModelInfoResponse(BaseModel):
     mae: float
     feature_count: int
     top_features: List[dict]
+    model_version: str
+    loaded_at: str
 
 class HealthResponse(BaseModel):
     status: str
     timestamp: str
     model_loaded: bool
+    model_version: Optional[str] = None
+    model_loaded_at: Optional[str] = None
+
+class NearbyCall(BaseModel):
+    latitude: float
+    longitude: float
+    rating: float
+    call_dropped: bool
+    operator: str
+    network_type: str
+    distance_km: float
+
+class NearbyCallsResponse(BaseModel):
+    latitude: float
+    longitude: float
+    count: int = Field(..., description="Historical calls returned")
+    avg_rating: Optional[float] = Field(None, description="Mean rating of the returned calls")
+    rating_std: Optional[float] = Field(None, description="Rating standard deviation of the returned calls")
+    drop_rate: Optional[float] = Field(None, description="Share of the returned calls that dropped")
+    operator_mix: dict = Field(..., description="Share of the returned calls per operator")
+    max_distance_km: Optional[float] = Field(None, description="Distance to the farthest returned call")
+    neighbours: List[NearbyCall] = Field(..., description="Nearest calls, closest first")
+
+class AnalyticsResponse(BaseModel):
+    view: str
+    fields: List[str] = Field(..., description="Grouping columns of the table")
+    records: int = Field(..., description="Rated calls aggregated")
+    sources: List[str] = Field(..., description="Files or batches merged into the aggregates")
+    rows: List[dict] = Field(..., description="One row per group, as in the analysis CSV exports")
+
+class AnalyticsAppendResponse(BaseModel):
+    status: str
+    source: str
+    rows: int = Field(..., description="Rated rows aggregated from the upload")
+    records: int = Field(..., description="Rated calls aggregated in total")
+
+class ReloadRequest(BaseModel):
+    path: Optional[str] = Field(None, description="Artifact to load, defaults to the configured MODEL_PATH")
 
-# Month mapping
-month_mapping = {
-    'January': 1, 'February': 2, 'March': 3, 'April': 4, 'May': 5, 'June': 6,
-    'July': 7, 'August': 8, 'September': 9, 'October': 10, 'November': 11, 'December': 12
-}
-
-def create_feature_vector(request: PredictionRequest) -> np.ndarray:
-    """Create feature vector from prediction request"""
-    features = {col: 0 for col in feature_columns}
-
-    # Basic features
-    features['latitude'] = request.latitude
-    features['longitude'] = request.longitude
-    features['month_num'] = month_mapping.get(request.month, 1)
-    features['quarter'] = ((features['month_num'] - 1) // 3) + 1
-
-    # Call quality features
-    if request.calldrop_category == 'Call Dropped':
-        features['is_call_dropped'] = 1
-    elif request.calldrop_category == 'Poor Voice Quality':
-        features['is_poor_quality'] = 1
-
-    # Location features
-    if request.inout_travelling == 'Indoor':
-        features['is_indoor'] = 1
-    elif request.inout_travelling == 'Outdoor':
-        features['is_outdoor'] = 1
-    elif request.inout_travelling == 'Travelling':
-        features['is_travelling'] = 1
-
-    # Network features
-    if request.network_type == '4G':
-        features['is_4g'] = 1
-    elif request.network_type == '3G':
-        features['is_3g'] = 1
-    elif request.network_type == '2G':
-        features['is_2g'] = 1
-    else:
-        features['is_unknown_network'] = 1
-
-    # Operator features
-    if request.operator == 'Airtel':
-        features['is_airtel'] = 1
-    elif request.operator == 'RJio':
-        features['is_rjio'] = 1
-    elif request.operator == 'VI':
-        features['is_vi'] = 1
-    elif request.operator == 'BSNL':
-        features['is_bsnl'] = 1
-
-    # State features
-    state_col = f'is_{request.state_name.lower().replace(" ", "_")}'
-    if state_col in features:
-        features[state_col] = 1
-
-    return np.array([list(features.values())])
+class ReloadResponse(BaseModel):
+    status: str
+    model_name: Optional[str] = None
+    model_version: Optional[str] = None
+    previous_version: Optional[str]
+    loaded_at: Optional[str] = None
+
+def get_serving_model() -> ServingModel:
+    """Return the active model, pinned for the rest of the request"""
+    serving = registry.active
+    if serving is None:
+        raise HTTPException(status_code=503, detail="Model not loaded")
+    return serving
+
+def interval_bounds(prediction: float, half_width: float) -> tuple:
+    """Prediction interval clipped to the rating scale"""
+    return round(max(1.0, prediction - half_width), 2), round(min(5.0, prediction + half_width), 2)
+
+def confidence_label(half_width: float) -> str:
+    """Coarse confidence from the interval width"""
+    if half_width <= 0.5:
+        return "High"
+    return "Medium" if half_width <= 1.0 else "Low"
+
+async def current_analytics() -> AnalyticsAggregates:
+    """The aggregates, reloaded when ingest.py or another worker has rewritten a state file"""
+    global analytics, analytics_signature
+    signature = analytics_signatures()
+    if signature != analytics_signature:
+        analytics = await asyncio.to_thread(load_analytics)
+        analytics_signature = signature
+    if analytics is None:
+        raise HTTPException(status_code=503, detail="Analytics data not loaded")
+    return analytics
+
+def overloaded_error() -> HTTPException:
+    """503 telling the client to back off instead of queueing without bound"""
+    return HTTPException(status_code=503, detail="Inference capacity exhausted, retry shortly",
+                         headers={"Retry-After": RETRY_AFTER_SECONDS})
+
+def format_validation_error(error: ValidationError) -> str:
+    """Flatten a pydantic validation error into a single message"""
+    return "; ".join(
+        f"{'.'.join(str(part) for part in err['loc']) or 'body'}: {err['msg']}"
+        for err in error.errors()
+    )
 
 @app.get("/", response_model=dict)
 async def root():
@@ -153,8 +445,18 @@ async def root():
         "version": "2.0.0",
         "endpoints": {
             "predict": "/predict - Make call quality predictions",
+            "predict-batch": "/predict/batch - Score many requests in one call",
+            "predict-stream": "/predict/stream - Score an uploaded CSV/NDJSON file, streamed back",
             "health": "/health - Check API health",
             "model-info": "/model-info - Get model information",
+            "reload": "/admin/reload - Load a new model artifact without restarting",
+            "scheduler-stats": "/stats/scheduler - Micro-batch sizes and queue wait times",
+            "executor-stats": "/stats/executor - Inference pool size and load",
+            "cache-stats": "/stats/cache - Prediction cache hit/miss/eviction counters",
+            "metrics": "/metrics - Per-stage latency histograms and counters (Prometheus)",
+            "nearby-calls": "/nearby-calls - Nearest historical calls and their observed quality",
+            "analytics": "/analytics/{network|location|calldrop} - Live analysis tables",
+            "analytics-append": "/admin/analytics - Fold new rated rows into the analysis tables",
             "docs": "/docs - API documentation"
         }
     }
@@ -162,49 +464,97 @@ async def root():
 @app.get("/health", response_model=HealthResponse)
 async def health_check():
     """Health check endpoint"""
+    serving = registry.active
     return HealthResponse(
-        status="healthy" if model is not None else "unhealthy",
+        status="healthy" if serving is not None else "unhealthy",
         timestamp=datetime.now().isoformat(),
-        model_loaded=model is not None
+        model_loaded=serving is not None,
+        model_version=serving.version if serving else None,
+        model_loaded_at=serving.loaded_at if serving else None
     )
 
 @app.get("/model-info", response_model=ModelInfoResponse)
 async def get_model_info():
     """Get model information and performance metrics"""
-    if model is None:
-        raise HTTPException(status_code=503, detail="Model not loaded")
+    serving = get_serving_model()
 
     return ModelInfoResponse(
-        model_name=model_data['model_name'],
-        accuracy=round(performance_metrics['r2_score'], 4),
-        rmse=round(performance_metrics['rmse'], 4),
-        mae=round(performance_metrics['mae'], 4),
-        feature_count=len(feature_columns),
-        top_features=feature_importance[:5]
+        model_name=serving.model_name,
+        accuracy=round(serving.performance_metrics['r2_score'], 4),
+        rmse=round(serving.performance_metrics['rmse'], 4),
+        mae=round(serving.performance_metrics['mae'], 4),
+        feature_count=len(serving.feature_columns),
+        top_features=serving.feature_importance[:5],
+        model_version=serving.version,
+        loaded_at=serving.loaded_at
     )
 
 @app.post("/predict", response_model=PredictionResponse)
-async def predict_call_quality(request: PredictionRequest):
-    """Predict call quality rating based on input parameters"""
-
-    if model is None:
-        raise HTTPException(status_code=503, detail="Model not loaded")
+async def predict_call_quality(
+    request: PredictionRequest,
+    fields: Optional[str] = Query(None, pattern="^rating$",
+                                  description="'rating' returns only the predicted rating"),
+    accept: Optional[str] = Header(None)
+):
+    """Predict call quality rating based on input parameters
+
+    With ``?fields=rating`` the body is just the rating as a JSON number, and
+    with ``Accept: text/plain`` the same number as text.
+    """
+
+    # Receiving the body, routing and request validation all happen before the handler runs
+    stage('validate')
+    serving = get_serving_model()
 
     try:
-        # Create feature vector
-        feature_vector = create_feature_vector(request)
-
-        # Make prediction
-        prediction = model.predict(feature_vector)[0]
+        # Serve repeated inputs from the cache, scoring the rounded coordinates on a miss
+        cache_key = None
+        scored = None
+        scored_request = request
+        if cache is not None:
+            scored_request = request.model_copy(update={
+                "latitude": round(request.latitude, PREDICTION_CACHE_PRECISION),
+                "longitude": round(request.longitude, PREDICTION_CACHE_PRECISION)
+            })
+            cache_key = (serving.version,) + serving.encoder.feature_key(
+                scored_request.operator, scored_request.network_type, scored_request.inout_travelling,
+                scored_request.calldrop_category, scored_request.latitude, scored_request.longitude,
+                scored_request.state_name, scored_request.month
+            )
+            scored = cache.get(cache_key)
+        stage('cache')
+
+        if scored is None:
+            # Make prediction, batched with concurrent callers when the scheduler is on
+            if scheduler is not None:
+                row = await scheduler.submit((serving, scored_request))
+            else:
+                row = (await executor.predict(serving, [scored_request], interval=True))[0]
+            scored = (float(row[0]), float(row[1]))
+            if cache_key is not None:
+                cache.put(cache_key, scored)
+            stage('inference')
+        prediction, half_width = scored
 
         # Ensure prediction is within valid range
         prediction = max(1.0, min(5.0, prediction))
 
-        # Create response
-        response = PredictionResponse(
-            predicted_rating=round(prediction, 2),
-            confidence_interval="±0.22 rating points",
-            input_summary={
+        if fields == "rating" or (accept or "").startswith("text/plain"):
+            # Slim mode: the bare rating, for clients that ignore everything else
+            stage('response')
+            return Response(content=str(round(prediction, 2)),
+                            media_type="application/json" if fields == "rating" else "text/plain")
+
+        interval_low, interval_high = interval_bounds(prediction, half_width)
+
+        # Built as a plain dict and encoded directly, rather than validated
+        # again against PredictionResponse, which only documents the shape
+        content = {
+            "predicted_rating": round(prediction, 2),
+            "confidence_interval": f"±{half_width:.2f} rating points",
+            "interval_low": interval_low,
+            "interval_high": interval_high,
+            "input_summary": {
                 "operator": request.operator,
                 "network": request.network_type,
                 "location": request.inout_travelling,
@@ -212,21 +562,250 @@ async def predict_call_quality(request: PredictionRequest):
                 "state": request.state_name,
                 "coordinates": f"({request.latitude}, {request.longitude})"
             },
-            model_info={
-                "model": model_data['model_name'],
-                "accuracy": f"{performance_metrics['r2_score']:.1%}",
-                "prediction_confidence": "High"
-            },
-            timestamp=datetime.now().isoformat()
-        )
+            "model_info": {**serving.response_info, "prediction_confidence": confidence_label(half_width)},
+            "timestamp": datetime.now().isoformat()
+        }
 
         logger.info(f"Prediction made: {prediction:.2f} for {request.operator} in {request.state_name}")
-        return response
+        stage('response')
+        return FastJSONResponse(content)
 
+    except (SchedulerOverloaded, ExecutorOverloaded):
+        raise overloaded_error()
     except Exception as e:
         logger.error(f"Prediction error: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Prediction failed: {str(e)}")
 
+@app.post("/predict/batch", response_model=BatchPredictionResponse)
+async def predict_call_quality_batch(batch: BatchPredictionRequest):
+    """Predict call quality ratings for a batch, reporting invalid items individually"""
+
+    stage('validate')
+    serving = get_serving_model()
+
+    # Validate each item on its own so one bad row does not fail the batch
+    items: List[Optional[BatchPredictionItem]] = [None] * len(batch.requests)
+    valid_requests = []
+    valid_indices = []
+    for i, raw in enumerate(batch.requests):
+        try:
+            valid_requests.append(PredictionRequest.model_validate(raw))
+            valid_indices.append(i)
+        except ValidationError as e:
+            items[i] = BatchPredictionItem(index=i, error=format_validation_error(e))
+    stage('validate_items')
+
+    if valid_requests:
+        try:
+            scored = await executor.predict(serving, valid_requests, interval=True)
+        except ExecutorOverloaded:
+            raise overloaded_error()
+        except Exception as e:
+            logger.error(f"Batch prediction error: {str(e)}")
+            raise HTTPException(status_code=500, detail=f"Prediction failed: {str(e)}")
+        stage('inference')
+
+        for i, (prediction, half_width) in zip(valid_indices, scored):
+            prediction = min(5.0, max(1.0, float(prediction)))
+            interval_low, interval_high = interval_bounds(prediction, float(half_width))
+            items[i] = BatchPredictionItem(index=i, predicted_rating=round(prediction, 2),
+                                           interval_low=interval_low, interval_high=interval_high)
+
+    failed = len(batch.requests) - len(valid_requests)
+    logger.info(f"Batch prediction made: {len(valid_requests)} scored, {failed} rejected")
+    stage('response')
+    return BatchPredictionResponse(
+        predictions=items,
+        total=len(batch.requests),
+        succeeded=len(valid_requests),
+        failed=failed,
+        model_info=serving.response_info,
+        timestamp=datetime.now().isoformat()
+    )
+
+@app.post("/predict/stream")
+async def predict_call_quality_stream(
+    file: UploadFile = File(..., description="CSV with a header row, or NDJSON"),
+    format: Optional[str] = Query(None, pattern="^(csv|ndjson)$",
+                                  description="Input format, inferred from the file name when omitted"),
+    month: Optional[str] = Query(None, description="Month for rows without a month column, "
+                                                  "inferred from names like March_MyCall_2023.csv when omitted")
+):
+    """Score an uploaded file chunk by chunk, streaming it back with rating_pred and interval columns"""
+
+    serving = get_serving_model()
+
+    filename = file.filename or ''
+    if format is None:
+        format = 'ndjson' if filename.endswith(('.ndjson', '.jsonl')) else 'csv'
+    if month is not None and month not in MONTH_MAPPING:
+        raise HTTPException(status_code=400, detail=f"Unknown month: {month}")
+    default_month = month or month_from_filename(filename)
+
+    # Checked up front: once streaming has started, an error can only truncate the body
+    if not await asyncio.to_thread(is_utf8, file.file):
+        raise HTTPException(status_code=400, detail="File is not UTF-8 encoded")
+
+    chunk_type = NdjsonChunks if format == 'ndjson' else CsvChunks
+    chunks = chunk_type(file.file, STREAM_CHUNK_ROWS, default_month)
+    if not default_month and format == 'csv':
+        await asyncio.to_thread(chunks.header)
+        if 'month' not in chunks.fieldnames:
+            raise HTTPException(status_code=400, detail="The file has no month column; pass ?month= "
+                                                        "or name it like March_MyCall_2023.csv")
+
+    async def predict(records: List[dict]) -> np.ndarray:
+        # Bulk jobs wait for capacity instead of failing mid-stream
+        while True:
+            try:
+                return await executor.predict(serving, records, interval=True)
+            except ExecutorOverloaded:
+                await asyncio.sleep(float(RETRY_AFTER_SECONDS))
+
+    scored_name = filename.rsplit('.', 1)[0] + f'_scored.{format}' if filename else f'scored.{format}'
+    logger.info(f"Streaming predictions for {filename or 'upload'} ({format})")
+    return StreamingResponse(
+        score_chunks(chunks, predict),
+        media_type=chunks.media_type,
+        headers={"Content-Disposition": f'attachment; filename="{scored_name}"'}
+    )
+
+@app.post("/admin/reload", response_model=ReloadResponse)
+async def reload_model(response: Response, request: Optional[ReloadRequest] = None,
+                       x_admin_token: Optional[str] = Header(None)):
+    """Load, validate and atomically activate a model artifact
+
+    Under prefork_server.py a reload here would swap the model in this worker
+    only, so the request is handed to the master as SIGHUP instead: it
+    reloads MODEL_PATH once and replaces the workers one at a time. The
+    answer is 202, and the outcome is in the master's log.
+    """
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints disabled, set ADMIN_TOKEN")
+    if x_admin_token != ADMIN_TOKEN:
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+    path = (request.path if request else None) or MODEL_PATH
+    previous = registry.active
+
+    if PREFORK_MASTER_PID is not None:
+        if path != MODEL_PATH:
+            raise HTTPException(status_code=409, detail=f"Workers reload only MODEL_PATH ({MODEL_PATH}); "
+                                                        f"put the new artifact there and retry without a path")
+        os.kill(PREFORK_MASTER_PID, signal.SIGHUP)
+        logger.info(f"Model reload handed to prefork master {PREFORK_MASTER_PID}")
+        response.status_code = 202
+        return ReloadResponse(status="rolling_restart",
+                              previous_version=previous.version if previous else None)
+
+    try:
+        # Load off the event loop; in-flight requests keep their pinned model
+        serving = await asyncio.to_thread(registry.load, path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Model artifact not found: {path}")
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=f"Model failed validation: {str(e)}")
+    except Exception as e:
+        logger.error(f"Model reload error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Model reload failed: {str(e)}")
+
+    return ReloadResponse(
+        status="reloaded",
+        model_name=serving.model_name,
+        model_version=serving.version,
+        previous_version=previous.version if previous else None,
+        loaded_at=serving.loaded_at
+    )
+
+@app.post("/admin/analytics", response_model=AnalyticsAppendResponse)
+async def append_analytics(
+    file: UploadFile = File(..., description="Cleaned MyCall CSV with a rating column"),
+    source: str = Query(..., description="Name the rows are recorded under, e.g. the month file"),
+    replace: bool = Query(False, description="Replace what the source held instead of adding to it"),
+    x_admin_token: Optional[str] = Header(None)
+):
+    """Fold new rated rows into the live analysis aggregates"""
+    global analytics, analytics_signature
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints disabled, set ADMIN_TOKEN")
+    if x_admin_token != ADMIN_TOKEN:
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+
+    rows = await asyncio.to_thread(read_rated_rows, io.TextIOWrapper(file.file, encoding='utf-8-sig', newline=''))
+    # Only the uploaded rows are aggregated; the merge touches a few dozen groups
+    try:
+        await asyncio.to_thread(append_api_analytics, source, rows, replace)
+    except OSError as e:
+        logger.error(f"Analytics state not saved: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Could not save {ANALYTICS_API_STATE}: {str(e)}")
+
+    signature = analytics_signatures()
+    analytics = await asyncio.to_thread(load_analytics)
+    analytics_signature = signature
+
+    logger.info(f"Analytics: {len(rows):,} rows {'replaced' if replace else 'added'} for {source}")
+    return AnalyticsAppendResponse(status="replaced" if replace else "appended", source=source,
+                                   rows=len(rows), records=analytics.records)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Latency histograms, request and error counts and serving gauges in Prometheus text format"""
+    serving = registry.active
+    gauges = [
+        ("model_info", "Active model; the value is always 1",
+         {"model": serving.model_name, "version": serving.version} if serving else {}, 1 if serving else 0),
+        ("inference_pending", "Inference tasks queued or running", {}, executor.pending),
+        ("inference_max_pending", "Inference tasks allowed in flight", {}, executor.max_pending),
+        ("inference_workers", "Inference pool size", {}, executor.workers),
+    ]
+    if scheduler is not None:
+        gauges.append(("microbatch_queue_depth", "Predictions waiting for a micro-batch", {},
+                       scheduler.queue_depth))
+    if cache is not None:
+        gauges.append(("prediction_cache_entries", "Cached predictions", {}, len(cache)))
+    return PlainTextResponse(metrics.render(gauges), media_type="text/plain; version=0.0.4")
+
+@app.get("/stats/scheduler")
+async def get_scheduler_stats():
+    """Get micro-batch scheduler batch size and queue wait statistics"""
+    if scheduler is None:
+        return {"enabled": False}
+    return {"enabled": True, **scheduler.stats()}
+
+@app.get("/stats/executor")
+async def get_executor_stats():
+    """Get inference executor size and load"""
+    return executor.stats()
+
+@app.get("/stats/cache")
+async def get_cache_stats():
+    """Get prediction cache hit, miss and eviction counters"""
+    if cache is None:
+        return {"enabled": False}
+    return {"enabled": True, "precision": PREDICTION_CACHE_PRECISION, **cache.stats()}
+
+@app.get("/nearby-calls", response_model=NearbyCallsResponse)
+async def get_nearby_calls(
+    latitude: float = Query(..., ge=-90, le=90, description="Latitude coordinate"),
+    longitude: float = Query(..., ge=-180, le=180, description="Longitude coordinate"),
+    k: int = Query(10, ge=1, le=NEARBY_MAX_K, description="Number of historical calls to return")
+):
+    """Get the k nearest historical calls with their aggregate rating, drop rate and operator mix"""
+    if spatial_index is None:
+        raise HTTPException(status_code=503, detail="Historical data not loaded")
+    return NearbyCallsResponse(latitude=latitude, longitude=longitude,
+                               **spatial_index.summary(latitude, longitude, k))
+
+@app.get("/analytics/{view}", response_model=AnalyticsResponse)
+async def get_analytics(view: str):
+    """Get a live analysis table: network, location (context x operator) or calldrop"""
+    if view not in VIEWS:
+        raise HTTPException(status_code=404, detail=f"Unknown analytics view: {view}; "
+                                                    f"expected one of {', '.join(VIEWS)}")
+    aggregates = await current_analytics()
+    return AnalyticsResponse(view=view, fields=list(VIEWS[view]), records=aggregates.records,
+                             sources=sorted(aggregates.sources), rows=aggregates.table(view))
+
 @app.get("/operators")
 async def get_operators():
     """Get list of supported operators"""
@@ -247,8 +826,9 @@ async def get_states():
     ]}
 
 if __name__ == "__main__":
+    # Single-process development server; production runs prefork_server.py
     uvicorn.run(
-        "main:app",
+        "fastapi_backend:app",
         host="0.0.0.0",
         port=8000,
         reload=True,
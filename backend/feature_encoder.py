@@ -0,0 +1,337 @@
+"""
+Feature encoder shared by model training and the prediction API
+Maps raw call parameters onto the model's one-hot feature layout
+"""
+
+import threading
+from typing import Dict, Iterable, List, Mapping, Optional
+
+import numpy as np
+
+# Month mapping
+MONTH_MAPPING = {
+    'January': 1, 'February': 2, 'March': 3, 'April': 4, 'May': 5, 'June': 6,
+    'July': 7, 'August': 8, 'September': 9, 'October': 10, 'November': 11, 'December': 12
+}
+
+# One-hot column for each categorical value
+CATEGORY_COLUMNS = {
+    'calldrop_category': {
+        'Satisfactory': 'is_satisfactory',
+        'Poor Voice Quality': 'is_poor_quality',
+        'Call Dropped': 'is_call_dropped',
+    },
+    'inout_travelling': {'Indoor': 'is_indoor', 'Outdoor': 'is_outdoor', 'Travelling': 'is_travelling'},
+    'network_type': {'4G': 'is_4g', '3G': 'is_3g', '2G': 'is_2g', 'Unknown': 'is_unknown_network'},
+    'operator': {'Airtel': 'is_airtel', 'RJio': 'is_rjio', 'VI': 'is_vi', 'BSNL': 'is_bsnl'},
+}
+
+# Column the API uses when a value is not in CATEGORY_COLUMNS
+CATEGORY_DEFAULTS = {'network_type': 'is_unknown_network'}
+# Training leaves such values all-zero, as the original training script did
+TRAINING_CATEGORY_DEFAULTS: Dict[str, str] = {}
+
+CATEGORICAL_FIELDS = ('operator', 'network_type', 'inout_travelling', 'calldrop_category')
+
+# Design matrix column order; the top-state indicators follow these
+BASE_FEATURE_COLUMNS = (
+    # Core features
+    'latitude', 'longitude', 'month_num', 'quarter',
+    # Call quality indicators
+    'is_call_dropped', 'is_poor_quality',
+    # Location context
+    'is_indoor', 'is_outdoor', 'is_travelling',
+    # Network technology
+    'is_4g', 'is_3g', 'is_2g', 'is_unknown_network',
+    # Operators
+    'is_airtel', 'is_rjio', 'is_vi', 'is_bsnl',
+)
+
+# Historical aggregates per geo cluster and per (cluster, operator, network), see geo_aggregates
+GEO_AGGREGATE_COLUMNS = (
+    'geo_cluster_calls', 'geo_cluster_rating', 'geo_cluster_drop_rate',
+    'geo_segment_calls', 'geo_segment_rating', 'geo_segment_drop_rate',
+)
+
+
+def state_column(state_name: str) -> str:
+    """Return the indicator column name for a state"""
+    return f'is_{state_name.lower().replace(" ", "_")}'
+
+
+def feature_columns_for(top_states: Iterable[str], geo_aggregates: bool = False) -> List[str]:
+    """Full feature column list for a model trained with these top states"""
+    columns = list(BASE_FEATURE_COLUMNS) + [state_column(state) for state in top_states]
+    return columns + list(GEO_AGGREGATE_COLUMNS) if geo_aggregates else columns
+
+
+class FeatureEncoder:
+    """Encode call parameters into model feature vectors
+
+    Built once from the model's feature_columns. Every categorical value is
+    resolved to a column index up front, so encoding a row is a handful of
+    dict lookups and buffer writes. Models trained with GEO_AGGREGATE_COLUMNS
+    also need the GeoAggregates table they were trained with.
+    """
+
+    def __init__(self, feature_columns: Iterable[str], geo_aggregates=None,
+                 category_defaults: Mapping[str, str] = CATEGORY_DEFAULTS):
+        self.feature_columns = list(feature_columns)
+        self.n_features = len(self.feature_columns)
+        self.column_index = {col: i for i, col in enumerate(self.feature_columns)}
+
+        # Numeric feature positions (-1 when the model does not use them)
+        self.latitude_idx = self.column_index.get('latitude', -1)
+        self.longitude_idx = self.column_index.get('longitude', -1)
+        self.month_idx = self.column_index.get('month_num', -1)
+        self.quarter_idx = self.column_index.get('quarter', -1)
+
+        # Aggregate feature positions, and which aggregates the model uses
+        self.geo_aggregates = geo_aggregates
+        geo_idx = [self.column_index.get(col, -1) for col in GEO_AGGREGATE_COLUMNS]
+        self.geo_used = [i for i, idx in enumerate(geo_idx) if idx >= 0]
+        self.geo_idx = [geo_idx[i] for i in self.geo_used]
+
+        # category -> column index tables
+        self.category_index = {
+            field: {value: self.column_index.get(col, -1) for value, col in mapping.items()}
+            for field, mapping in CATEGORY_COLUMNS.items()
+        }
+        self.category_default = {
+            field: self.column_index.get(category_defaults.get(field), -1)
+            for field in CATEGORY_COLUMNS
+        }
+
+        # State table seeded from the state indicator columns
+        self.state_index = {
+            col[3:].replace('_', ' ').title(): i
+            for col, i in self.column_index.items()
+            if col.startswith('is_') and col not in self._non_state_columns()
+        }
+
+        # month -> (month_num, quarter)
+        self.month_index = {
+            month: (num, (num - 1) // 3 + 1) for month, num in MONTH_MAPPING.items()
+        }
+
+        self._local = threading.local()
+
+    @property
+    def uses_geo_aggregates(self) -> bool:
+        return bool(self.geo_idx)
+
+    @staticmethod
+    def _non_state_columns() -> set:
+        return {col for mapping in CATEGORY_COLUMNS.values() for col in mapping.values()}
+
+    def state_to_index(self, state_name: str) -> int:
+        """Resolve a state name to its indicator column index, or -1"""
+        idx = self.state_index.get(state_name)
+        if idx is None:
+            idx = self.column_index.get(state_column(state_name), -1)
+        return idx
+
+    def category_to_index(self, field: str, value: str) -> int:
+        """Resolve a categorical value to its one-hot column index, or -1"""
+        return self.category_index[field].get(value, self.category_default[field])
+
+    def month_to_features(self, month: str) -> tuple:
+        """Return (month_num, quarter) for a month name, defaulting to January"""
+        return self.month_index.get(month, (1, 1))
+
+    def feature_key(self, operator: str, network_type: str, inout_travelling: str,
+                    calldrop_category: str, latitude: float, longitude: float,
+                    state_name: str, month: str) -> tuple:
+        """Hashable key that is equal for inputs that encode to the same feature vector"""
+        return (
+            self.category_to_index('operator', operator),
+            self.category_to_index('network_type', network_type),
+            self.category_to_index('inout_travelling', inout_travelling),
+            self.category_to_index('calldrop_category', calldrop_category),
+            self.state_to_index(state_name),
+            self.month_to_features(month)[0],
+            latitude,
+            longitude,
+        )
+
+    def sample_rows(self, n_rows: int, seed: int = 42) -> np.ndarray:
+        """Encode random valid inputs, for parity checks when no real data is at hand"""
+        rng = np.random.default_rng(seed)
+        choices = {field: list(mapping) for field, mapping in CATEGORY_COLUMNS.items()}
+        choices['state_name'] = list(self.state_index) + ['Other']
+        choices['month'] = list(MONTH_MAPPING)
+        picks = {field: rng.choice(values, size=n_rows) for field, values in choices.items()}
+        latitude = rng.uniform(6.0, 38.0, size=n_rows)
+        longitude = rng.uniform(68.0, 98.0, size=n_rows)
+        records = [
+            {field: str(values[i]) for field, values in picks.items()}
+            | {'latitude': float(latitude[i]), 'longitude': float(longitude[i])}
+            for i in range(n_rows)
+        ]
+        return self.encode_many(records)
+
+    def _row_buffer(self) -> np.ndarray:
+        # One preallocated row per thread, so concurrent callers never share it
+        buffer = getattr(self._local, 'buffer', None)
+        if buffer is None:
+            buffer = np.zeros((1, self.n_features), dtype=np.float32)
+            self._local.buffer = buffer
+            self._local.hot = []
+        return buffer
+
+    def encode_one(self, operator: str, network_type: str, inout_travelling: str,
+                   calldrop_category: str, latitude: float, longitude: float,
+                   state_name: str, month: str) -> np.ndarray:
+        """Encode a single row into the reusable (1, n_features) float32 buffer
+
+        The returned array is overwritten by the next call on the same thread;
+        copy it if it must outlive that.
+        """
+        buffer = self._row_buffer()
+        row = buffer[0]
+        hot = self._local.hot
+
+        # Clear only the one-hot cells set by the previous call
+        for idx in hot:
+            row[idx] = 0.0
+        hot.clear()
+
+        month_num, quarter = self.month_to_features(month)
+        if self.latitude_idx >= 0:
+            row[self.latitude_idx] = latitude
+        if self.longitude_idx >= 0:
+            row[self.longitude_idx] = longitude
+        if self.month_idx >= 0:
+            row[self.month_idx] = month_num
+        if self.quarter_idx >= 0:
+            row[self.quarter_idx] = quarter
+
+        for idx in (
+            self.category_to_index('operator', operator),
+            self.category_to_index('network_type', network_type),
+            self.category_to_index('inout_travelling', inout_travelling),
+            self.category_to_index('calldrop_category', calldrop_category),
+            self.state_to_index(state_name),
+        ):
+            if idx >= 0:
+                row[idx] = 1.0
+                hot.append(idx)
+
+        if self.geo_idx and self.geo_aggregates is not None:
+            values = self.geo_aggregates.lookup(latitude, longitude, operator, network_type)
+            for i, idx in zip(self.geo_used, self.geo_idx):
+                row[idx] = values[i]
+
+        return buffer
+
+    def encode_many(self, records: List[Mapping], out: Optional[np.ndarray] = None) -> np.ndarray:
+        """Encode many rows into a (n_rows, n_features) float32 matrix
+
+        Each record is a mapping or object carrying the request fields. Pass
+        ``out`` to reuse a preallocated matrix with at least n_rows rows.
+        """
+        n_rows = len(records)
+        if out is None:
+            matrix = np.zeros((n_rows, self.n_features), dtype=np.float32)
+        else:
+            matrix = out[:n_rows]
+            matrix.fill(0.0)
+
+        get = field_getter(records)
+        rows = np.arange(n_rows)
+
+        # Basic features
+        month_features = np.array([self.month_to_features(get(r, 'month')) for r in records],
+                                  dtype=np.float32).reshape(n_rows, 2)
+        if self.latitude_idx >= 0:
+            matrix[:, self.latitude_idx] = [get(r, 'latitude') for r in records]
+        if self.longitude_idx >= 0:
+            matrix[:, self.longitude_idx] = [get(r, 'longitude') for r in records]
+        if self.month_idx >= 0:
+            matrix[:, self.month_idx] = month_features[:, 0]
+        if self.quarter_idx >= 0:
+            matrix[:, self.quarter_idx] = month_features[:, 1]
+
+        # Categorical features: resolve each row's column, then scatter all ones at once
+        for field in CATEGORICAL_FIELDS:
+            table = self.category_index[field]
+            default = self.category_default[field]
+            cols = np.fromiter((table.get(get(r, field), default) for r in records),
+                               dtype=np.intp, count=n_rows)
+            hot = cols >= 0
+            matrix[rows[hot], cols[hot]] = 1.0
+
+        cols = np.fromiter((self.state_to_index(get(r, 'state_name')) for r in records),
+                           dtype=np.intp, count=n_rows)
+        hot = cols >= 0
+        matrix[rows[hot], cols[hot]] = 1.0
+
+        if self.geo_idx and self.geo_aggregates is not None and n_rows:
+            values = self.geo_aggregates.lookup_many(
+                [get(r, 'latitude') for r in records], [get(r, 'longitude') for r in records],
+                [get(r, 'operator') for r in records], [get(r, 'network_type') for r in records])
+            matrix[:, self.geo_idx] = values[:, self.geo_used]
+
+        return matrix
+
+    def encode_frame(self, frame, out: Optional[np.ndarray] = None) -> np.ndarray:
+        """Encode a DataFrame into a (n_rows, n_features) float32 matrix
+
+        Each field is factorized once and its codes are mapped through a small
+        value -> column table, so encoding is a few vectorized passes however
+        many rows there are. Missing coordinates encode as 0.
+        """
+        n_rows = len(frame)
+        if out is None:
+            matrix = np.zeros((n_rows, self.n_features), dtype=np.float32)
+        else:
+            matrix = out[:n_rows]
+            matrix.fill(0.0)
+        rows = np.arange(n_rows)
+
+        # Basic features
+        for field, idx in (('latitude', self.latitude_idx), ('longitude', self.longitude_idx)):
+            if idx >= 0:
+                values = np.asarray(frame[field], dtype=np.float32)
+                matrix[:, idx] = np.where(np.isnan(values), 0.0, values)
+        month_features = _lookup_codes(frame['month'], self.month_to_features, self.month_to_features(None))
+        if self.month_idx >= 0:
+            matrix[:, self.month_idx] = month_features[:, 0]
+        if self.quarter_idx >= 0:
+            matrix[:, self.quarter_idx] = month_features[:, 1]
+
+        # Categorical features: one column per row, then a single scatter
+        for field in CATEGORICAL_FIELDS:
+            cols = _lookup_codes(frame[field], lambda value: self.category_to_index(field, value),
+                                 self.category_default[field])
+            hot = cols >= 0
+            matrix[rows[hot], cols[hot]] = 1.0
+
+        cols = _lookup_codes(frame['state_name'], self.state_to_index, -1)
+        hot = cols >= 0
+        matrix[rows[hot], cols[hot]] = 1.0
+
+        if self.geo_idx and self.geo_aggregates is not None and n_rows:
+            latitude = np.nan_to_num(np.asarray(frame['latitude'], dtype=np.float64))
+            longitude = np.nan_to_num(np.asarray(frame['longitude'], dtype=np.float64))
+            values = self.geo_aggregates.lookup_many(latitude, longitude, frame['operator'], frame['network_type'])
+            matrix[:, self.geo_idx] = values[:, self.geo_used]
+
+        return matrix
+
+
+def _lookup_codes(values, resolve, missing) -> np.ndarray:
+    """Apply resolve to each distinct value and broadcast the results by code"""
+    import pandas as pd  # only training and offline scoring encode frames; the API stays pandas-free
+
+    codes, uniques = pd.factorize(values)
+    # Missing values get code -1, which indexes the trailing entry
+    table = np.array([resolve(value) for value in uniques] + [missing])
+    return table[codes]
+
+
+def field_getter(records):
+    """Pick dict-style or attribute-style field access for a batch"""
+    if records and isinstance(records[0], Mapping):
+        return lambda record, field: record[field]
+    return getattr
@@ -0,0 +1,208 @@
+"""
+Per geo-cluster historical aggregates
+Call counts, mean rating and drop rate per 0.1° cluster and per (cluster, operator, network)
+"""
+
+from typing import Dict, Mapping
+
+import numpy as np
+
+from feature_encoder import CATEGORY_COLUMNS, GEO_AGGREGATE_COLUMNS
+
+# Cluster size, matching the lat/lon rounding used for geo_cluster in training
+GEO_CLUSTER_DEGREES = 0.1
+
+# Pseudo-calls of the parent average mixed into every cluster and segment, so a
+# cell with a handful of calls is pulled towards its cluster (or the global) value
+SMOOTHING_CALLS = 20
+
+# Segment levels; anything else shares the trailing "other" code
+OPERATORS = tuple(CATEGORY_COLUMNS['operator'])
+NETWORK_TYPES = tuple(CATEGORY_COLUMNS['network_type'])
+N_SEGMENTS = (len(OPERATORS) + 1) * (len(NETWORK_TYPES) + 1)
+
+_OPERATOR_CODES = {value: i for i, value in enumerate(OPERATORS)}
+_NETWORK_CODES = {value: i for i, value in enumerate(NETWORK_TYPES)}
+
+
+def cluster_keys(latitude, longitude, cell_degrees: float = GEO_CLUSTER_DEGREES) -> np.ndarray:
+    """Integer cluster id for each coordinate pair"""
+    lat_offset = int(round(90 / cell_degrees))
+    lon_offset = int(round(180 / cell_degrees))
+    lat = np.round(np.asarray(latitude, dtype=np.float64) / cell_degrees).astype(np.int64)
+    lon = np.round(np.asarray(longitude, dtype=np.float64) / cell_degrees).astype(np.int64)
+    return (lat + lat_offset) * (2 * lon_offset + 1) + (lon + lon_offset)
+
+
+def segment_code(operator: str, network_type: str) -> int:
+    """Code of an (operator, network type) pair"""
+    return (_OPERATOR_CODES.get(operator, len(OPERATORS)) * (len(NETWORK_TYPES) + 1)
+            + _NETWORK_CODES.get(network_type, len(NETWORK_TYPES)))
+
+
+def segment_codes(operator, network_type) -> np.ndarray:
+    """Vectorized segment_code, resolving each distinct value once"""
+    def codes(values, table, other):
+        uniques, inverse = np.unique(np.asarray(values, dtype=object).astype(str), return_inverse=True)
+        return np.array([table.get(value, other) for value in uniques], dtype=np.int64)[inverse]
+
+    return (codes(operator, _OPERATOR_CODES, len(OPERATORS)) * (len(NETWORK_TYPES) + 1)
+            + codes(network_type, _NETWORK_CODES, len(NETWORK_TYPES)))
+
+
+def _group_stats(keys: np.ndarray, rating: np.ndarray, dropped: np.ndarray) -> tuple:
+    """(sorted unique keys, inverse, calls, rating sums, drop counts)"""
+    unique, inverse = np.unique(keys, return_inverse=True)
+    calls = np.bincount(inverse, minlength=len(unique)).astype(np.float64)
+    rating_sum = np.bincount(inverse, weights=rating, minlength=len(unique))
+    drops = np.bincount(inverse, weights=dropped, minlength=len(unique))
+    return unique, inverse, calls, rating_sum, drops
+
+
+def _positions(sorted_keys: np.ndarray, keys: np.ndarray) -> np.ndarray:
+    """Index of each key in sorted_keys, or -1 when it is absent"""
+    if not len(sorted_keys):
+        return np.full(len(keys), -1, dtype=np.int64)
+    pos = np.minimum(np.searchsorted(sorted_keys, keys), len(sorted_keys) - 1)
+    return np.where(sorted_keys[pos] == keys, pos, -1)
+
+
+class GeoAggregates:
+    """Compact lookup table of smoothed historical aggregates
+
+    ``cluster_stats`` and ``segment_stats`` hold (calls, mean rating, drop
+    rate) rows aligned with the sorted ``cluster_keys`` and ``segment_keys``.
+    A segment unseen in training falls back to its cluster, and an unseen
+    cluster to the global averages, with a call count of 0.
+    """
+
+    def __init__(self, cluster_keys, cluster_stats, segment_keys, segment_stats, global_stats,
+                 cell_degrees: float = GEO_CLUSTER_DEGREES):
+        self.cluster_keys = np.asarray(cluster_keys, dtype=np.int64)
+        self.cluster_stats = np.asarray(cluster_stats, dtype=np.float32)
+        self.segment_keys = np.asarray(segment_keys, dtype=np.int64)
+        self.segment_stats = np.asarray(segment_stats, dtype=np.float32)
+        self.global_stats = np.asarray(global_stats, dtype=np.float32)
+        self.cell_degrees = float(cell_degrees)
+
+        # Hash indexes for single-row lookups
+        self._cluster_pos: Dict[int, int] = {key: i for i, key in enumerate(self.cluster_keys.tolist())}
+        self._segment_pos: Dict[int, int] = {key: i for i, key in enumerate(self.segment_keys.tolist())}
+
+    def __len__(self) -> int:
+        return len(self.cluster_keys)
+
+    @classmethod
+    def fit(cls, latitude, longitude, operator, network_type, rating, dropped,
+            smoothing: float = SMOOTHING_CALLS, cell_degrees: float = GEO_CLUSTER_DEGREES) -> 'GeoAggregates':
+        """Aggregate rated calls into cluster and segment statistics"""
+        rating = np.asarray(rating, dtype=np.float64)
+        dropped = np.asarray(dropped, dtype=np.float64)
+        global_rating = float(rating.mean()) if len(rating) else 0.0
+        global_drop = float(dropped.mean()) if len(dropped) else 0.0
+
+        clusters = cluster_keys(latitude, longitude, cell_degrees)
+        c_keys, c_inverse, c_calls, c_rating, c_drops = _group_stats(clusters, rating, dropped)
+        c_mean = (c_rating + smoothing * global_rating) / (c_calls + smoothing)
+        c_drop = (c_drops + smoothing * global_drop) / (c_calls + smoothing)
+
+        segments = clusters * N_SEGMENTS + segment_codes(operator, network_type)
+        s_keys, s_inverse, s_calls, s_rating, s_drops = _group_stats(segments, rating, dropped)
+        # Each segment's parent cluster, found through any one of its rows
+        parent = np.empty(len(s_keys), dtype=np.int64)
+        parent[s_inverse] = c_inverse
+        s_mean = (s_rating + smoothing * c_mean[parent]) / (s_calls + smoothing)
+        s_drop = (s_drops + smoothing * c_drop[parent]) / (s_calls + smoothing)
+
+        return cls(c_keys, np.column_stack([c_calls, c_mean, c_drop]),
+                   s_keys, np.column_stack([s_calls, s_mean, s_drop]),
+                   [0.0, global_rating, global_drop], cell_degrees)
+
+    @classmethod
+    def fit_frame(cls, frame, smoothing: float = SMOOTHING_CALLS) -> 'GeoAggregates':
+        """Fit on a cleaned MyCall DataFrame"""
+        return cls.fit(frame['latitude'], frame['longitude'], frame['operator'], frame['network_type'],
+                       frame['rating'], frame['calldrop_category'] == 'Call Dropped', smoothing)
+
+    @classmethod
+    def from_arrays(cls, arrays: Mapping[str, np.ndarray]) -> 'GeoAggregates':
+        return cls(**{name: arrays[name] for name in cls.array_names()})
+
+    @staticmethod
+    def array_names() -> tuple:
+        return ('cluster_keys', 'cluster_stats', 'segment_keys', 'segment_stats',
+                'global_stats', 'cell_degrees')
+
+    def to_arrays(self) -> dict:
+        """Arrays saved with the model artifact"""
+        return {
+            'cluster_keys': self.cluster_keys,
+            'cluster_stats': self.cluster_stats,
+            'segment_keys': self.segment_keys,
+            'segment_stats': self.segment_stats,
+            'global_stats': self.global_stats,
+            'cell_degrees': np.float64(self.cell_degrees),
+        }
+
+    @property
+    def nbytes(self) -> int:
+        return sum(np.asarray(array).nbytes for array in self.to_arrays().values())
+
+    def lookup(self, latitude: float, longitude: float, operator: str, network_type: str) -> tuple:
+        """The GEO_AGGREGATE_COLUMNS values for one call, via two hash lookups"""
+        cluster = int(cluster_keys(latitude, longitude, self.cell_degrees))
+        c = self._cluster_pos.get(cluster)
+        cluster_row = self.global_stats if c is None else self.cluster_stats[c]
+        s = self._segment_pos.get(cluster * N_SEGMENTS + segment_code(operator, network_type))
+        if s is not None:
+            segment_row = self.segment_stats[s]
+        else:
+            segment_row = (0.0, cluster_row[1], cluster_row[2])
+        return (float(cluster_row[0]), float(cluster_row[1]), float(cluster_row[2]),
+                float(segment_row[0]), float(segment_row[1]), float(segment_row[2]))
+
+    def lookup_many(self, latitude, longitude, operator, network_type) -> np.ndarray:
+        """(n_rows, 6) GEO_AGGREGATE_COLUMNS matrix for arrays of calls
+
+        Lookups are a vectorized search of the sorted keys, which beats
+        per-row hashing once batches get large.
+        """
+        clusters = cluster_keys(latitude, longitude, self.cell_degrees)
+        values = np.empty((len(clusters), len(GEO_AGGREGATE_COLUMNS)), dtype=np.float32)
+
+        c = _positions(self.cluster_keys, clusters)
+        values[:, :3] = np.where((c >= 0)[:, None], self.cluster_stats[np.maximum(c, 0)], self.global_stats)
+
+        s = _positions(self.segment_keys, clusters * N_SEGMENTS + segment_codes(operator, network_type))
+        seen = s >= 0
+        values[:, 3] = np.where(seen, self.segment_stats[np.maximum(s, 0), 0], 0.0)
+        values[:, 4:6] = np.where(seen[:, None], self.segment_stats[np.maximum(s, 0), 1:], values[:, 1:3])
+        return values
+
+
+def out_of_fold_features(frame, n_folds: int = 5, seed: int = 42,
+                         smoothing: float = SMOOTHING_CALLS) -> np.ndarray:
+    """GEO_AGGREGATE_COLUMNS for every row, each computed without the row's own fold
+
+    Training on in-sample aggregates would let a row's rating leak into its
+    own features; this keeps the design matrix honest while the shipped table
+    is fitted on all rows.
+    """
+    n_rows = len(frame)
+    folds = np.random.default_rng(seed).integers(0, n_folds, size=n_rows)
+    latitude = np.asarray(frame['latitude'], dtype=np.float64)
+    longitude = np.asarray(frame['longitude'], dtype=np.float64)
+    operator = np.asarray(frame['operator'], dtype=object)
+    network_type = np.asarray(frame['network_type'], dtype=object)
+    rating = np.asarray(frame['rating'], dtype=np.float64)
+    dropped = np.asarray(frame['calldrop_category'] == 'Call Dropped')
+
+    values = np.empty((n_rows, len(GEO_AGGREGATE_COLUMNS)), dtype=np.float32)
+    for fold in range(n_folds):
+        held_out = folds == fold
+        train = ~held_out
+        fitted = GeoAggregates.fit(latitude[train], longitude[train], operator[train], network_type[train],
+                                   rating[train], dropped[train], smoothing)
+        values[held_out] = fitted.lookup_many(latitude[held_out], longitude[held_out],
+                                              operator[held_out], network_type[held_out])
+    return values
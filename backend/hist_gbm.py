@@ -0,0 +1,217 @@
+"""
+Histogram gradient boosting on native categoricals
+Trains HistGradientBoostingRegressor on category codes while taking the shared one-hot design matrix
+"""
+
+from typing import List, Optional, Tuple
+
+import numpy as np
+from sklearn.base import BaseEstimator, RegressorMixin
+from sklearn.ensemble import HistGradientBoostingRegressor
+
+from feature_encoder import CATEGORICAL_FIELDS, CATEGORY_COLUMNS, FeatureEncoder
+
+
+def _in_bitset(bitset: np.ndarray, value: int) -> bool:
+    return bool((int(bitset[value // 32]) >> (value % 32)) & 1)
+
+
+def _dag_depth(left: List[int], right: List[int], root: int) -> int:
+    """Longest root-to-leaf path; chain nodes share children, so memoize"""
+    depth = {}
+    stack = [root]
+    while stack:
+        node = stack[-1]
+        if left[node] < 0:
+            depth[node] = 0
+            stack.pop()
+            continue
+        pending = [child for child in (left[node], right[node]) if child not in depth]
+        if pending:
+            stack.extend(pending)
+            continue
+        depth[node] = 1 + max(depth[left[node]], depth[right[node]])
+        stack.pop()
+    return depth[root]
+
+
+class CategoricalHistGradientBoosting(RegressorMixin, BaseEstimator):
+    """HistGradientBoostingRegressor over category codes
+
+    Takes the same one-hot matrix as the other models, so the API, lookup
+    table and cache are unchanged. Each one-hot group (operator, network
+    type, location context, call drop category, top states) is collapsed to
+    one code column, with an extra code for "none set", and handed to the
+    booster as a native categorical feature.
+    """
+
+    def __init__(self, feature_columns: Optional[List[str]] = None, learning_rate: float = 0.1,
+                 max_iter: int = 200, max_leaf_nodes: int = 31, min_samples_leaf: int = 20,
+                 l2_regularization: float = 0.0, early_stopping='auto', random_state=None):
+        self.feature_columns = feature_columns
+        self.learning_rate = learning_rate
+        self.max_iter = max_iter
+        self.max_leaf_nodes = max_leaf_nodes
+        self.min_samples_leaf = min_samples_leaf
+        self.l2_regularization = l2_regularization
+        self.early_stopping = early_stopping
+        self.random_state = random_state
+
+    def _layout(self) -> Tuple[List[int], List[List[int]]]:
+        """Numeric column indices and the one-hot column indices of each group"""
+        encoder = FeatureEncoder(self.feature_columns)
+        groups = [[encoder.column_index[col] for col in CATEGORY_COLUMNS[field].values()
+                   if col in encoder.column_index]
+                  for field in CATEGORICAL_FIELDS]
+        groups.append(sorted(encoder.state_index.values()))
+        grouped = {i for group in groups for i in group}
+        numeric = [i for i in range(encoder.n_features) if i not in grouped]
+        return numeric, groups
+
+    def to_native(self, X) -> np.ndarray:
+        """One-hot matrix -> numeric columns followed by one code column per group"""
+        X = np.asarray(X, dtype=np.float64)
+        n_numeric = len(self.numeric_columns_)
+        native = np.zeros((len(X), n_numeric + len(self.groups_)))
+        native[:, :n_numeric] = X[:, self.numeric_columns_]
+        for g, cols in enumerate(self.groups_):
+            if cols:
+                hot = X[:, cols] > 0.5
+                native[:, n_numeric + g] = np.where(hot.any(axis=1), hot.argmax(axis=1), len(cols))
+        return native
+
+    def fit(self, X, y):
+        if self.feature_columns is None:
+            raise ValueError("feature_columns is required to find the one-hot groups")
+        self.numeric_columns_, self.groups_ = self._layout()
+        self.n_features_in_ = len(self.feature_columns)
+
+        categorical = np.array([False] * len(self.numeric_columns_) + [True] * len(self.groups_))
+        self.model_ = HistGradientBoostingRegressor(
+            categorical_features=categorical,
+            learning_rate=self.learning_rate,
+            max_iter=self.max_iter,
+            max_leaf_nodes=self.max_leaf_nodes,
+            min_samples_leaf=self.min_samples_leaf,
+            l2_regularization=self.l2_regularization,
+            early_stopping=self.early_stopping,
+            random_state=self.random_state,
+        )
+        self.model_.fit(self.to_native(X), y)
+        return self
+
+    def predict(self, X) -> np.ndarray:
+        return self.model_.predict(self.to_native(X))
+
+    def _booster_layout(self) -> Tuple[List[int], List[Optional[dict]]]:
+        """Native column of each booster feature, and each group's code -> booster category
+
+        Newer sklearn releases ordinal-encode categorical features and move
+        them in front of the numeric ones; older ones bin the columns as given,
+        with a code as its own category. Codes the booster never saw map to
+        None (they take the missing-value side).
+        """
+        model = self.model_
+        n_native = len(self.numeric_columns_) + len(self.groups_)
+        preprocessor = getattr(model, '_preprocessor', None)
+        if preprocessor is None:
+            return list(range(n_native)), [None] * len(self.groups_)
+
+        categorical = np.asarray(model.is_categorical_, dtype=bool)
+        native_of = np.flatnonzero(categorical).tolist() + np.flatnonzero(~categorical).tolist()
+        categories = preprocessor.named_transformers_['encoder'].categories_
+        codes = [{int(value): internal for internal, value in enumerate(values)} for values in categories]
+        return native_of, codes
+
+    def export_tree_ensemble(self) -> dict:
+        """Flatten into the tree_engine array format over the one-hot input
+
+        Numeric splits map onto their one-hot matrix column. A categorical
+        split becomes a chain of ``column <= 0.5`` tests, one per column of
+        the group, each sending a hot row to the side its code takes; rows
+        with no column set get the side of the "none" code. Chain nodes share
+        their targets, so each tree becomes a DAG, which the engine walks the
+        same way. Inputs are expected to be NaN-free, as encoder output is.
+        """
+        model = self.model_
+        known_bitsets, f_idx_map = model._bin_mapper.make_known_categories_bitsets()
+        n_numeric = len(self.numeric_columns_)
+        native_of, group_codes = self._booster_layout()
+
+        feature, threshold, left, right, value, roots = [], [], [], [], [], []
+        max_depth = 0
+        for predictors in model._predictors:
+            predictor = predictors[0]
+            nodes = predictor.nodes
+            offset = len(feature)
+            roots.append(offset)
+
+            # Original nodes keep their positions; chain nodes are appended after them
+            n_nodes = len(nodes)
+            feature.extend([0] * n_nodes)
+            threshold.extend([0.0] * n_nodes)
+            left.extend([-1] * n_nodes)
+            right.extend([-1] * n_nodes)
+            value.extend(np.where(nodes['is_leaf'], nodes['value'], 0.0).tolist())
+
+            for i in np.flatnonzero(~nodes['is_leaf'].astype(bool)):
+                f = int(nodes['feature_idx'][i])
+                native = native_of[f]
+                node_left = offset + int(nodes['left'][i])
+                node_right = offset + int(nodes['right'][i])
+                if not nodes['is_categorical'][i]:
+                    feature[offset + i] = self.numeric_columns_[native]
+                    threshold[offset + i] = float(nodes['num_threshold'][i])
+                    left[offset + i] = node_left
+                    right[offset + i] = node_right
+                    continue
+
+                cols = self.groups_[native - n_numeric]
+                codes = group_codes[native - n_numeric]
+                left_set = predictor.raw_left_cat_bitsets[nodes['bitset_idx'][i]]
+                known = known_bitsets[f_idx_map[f]]
+                missing_side = node_left if nodes['missing_go_to_left'][i] else node_right
+
+                def side(code: int) -> int:
+                    # Unknown categories follow the missing-value direction, as in sklearn
+                    if codes is not None:
+                        code = codes.get(code)
+                        if code is None:
+                            return missing_side
+                    if _in_bitset(left_set, code):
+                        return node_left
+                    return node_right if _in_bitset(known, code) else missing_side
+
+                if not cols:
+                    threshold[offset + i] = np.inf
+                    left[offset + i] = right[offset + i] = side(0)
+                    continue
+
+                positions = [offset + i] + list(range(len(feature), len(feature) + len(cols) - 1))
+                extra = len(cols) - 1
+                feature.extend([0] * extra)
+                threshold.extend([0.0] * extra)
+                left.extend([-1] * extra)
+                right.extend([-1] * extra)
+                value.extend([0.0] * extra)
+                for k, col in enumerate(cols):
+                    position = positions[k]
+                    feature[position] = col
+                    threshold[position] = 0.5
+                    right[position] = side(k)
+                    left[position] = positions[k + 1] if k + 1 < len(cols) else side(len(cols))
+
+            max_depth = max(max_depth, _dag_depth(left, right, offset))
+
+        return {
+            'feature': np.array(feature, dtype=np.int32),
+            'threshold': np.array(threshold, dtype=np.float64),
+            'left': np.array(left, dtype=np.int32),
+            'right': np.array(right, dtype=np.int32),
+            'value': np.array(value, dtype=np.float64),
+            'roots': np.array(roots, dtype=np.int32),
+            'max_depth': np.int32(max_depth),
+            'scale': np.float64(1.0),
+            'base': np.float64(np.ravel(model._baseline_prediction)[0]),
+            'n_features': np.int32(self.n_features_in_),
+        }
@@ -0,0 +1,112 @@
+"""
+Sized executor for CPU-bound inference
+Runs predictions off the event loop on a bounded thread or process pool
+"""
+
+import asyncio
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class ExecutorOverloaded(Exception):
+    """Raised when the executor already has max_pending tasks"""
+
+
+# Per-process model cache for the process pool, keyed by model version
+_worker_loader: Optional[Callable] = None
+_worker_models: Dict[str, object] = {}
+
+
+def _init_worker(loader: Callable, path: str):
+    """Process pool initializer: load the model once per worker process"""
+    global _worker_loader
+    _worker_loader = loader
+    try:
+        serving = loader(path)
+        _worker_models[serving.version] = serving
+    except Exception as e:
+        logger.error(f"Inference worker {os.getpid()} failed to preload {path}: {str(e)}")
+
+
+def _predict_in_worker(path: str, version: str, records: List[dict], interval: bool = False) -> np.ndarray:
+    serving = _worker_models.get(version)
+    if serving is None:
+        # The parent reloaded; load the new artifact and drop the old one
+        serving = _worker_loader(path)
+        _worker_models.clear()
+        _worker_models[serving.version] = serving
+    return serving.predict_with_interval(records) if interval else serving.predict_many(records)
+
+
+class InferenceExecutor:
+    """Bounded pool that scores ServingModel predictions
+
+    ``kind='thread'`` shares the loaded model with the API process; NumPy and
+    sklearn release the GIL for most of the work. ``kind='process'`` loads the
+    model once in each worker process and ships request fields across. At most
+    ``max_pending`` tasks may be queued or running; beyond that ``predict``
+    raises ExecutorOverloaded so callers can shed load instead of queueing.
+    """
+
+    def __init__(self, kind: str = 'thread', workers: Optional[int] = None,
+                 max_pending: Optional[int] = None, loader: Optional[Callable] = None,
+                 model_path: Optional[str] = None):
+        if kind not in ('thread', 'process'):
+            raise ValueError(f"Unknown executor kind: {kind}")
+        self.kind = kind
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending or self.workers * 4
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+
+        if kind == 'process':
+            if loader is None or model_path is None:
+                raise ValueError("Process executor needs a model loader and path")
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                             initargs=(loader, model_path))
+        else:
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='inference')
+
+    async def run(self, fn: Callable, *args):
+        """Run fn(*args) on the pool, rejecting when max_pending tasks are in flight"""
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise ExecutorOverloaded(f"{self.pending} inference tasks pending")
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._pool, fn, *args)
+        finally:
+            self.pending -= 1
+            self.completed += 1
+
+    async def predict(self, serving, requests: List, interval: bool = False) -> np.ndarray:
+        """Score requests with the given model version on the pool
+
+        With ``interval=True`` the result is an (n, 2) array of predictions
+        and interval half-widths.
+        """
+        if self.kind == 'thread':
+            fn = serving.predict_with_interval if interval else serving.predict_many
+            return await self.run(fn, requests)
+        records = [r if isinstance(r, dict) else r.model_dump() for r in requests]
+        return await self.run(_predict_in_worker, serving.path, serving.version, records, interval)
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        return {
+            'kind': self.kind,
+            'workers': self.workers,
+            'max_pending': self.max_pending,
+            'pending': self.pending,
+            'completed': self.completed,
+            'rejected': self.rejected,
+        }
@@ -0,0 +1,193 @@
+"""
+Incremental ingestion of monthly MyCall CSVs
+Keeps a cleaned Parquet store partitioned by month and only processes new or changed files
+"""
+
+import argparse
+import hashlib
+import json
+import os
+from datetime import datetime
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+from analytics_aggregates import AnalyticsAggregates
+from feature_encoder import MONTH_MAPPING
+from mycall_loader import conform, mycall_dtypes, narrow_coordinates, read_mycall_csv
+
+STORE_SCHEMA_VERSION = 3
+MANIFEST_NAME = 'manifest.json'
+KEY_INDEX_NAME = 'row_keys.npy'
+KEY_COLUMN = 'row_key'
+ANALYTICS_NAME = 'analytics.json'
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def row_keys(df: pd.DataFrame) -> np.ndarray:
+    """64-bit hash of every column of each row, the key drop_duplicates compares on
+
+    Hash the float64 coordinates as parsed from the file: narrowed to
+    float32, calls a few metres apart collide and are dropped as duplicates.
+    """
+    return pd.util.hash_pandas_object(df, index=False).to_numpy(dtype=np.uint64)
+
+
+def clean_month(df: pd.DataFrame) -> pd.DataFrame:
+    """The validity filters from the training script, applied to one month"""
+    df = df[(df['latitude'] > 0) | (df['state_name'].notna())]
+    return df.dropna(subset=['state_name'])
+
+
+class IngestStore:
+    """Cleaned, deduplicated MyCall rows as month=<Month>/<source>.parquet parts
+
+    ``manifest.json`` records the sha256 of every ingested source file, and
+    ``row_keys.npy`` is the sorted hash index used to drop rows already in the
+    store. Each part keeps its rows' keys, so replacing a changed file removes
+    exactly the keys it contributed. ``analytics.json`` holds each source's
+    running analysis aggregates, updated from just the rows a file adds.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self.manifest = self._read_manifest()
+        key_path = os.path.join(path, KEY_INDEX_NAME)
+        self.keys = np.load(key_path) if os.path.exists(key_path) else np.empty(0, dtype=np.uint64)
+        self.dtypes = mycall_dtypes()
+        self.analytics = self._read_analytics()
+
+    def _read_manifest(self) -> dict:
+        manifest_path = os.path.join(self.path, MANIFEST_NAME)
+        if not os.path.exists(manifest_path):
+            return {'schema_version': STORE_SCHEMA_VERSION, 'files': {}}
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        if manifest.get('schema_version') != STORE_SCHEMA_VERSION:
+            raise ValueError(f"Unsupported ingest store schema version: {manifest.get('schema_version')}; "
+                             f"delete {self.path} to rebuild it")
+        return manifest
+
+    def _read_analytics(self) -> AnalyticsAggregates:
+        analytics_path = os.path.join(self.path, ANALYTICS_NAME)
+        if os.path.exists(analytics_path):
+            return AnalyticsAggregates.load(analytics_path)
+        # Stores from before the aggregates existed are backfilled once from their parts
+        analytics = AnalyticsAggregates()
+        for name, entry in self.manifest['files'].items():
+            analytics.add_frame(name, pd.read_parquet(os.path.join(self.path, entry['part'])))
+        if self.manifest['files']:
+            analytics.save(analytics_path)
+        return analytics
+
+    def _save(self):
+        # Key index and aggregates first, manifest last: a crash in between re-ingests the file cleanly
+        self.analytics.save(os.path.join(self.path, ANALYTICS_NAME))
+        key_tmp = os.path.join(self.path, KEY_INDEX_NAME + '.tmp.npy')
+        np.save(key_tmp, self.keys)
+        os.replace(key_tmp, os.path.join(self.path, KEY_INDEX_NAME))
+
+        manifest_tmp = os.path.join(self.path, MANIFEST_NAME + '.tmp')
+        with open(manifest_tmp, 'w') as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(manifest_tmp, os.path.join(self.path, MANIFEST_NAME))
+
+    def part_path(self, source: str, month: str) -> str:
+        stem = os.path.splitext(os.path.basename(source))[0]
+        return os.path.join(self.path, f'month={month}', f'{stem}.parquet')
+
+    def _drop_part(self, part: str):
+        """Remove a previously ingested part and its keys from the index"""
+        if not os.path.exists(part):
+            return
+        old_keys = pd.read_parquet(part, columns=[KEY_COLUMN])[KEY_COLUMN].to_numpy(dtype=np.uint64)
+        self.keys = self.keys[~np.isin(self.keys, old_keys)]
+        os.remove(part)
+
+    def ingest_file(self, source: str) -> dict:
+        """Ingest one monthly CSV if it is new or changed; returns its manifest entry"""
+        name = os.path.basename(source)
+        sha = file_sha256(source)
+        entry = self.manifest['files'].get(name)
+        if entry is not None and entry['sha256'] == sha:
+            return dict(entry, skipped=True)
+
+        month = name.split('_')[0]
+        part = self.part_path(source, month)
+        self._drop_part(part)
+
+        df = read_mycall_csv(source, month, self.dtypes, raw_coordinates=True)
+        raw_rows = len(df)
+
+        # Deduplicate within the file, then against everything already stored
+        keys = row_keys(df)
+        df = narrow_coordinates(df)
+        _, first = np.unique(keys, return_index=True)
+        keep = np.zeros(len(df), dtype=bool)
+        keep[first] = True
+        if self.keys.size:
+            keep &= ~np.isin(keys, self.keys)
+        df = df[keep]
+        df[KEY_COLUMN] = keys[keep]
+        df = clean_month(df)
+
+        os.makedirs(os.path.dirname(part), exist_ok=True)
+        tmp_part = part + '.tmp'
+        df.to_parquet(tmp_part, index=False)
+        os.replace(tmp_part, part)
+
+        # Aggregate only this file's new rows; a changed file replaces its old share
+        self.analytics.add_frame(name, df, replace=True)
+
+        # Index every new key, including rows the validity filters dropped, so
+        # later duplicates of them are dropped too (as drop_duplicates would)
+        self.keys = np.union1d(self.keys, keys[keep])
+        entry = {
+            'sha256': sha,
+            'month': month,
+            'part': os.path.relpath(part, self.path),
+            'rows_raw': raw_rows,
+            'rows_stored': len(df),
+            'ingested_at': datetime.now().isoformat(),
+        }
+        self.manifest['files'][name] = entry
+        self._save()
+        return dict(entry, skipped=False)
+
+    def ingest(self, sources: List[str]) -> Dict[str, dict]:
+        return {os.path.basename(source): self.ingest_file(source)
+                for source in sources if os.path.exists(source)}
+
+    def load(self) -> pd.DataFrame:
+        """All stored rows, months in calendar order"""
+        parts = sorted(
+            (entry for entry in self.manifest['files'].values()),
+            key=lambda entry: (MONTH_MAPPING.get(entry['month'], len(MONTH_MAPPING) + 1), entry['part'])
+        )
+        frames = [pd.read_parquet(os.path.join(self.path, entry['part'])) for entry in parts]
+        if not frames:
+            return pd.DataFrame()
+        # Parts with differing category sets concatenate as object; cast them back
+        return conform(pd.concat(frames, ignore_index=True).drop(columns=[KEY_COLUMN]), self.dtypes)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest monthly MyCall CSVs into the cleaned store")
+    parser.add_argument('sources', nargs='+', help="Monthly CSV files")
+    parser.add_argument('--store', default='mycall_store', help="Store directory")
+    args = parser.parse_args()
+
+    store = IngestStore(args.store)
+    for name, entry in store.ingest(args.sources).items():
+        status = "unchanged, skipped" if entry['skipped'] else f"{entry['rows_stored']:,} rows stored"
+        print(f"✅ {name}: {status}")
+    print(f"📦 Store holds {sum(e['rows_stored'] for e in store.manifest['files'].values()):,} clean rows")
@@ -0,0 +1,166 @@
+"""
+Request latency instrumentation
+Per-endpoint, per-stage latency histograms and request counters in Prometheus text format
+"""
+
+import threading
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Tuple
+
+from batch_scheduler import Histogram
+
+# Histogram bucket upper bounds, in seconds
+LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+                   0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+METRIC_PREFIX = 'callquality'
+
+_current_timer: ContextVar[Optional['StageTimer']] = ContextVar('stage_timer', default=None)
+
+
+class StageTimer:
+    """Stage boundaries of one request, buffered until the request completes
+
+    Each lap is one perf_counter call and a list append; the laps are only
+    folded into the shared histograms once the endpoint label is known.
+    """
+
+    __slots__ = ('started', 'last', 'laps')
+
+    def __init__(self):
+        self.started = self.last = time.perf_counter()
+        self.laps: List[Tuple[str, float]] = []
+
+    def lap(self, stage: str):
+        now = time.perf_counter()
+        self.laps.append((stage, now - self.last))
+        self.last = now
+
+
+def stage(name: str):
+    """Close the current request's stage ``name``; a no-op outside an instrumented request"""
+    timer = _current_timer.get()
+    if timer is not None:
+        timer.lap(name)
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels) -> str:
+    return ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items())
+
+
+class Metrics:
+    """In-process latency histograms and request counters"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.stages: Dict[Tuple[str, str], Histogram] = {}
+        self.requests: Dict[Tuple[str, str, int], int] = {}
+        self.errors: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _histogram(self, endpoint: str, stage_name: str) -> Histogram:
+        histogram = self.stages.get((endpoint, stage_name))
+        if histogram is None:
+            histogram = self.stages[(endpoint, stage_name)] = Histogram(self.buckets)
+        return histogram
+
+    def observe(self, endpoint: str, stage_name: str, seconds: float):
+        with self._lock:
+            self._histogram(endpoint, stage_name).observe(seconds)
+
+    def record(self, endpoint: str, method: str, status: int, timer: StageTimer):
+        """Fold a finished request's laps, total time and status into the counters"""
+        now = time.perf_counter()
+        with self._lock:
+            for stage_name, seconds in timer.laps:
+                self._histogram(endpoint, stage_name).observe(seconds)
+            if timer.laps:
+                # Everything after the handler's last stage: response validation, encoding, send
+                self._histogram(endpoint, 'serialize').observe(now - timer.last)
+            self._histogram(endpoint, 'total').observe(now - timer.started)
+            key = (endpoint, method, status)
+            self.requests[key] = self.requests.get(key, 0) + 1
+            if status >= 500:
+                self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+
+    def inference_observer(self) -> Callable[[str, float], None]:
+        """Callback for ServingModel stage timings, recorded under the 'inference' endpoint"""
+        return lambda stage_name, seconds: self.observe('inference', stage_name, seconds)
+
+    def render(self, gauges: Optional[List[tuple]] = None) -> str:
+        """Prometheus text exposition; ``gauges`` are (name, help, labels, value) tuples"""
+        lines = []
+        with self._lock:
+            stages = {key: (list(h.counts), h.count, h.total) for key, h in self.stages.items()}
+            requests = dict(self.requests)
+            errors = dict(self.errors)
+
+        name = f'{METRIC_PREFIX}_stage_duration_seconds'
+        lines += [f'# HELP {name} Request time per endpoint and stage',
+                  f'# TYPE {name} histogram']
+        for (endpoint, stage_name), (counts, count, total) in sorted(stages.items()):
+            labels = _labels(endpoint=endpoint, stage=stage_name)
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {count}')
+            lines.append(f'{name}_sum{{{labels}}} {total:.9f}')
+            lines.append(f'{name}_count{{{labels}}} {count}')
+
+        name = f'{METRIC_PREFIX}_requests_total'
+        lines += [f'# HELP {name} Requests by endpoint, method and status', f'# TYPE {name} counter']
+        for (endpoint, method, status), count in sorted(requests.items()):
+            lines.append(f'{name}{{{_labels(endpoint=endpoint, method=method, status=status)}}} {count}')
+
+        name = f'{METRIC_PREFIX}_request_errors_total'
+        lines += [f'# HELP {name} Requests answered with a 5xx status', f'# TYPE {name} counter']
+        for endpoint, count in sorted(errors.items()):
+            lines.append(f'{name}{{{_labels(endpoint=endpoint)}}} {count}')
+
+        for gauge_name, help_text, labels, value in gauges or []:
+            name = f'{METRIC_PREFIX}_{gauge_name}'
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} gauge']
+            lines.append(f'{name}{{{_labels(**labels)}}} {value}' if labels else f'{name} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing every HTTP request
+
+    Plain ASGI rather than BaseHTTPMiddleware, so it adds no extra task or
+    body buffering. Requests are labelled with the matched route template
+    (``/analytics/{view}``), keeping label cardinality bounded.
+    """
+
+    def __init__(self, app, metrics: Metrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        timer = StageTimer()
+        token = _current_timer.set(timer)
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            _current_timer.reset(token)
+            route = scope.get('route')
+            endpoint = getattr(route, 'path', None) or 'unmatched'
+            self.metrics.record(endpoint, scope['method'], status, timer)
@@ -0,0 +1,249 @@
+"""
+Versioned model bundle format
+A directory holding a JSON manifest plus the model arrays as memory-mappable .npy files
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import shutil
+from typing import Optional
+
+import numpy as np
+
+from feature_encoder import FeatureEncoder
+from geo_aggregates import GeoAggregates
+from tree_engine import TreeEnsemble, export_tree_ensemble
+
+BUNDLE_SCHEMA_VERSION = 1
+MANIFEST_NAME = 'manifest.json'
+
+# File prefix of the optional geo aggregate arrays
+GEO_PREFIX = 'geo_'
+
+# File prefix of the optional held-out rows the prediction intervals are calibrated on
+HOLDOUT_PREFIX = 'holdout_'
+
+# Each version's arrays live in their own arrays-<version>/ directory inside the bundle
+ARRAYS_DIR_PREFIX = 'arrays-'
+
+# Array and scalar fields stored for each engine kind
+ENGINE_ARRAYS = {
+    'tree_ensemble': ('feature', 'threshold', 'left', 'right', 'value', 'roots'),
+    'linear': ('coef',),
+}
+ENGINE_PARAMS = {
+    'tree_ensemble': ('max_depth', 'scale', 'base', 'n_features'),
+    'linear': ('intercept', 'n_features'),
+}
+
+
+class LinearEngine:
+    """NumPy evaluator for an exported linear regression"""
+
+    def __init__(self, coef, intercept, n_features):
+        self.coef = np.asarray(coef, dtype=np.float64)
+        self.intercept = float(intercept)
+        self.n_features = int(n_features)
+
+    def predict(self, X) -> np.ndarray:
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"Expected input with {self.n_features} features, got shape {X.shape}")
+        return X @ self.coef + self.intercept
+
+
+def export_engine(model) -> tuple:
+    """Return (kind, arrays, params) for a fitted sklearn model"""
+    if type(model).__name__ == 'LinearRegression':
+        return 'linear', {'coef': np.ravel(model.coef_).astype(np.float64)}, {
+            'intercept': float(np.ravel(model.intercept_)[0]),
+            'n_features': int(model.n_features_in_),
+        }
+
+    exported = export_tree_ensemble(model)
+    arrays = {name: exported[name] for name in ENGINE_ARRAYS['tree_ensemble']}
+    params = {name: exported[name].item() for name in ENGINE_PARAMS['tree_ensemble']}
+    return 'tree_ensemble', arrays, params
+
+
+def _checksum(path: str, names) -> str:
+    digest = hashlib.sha256()
+    for name in sorted(names):
+        digest.update(name.encode())
+        with open(os.path.join(path, f'{name}.npy'), 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def is_bundle(path: str) -> bool:
+    return os.path.isfile(os.path.join(path, MANIFEST_NAME))
+
+
+def save_bundle(path: str, model_data: dict) -> dict:
+    """Write model_data (the dict saved by the training script) as a bundle
+
+    Arrays are never rewritten in place: serving processes keep the previous
+    version's files memory-mapped, and changing them under a live mapping
+    gives torn reads or SIGBUS. Each version's arrays go to a fresh
+    ``arrays-<version>/`` directory, and swapping the manifest is what makes
+    the new version current.
+    """
+    kind, arrays, params = export_engine(model_data['model'])
+
+    # Aggregate lookup arrays travel with the model that was trained on them
+    geo_arrays = {GEO_PREFIX + name: array for name, array in (model_data.get('geo_aggregates') or {}).items()}
+    holdout_arrays = {HOLDOUT_PREFIX + name: array for name, array in (model_data.get('holdout') or {}).items()}
+
+    os.makedirs(path, exist_ok=True)
+    staging = os.path.join(path, f'.staging-{os.getpid()}')
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+    for name, array in {**arrays, **geo_arrays, **holdout_arrays}.items():
+        np.save(os.path.join(staging, f'{name}.npy'), np.ascontiguousarray(array))
+    checksum = _checksum(staging, list(arrays) + list(geo_arrays) + list(holdout_arrays))
+
+    arrays_dir = ARRAYS_DIR_PREFIX + checksum[:12]
+    if os.path.isdir(os.path.join(path, arrays_dir)):
+        # Same content as a version already on disk; keep the files readers may have mapped
+        shutil.rmtree(staging)
+    else:
+        os.rename(staging, os.path.join(path, arrays_dir))
+
+    manifest = {
+        'schema_version': BUNDLE_SCHEMA_VERSION,
+        'model_name': model_data['model_name'],
+        'feature_columns': list(model_data['feature_columns']),
+        'performance_metrics': model_data['performance_metrics'],
+        'feature_importance': model_data['feature_importance'],
+        'engine': {'kind': kind, 'arrays': sorted(arrays), 'params': params},
+        'arrays_dir': arrays_dir,
+        'checksum': checksum,
+    }
+    if geo_arrays:
+        manifest['geo_aggregates'] = sorted(geo_arrays)
+    if holdout_arrays:
+        manifest['holdout'] = sorted(holdout_arrays)
+
+    previous_dir = None
+    if is_bundle(path):
+        with open(os.path.join(path, MANIFEST_NAME)) as f:
+            previous_dir = json.load(f).get('arrays_dir')
+
+    # The manifest swap is atomic: a loader sees the old version or the new one
+    tmp_path = os.path.join(path, MANIFEST_NAME + '.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2, default=_json_default)
+    os.replace(tmp_path, os.path.join(path, MANIFEST_NAME))
+
+    # Older versions can go; the previous one stays for loaders that read its manifest
+    # just before the swap. Unlinking a mapped file leaves existing mappings intact.
+    for name in os.listdir(path):
+        if name.startswith(ARRAYS_DIR_PREFIX) and name not in (arrays_dir, previous_dir):
+            shutil.rmtree(os.path.join(path, name), ignore_errors=True)
+    for name in os.listdir(path):
+        if name.endswith('.npy'):
+            # Arrays of bundles written before versioned directories
+            os.remove(os.path.join(path, name))
+    return manifest
+
+
+class ModelBundle:
+    """A loaded bundle: manifest metadata plus an engine over memory-mapped arrays"""
+
+    def __init__(self, path: str, manifest: dict, engine, geo_arrays: Optional[dict] = None,
+                 holdout: Optional[dict] = None):
+        self.path = path
+        self.manifest = manifest
+        self.engine = engine
+        self.geo_arrays = geo_arrays
+        self.holdout = holdout
+
+    @property
+    def version(self) -> str:
+        return self.manifest['checksum'][:12]
+
+    def to_model_data(self) -> dict:
+        """Shape the bundle like the pickled model_data dict the API expects"""
+        return {
+            'model': self.engine,
+            'feature_columns': self.manifest['feature_columns'],
+            'model_name': self.manifest['model_name'],
+            'performance_metrics': self.manifest['performance_metrics'],
+            'feature_importance': self.manifest['feature_importance'],
+            'checksum': self.manifest['checksum'],
+            'geo_aggregates': self.geo_arrays,
+            'holdout': self.holdout,
+        }
+
+
+def load_bundle(path: str, mmap: bool = True, verify: bool = True) -> ModelBundle:
+    """Load a bundle; arrays are memory-mapped read-only so processes share the pages"""
+    with open(os.path.join(path, MANIFEST_NAME)) as f:
+        manifest = json.load(f)
+
+    if manifest.get('schema_version') != BUNDLE_SCHEMA_VERSION:
+        raise ValueError(f"Unsupported bundle schema version: {manifest.get('schema_version')}")
+
+    engine_spec = manifest['engine']
+    kind = engine_spec['kind']
+    if kind not in ENGINE_ARRAYS:
+        raise ValueError(f"Unsupported engine kind: {kind}")
+    geo_names = manifest.get('geo_aggregates', [])
+    holdout_names = manifest.get('holdout', [])
+    # Bundles written before versioned array directories keep their arrays at the top level
+    arrays_path = os.path.join(path, manifest.get('arrays_dir', ''))
+    if verify and _checksum(arrays_path, engine_spec['arrays'] + geo_names + holdout_names) != manifest['checksum']:
+        raise ValueError(f"Bundle checksum mismatch: {path}")
+
+    arrays = {
+        name: np.load(os.path.join(arrays_path, f'{name}.npy'), mmap_mode='r' if mmap else None)
+        for name in engine_spec['arrays']
+    }
+    if kind == 'tree_ensemble':
+        engine = TreeEnsemble(**arrays, **engine_spec['params'])
+    else:
+        engine = LinearEngine(**arrays, **engine_spec['params'])
+
+    geo_arrays = {name[len(GEO_PREFIX):]: np.load(os.path.join(arrays_path, f'{name}.npy'))
+                  for name in geo_names} or None
+    holdout = {name[len(HOLDOUT_PREFIX):]: np.load(os.path.join(arrays_path, f'{name}.npy'))
+               for name in holdout_names} or None
+    return ModelBundle(path, manifest, engine, geo_arrays, holdout)
+
+
+def convert_pickle(pickle_path: str, bundle_path: str, check_rows: Optional[np.ndarray] = None) -> dict:
+    """Convert a pickled model_data artifact into a bundle, checking it predicts the same"""
+    with open(pickle_path, 'rb') as f:
+        model_data = pickle.load(f)
+    manifest = save_bundle(bundle_path, model_data)
+
+    if check_rows is None:
+        geo_arrays = model_data.get('geo_aggregates')
+        geo_aggregates = GeoAggregates.from_arrays(geo_arrays) if geo_arrays is not None else None
+        check_rows = FeatureEncoder(model_data['feature_columns'], geo_aggregates).sample_rows(1024)
+    engine = load_bundle(bundle_path).engine
+    max_diff = float(np.max(np.abs(engine.predict(check_rows) - model_data['model'].predict(check_rows))))
+    if max_diff > 1e-6:
+        raise ValueError(f"Bundle predictions differ from the pickled model (max diff {max_diff:.2e})")
+    return manifest
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert a pickled model to a model bundle")
+    parser.add_argument('pickle_path', nargs='?', default='voice_call_quality_model.pkl')
+    parser.add_argument('bundle_path', nargs='?', default='voice_call_quality_model_bundle')
+    args = parser.parse_args()
+
+    manifest = convert_pickle(args.pickle_path, args.bundle_path)
+    print(f"✅ Bundle written to '{args.bundle_path}' "
+          f"({manifest['model_name']}, {manifest['engine']['kind']}, checksum {manifest['checksum'][:12]})")
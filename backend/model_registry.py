@@ -0,0 +1,301 @@
+"""
+Model registry for the prediction API
+Loads model artifacts, validates them and swaps the serving model atomically
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import pickle
+import threading
+import time
+from datetime import datetime
+from typing import Callable, List, Optional
+
+import numpy as np
+
+from feature_encoder import FeatureEncoder
+from geo_aggregates import GeoAggregates
+from model_bundle import LinearEngine, MANIFEST_NAME, is_bundle, load_bundle
+from prediction_interval import IntervalModel, calibrate, normal_half_width, spread_engine
+from prediction_table import DEFAULT_BOUNDS, PredictionTable
+from tree_engine import TreeEnsemble, check_parity, compile_model
+
+logger = logging.getLogger(__name__)
+
+
+def load_model_artifact(path: str) -> dict:
+    """Load a model bundle or a pickled model_data dict"""
+    if is_bundle(path):
+        return load_bundle(path).to_model_data()
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+
+def artifact_version(path: str, model_data: dict) -> str:
+    """Short content hash identifying a model artifact"""
+    if model_data.get('checksum'):
+        return model_data['checksum'][:12]
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()[:12]
+
+
+def artifact_signature(path: str) -> Optional[tuple]:
+    """Cheap change marker for an artifact: (mtime, size) of its pickle or manifest"""
+    target = os.path.join(path, MANIFEST_NAME) if os.path.isdir(path) else path
+    try:
+        stat = os.stat(target)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+class ServingModel:
+    """One loaded model version and everything needed to score with it
+
+    Instances are never mutated after loading, so a request that grabbed one
+    keeps a consistent model even if the registry swaps in a newer version.
+    """
+
+    def __init__(self, path: str, model_data: dict, version: str,
+                 tree_engine: Optional[TreeEnsemble] = None,
+                 prediction_table: Optional[PredictionTable] = None):
+        self.path = path
+        self.model_data = model_data
+        self.model = model_data['model']
+        self.model_name = model_data['model_name']
+        self.feature_columns = model_data['feature_columns']
+        self.performance_metrics = model_data['performance_metrics']
+        self.feature_importance = model_data['feature_importance']
+        geo_arrays = model_data.get('geo_aggregates')
+        self.geo_aggregates = GeoAggregates.from_arrays(geo_arrays) if geo_arrays is not None else None
+        self.encoder = FeatureEncoder(self.feature_columns, self.geo_aggregates)
+        if self.encoder.uses_geo_aggregates and self.geo_aggregates is None:
+            raise ValueError("Model uses geo aggregate features but the artifact has no aggregates table")
+        self.version = version
+        self.loaded_at = datetime.now().isoformat()
+        self.tree_engine = tree_engine
+        self.prediction_table = prediction_table
+        # Until calibrated against data, a normal interval around the training RMSE
+        self.interval = IntervalModel('residual', normal_half_width(self.performance_metrics['rmse'], 0.8), 0.8)
+        # Optional stage_observer(stage, seconds) told how long encoding and scoring take
+        self.stage_observer: Optional[Callable[[str, float], None]] = None
+        # Constant model_info block of API responses, set once loading has finished
+        self.response_info: Optional[dict] = None
+
+    def _lap(self, stage: str, started: float) -> float:
+        now = time.perf_counter()
+        self.stage_observer(stage, now - started)
+        return now
+
+    def predict_matrix(self, feature_matrix: np.ndarray) -> np.ndarray:
+        """Score an encoded feature matrix with the tree engine when it is available"""
+        if self.tree_engine is not None:
+            return self.tree_engine.predict(feature_matrix)
+        return self.model.predict(feature_matrix)
+
+    def predict_one(self, request) -> float:
+        """Predict a single request, using the lookup table where it covers the input"""
+        fields = (request.operator, request.network_type, request.inout_travelling,
+                  request.calldrop_category, request.latitude, request.longitude,
+                  request.state_name, request.month)
+        if self.prediction_table is not None:
+            prediction = self.prediction_table.predict_one(*fields)
+            if prediction is not None:
+                return prediction
+        return float(self.predict_matrix(self.encoder.encode_one(*fields))[0])
+
+    def predict_many(self, requests: List) -> np.ndarray:
+        """Predict a batch, using the lookup table where it covers the input"""
+        timed = self.stage_observer is not None
+        started = time.perf_counter() if timed else 0.0
+        if self.prediction_table is None:
+            return self._encode_and_predict(requests, timed, started)
+
+        predictions = self.prediction_table.predict_many(requests)
+        if timed:
+            started = self._lap('table', started)
+        missing = np.flatnonzero(np.isnan(predictions))
+        if missing.size:
+            predictions[missing] = self._encode_and_predict([requests[i] for i in missing], timed, started)
+        return predictions
+
+    def _encode_and_predict(self, requests: List, timed: bool, started: float) -> np.ndarray:
+        X = self.encoder.encode_many(requests)
+        if timed:
+            started = self._lap('encode', started)
+        predictions = self.predict_matrix(X)
+        if timed:
+            self._lap('model', started)
+        return predictions
+
+    def predict_with_interval(self, requests: List) -> np.ndarray:
+        """(n, 2) array of predictions and interval half-widths
+
+        Per-tree intervals score every row through the tree engine, which
+        yields the prediction and its spread together, so the lookup table is
+        skipped. Constant-width intervals keep the usual predict_many path.
+        """
+        if self.interval.per_row:
+            timed = self.stage_observer is not None
+            started = time.perf_counter() if timed else 0.0
+            X = self.encoder.encode_many(requests)
+            if timed:
+                started = self._lap('encode', started)
+            predictions, half_widths = self.interval.predict(X)
+            if timed:
+                self._lap('model', started)
+        else:
+            predictions = self.predict_many(requests)
+            half_widths = np.full(len(predictions), self.interval.scale)
+        return np.column_stack([predictions, half_widths])
+
+
+def attach_tree_engine(serving: ServingModel, sample: np.ndarray) -> Optional[TreeEnsemble]:
+    """Compile the flat-array engine and verify it matches model.predict"""
+    if isinstance(serving.model, (TreeEnsemble, LinearEngine)):
+        # Bundles already load as a NumPy engine
+        return None
+
+    engine = compile_model(serving.model)
+    if engine is None:
+        logger.info(f"Tree engine not available for {serving.model_name}, using model.predict")
+        return None
+
+    max_diff = check_parity(serving.model, engine, sample)
+    if max_diff > 1e-6:
+        logger.error(f"Tree engine disagrees with model.predict (max diff {max_diff:.2e}), disabled")
+        return None
+
+    logger.info(f"Tree engine compiled: {engine.n_trees} trees, depth {engine.max_depth}, "
+                f"max diff vs model.predict {max_diff:.2e}")
+    return engine
+
+
+def attach_prediction_table(serving: ServingModel, table_dir: str, resolution: float,
+                            dtype: str, records: List[dict]) -> PredictionTable:
+    """Load or build the lookup table and check it against the live model"""
+    if serving.encoder.uses_geo_aggregates:
+        # The table's coarse grid cannot follow per-cluster aggregate features
+        raise ValueError("Prediction table does not support models with geo aggregate features")
+    path = os.path.join(table_dir, f'prediction_table_{serving.version}.npy')
+    table = PredictionTable.load_or_build(
+        path, serving.model, serving.encoder,
+        resolution=resolution,
+        bounds=DEFAULT_BOUNDS,
+        dtype=dtype,
+        fingerprint=serving.version
+    )
+
+    if records:
+        max_error, covered = table.max_abs_error(serving.model, records)
+        logger.info(f"Prediction table max abs error vs live model: {max_error:.4f} "
+                    f"over {covered:,} validation rows")
+    else:
+        logger.warning("No validation data, skipping prediction table check")
+    return table
+
+
+def attach_interval(serving: ServingModel, coverage: float, method: str = 'auto') -> IntervalModel:
+    """Calibrate prediction intervals on the held-out rows saved with the model
+
+    ``method='auto'`` uses per-tree spread when the model is an averaging
+    ensemble and residual quantiles otherwise; ``'residual'`` always uses
+    the constant-width interval. Rows the model was trained on would make
+    the interval too narrow, so artifacts saved without a held-out split get
+    a normal interval around the test RMSE instead.
+    """
+    holdout = serving.model_data.get('holdout')
+    rmse = serving.performance_metrics['rmse']
+    if not holdout:
+        logger.warning(f"Model {serving.version} has no held-out rows; prediction intervals use "
+                       f"the test RMSE ({rmse:.4f}) with a constant width")
+        return IntervalModel('residual', normal_half_width(rmse, coverage), coverage)
+
+    engine = spread_engine(serving.model, serving.tree_engine) if method == 'auto' else None
+    X = np.asarray(holdout['X'], dtype=np.float32)
+    ratings = np.asarray(holdout['y'], dtype=np.float64)
+    interval = calibrate(serving.predict_matrix, X, ratings, coverage, rmse, engine)
+    logger.info(f"Prediction intervals: {interval.kind}, {coverage:.0%} coverage, "
+                f"scale {interval.scale:.4f} from {len(ratings):,} held-out rows")
+    return interval
+
+
+class ModelRegistry:
+    """Holds the active ServingModel and replaces it on reload
+
+    Loading and validation run on the caller's thread (keep them off the event
+    loop); the swap itself is a single reference assignment, so readers see
+    either the old model or the new one, never a mix.
+    """
+
+    def __init__(self, loader: Callable[[str], ServingModel],
+                 smoke_records: Optional[List[dict]] = None, max_smoke_mae: float = 1.0):
+        self.loader = loader
+        self.smoke_records = smoke_records or []
+        self.max_smoke_mae = max_smoke_mae
+        self.active: Optional[ServingModel] = None
+        self._reload_lock = threading.Lock()
+        self._listeners: List[Callable[[Optional[ServingModel], ServingModel], None]] = []
+
+    def add_listener(self, listener: Callable[[Optional[ServingModel], ServingModel], None]):
+        """Call listener(previous, current) after every swap"""
+        self._listeners.append(listener)
+
+    def validate(self, candidate: ServingModel):
+        """Raise ValueError if the candidate fails the smoke set"""
+        records = self.smoke_records
+        X = candidate.encoder.encode_many(records) if records else candidate.encoder.sample_rows(256)
+        predictions = candidate.predict_matrix(X)
+
+        if not np.all(np.isfinite(predictions)):
+            raise ValueError("Model produced non-finite predictions on the smoke set")
+        if predictions.min() < 0.0 or predictions.max() > 6.0:
+            raise ValueError(f"Model predictions out of range on the smoke set "
+                             f"({predictions.min():.2f} to {predictions.max():.2f})")
+
+        ratings = np.array([r.get('rating') for r in records], dtype=np.float64)
+        known = ~np.isnan(ratings)
+        if known.any():
+            mae = float(np.mean(np.abs(np.clip(predictions[known], 1.0, 5.0) - ratings[known])))
+            if mae > self.max_smoke_mae:
+                raise ValueError(f"Smoke set MAE {mae:.3f} exceeds {self.max_smoke_mae}")
+            logger.info(f"Model {candidate.version} smoke set MAE: {mae:.3f}")
+
+    def load(self, path: str) -> ServingModel:
+        """Load, validate and activate the artifact at path"""
+        with self._reload_lock:
+            candidate = self.loader(path)
+            self.validate(candidate)
+
+            previous = self.active
+            self.active = candidate
+            logger.info(f"Model {candidate.version} ({candidate.model_name}) active"
+                        + (f", replaced {previous.version}" if previous else ""))
+
+        for listener in self._listeners:
+            try:
+                listener(previous, candidate)
+            except Exception as e:
+                logger.error(f"Model swap listener failed: {str(e)}")
+        return candidate
+
+    async def watch(self, path: str, interval: float):
+        """Poll path and reload in a worker thread whenever the artifact changes"""
+        signature = artifact_signature(path)
+        while True:
+            await asyncio.sleep(interval)
+            current = artifact_signature(path)
+            if current is None or current == signature:
+                continue
+            signature = current
+            logger.info(f"Model artifact changed at {path}, reloading")
+            try:
+                await asyncio.to_thread(self.load, path)
+            except Exception as e:
+                logger.error(f"Model reload failed, keeping {self.active.version if self.active else 'none'}: "
+                             f"{str(e)}")
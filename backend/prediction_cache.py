@@ -0,0 +1,75 @@
+"""
+Bounded LRU/TTL cache for predictions
+Keyed on the encoded feature tuple so equivalent requests share one entry
+"""
+
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+
+class PredictionCache:
+    """Least-recently-used cache with per-entry expiry
+
+    get and put are meant for a single thread (the API's event loop). clear
+    may be called from any thread: it swaps in a fresh dict, so a concurrent
+    get or put finishes against the old one.
+    """
+
+    def __init__(self, max_size: int = 100000, ttl_seconds: float = 3600.0):
+        self.max_size = max_size
+        self.ttl = ttl_seconds
+        self._entries: OrderedDict = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entries = self._entries
+        entry = entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        value, expires_at = entry
+        if expires_at < time.monotonic():
+            entries.pop(key, None)
+            self.expirations += 1
+            self.misses += 1
+            return None
+
+        entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: Hashable, value: Any):
+        entries = self._entries
+        entries[key] = (value, time.monotonic() + self.ttl)
+        entries.move_to_end(key)
+        while len(entries) > self.max_size:
+            entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        """Drop every entry, e.g. when the model changes"""
+        self._entries = OrderedDict()
+        self.invalidations += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'ttl_seconds': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'invalidations': self.invalidations,
+        }
@@ -0,0 +1,130 @@
+"""
+Per-request prediction intervals
+Calibrated from per-tree spread for random forests, or from validation residuals otherwise
+"""
+
+import argparse
+import time
+from statistics import NormalDist
+from typing import Callable, Optional
+
+import numpy as np
+
+from tree_engine import TreeEnsemble, compile_model
+
+# Smallest per-tree spread used when calibrating, so identical trees do not divide by zero
+SPREAD_FLOOR = 1e-3
+
+
+class IntervalModel:
+    """Turns model inputs into predictions plus interval half-widths
+
+    ``kind='tree_spread'``: the half-width is ``scale`` times the standard
+    deviation across the trees of an averaging ensemble, computed in the same
+    pass as the prediction, so it differs per request. ``kind='residual'``:
+    a constant half-width, ``scale`` rating points.
+    """
+
+    def __init__(self, kind: str, scale: float, coverage: float,
+                 engine: Optional[TreeEnsemble] = None):
+        if kind not in ('tree_spread', 'residual'):
+            raise ValueError(f"Unknown interval kind: {kind}")
+        if kind == 'tree_spread' and engine is None:
+            raise ValueError("Tree spread intervals need an averaging tree engine")
+        self.kind = kind
+        self.scale = float(scale)
+        self.coverage = coverage
+        self.engine = engine
+
+    @property
+    def per_row(self) -> bool:
+        return self.kind == 'tree_spread'
+
+    def predict(self, X) -> tuple:
+        """Predictions and half-widths for an encoded matrix (tree_spread only)"""
+        predictions, spread = self.engine.predict_with_spread(X)
+        return predictions, self.scale * spread
+
+    def describe(self) -> dict:
+        return {'method': self.kind, 'coverage': self.coverage, 'scale': round(self.scale, 4)}
+
+
+def normal_half_width(rmse: float, coverage: float) -> float:
+    """Half-width of a normal interval with the given coverage"""
+    return NormalDist().inv_cdf((1 + coverage) / 2) * rmse
+
+
+def spread_engine(model, tree_engine: Optional[TreeEnsemble] = None) -> Optional[TreeEnsemble]:
+    """An averaging TreeEnsemble for the model, or None when per-tree spread does not apply"""
+    engine = model if isinstance(model, TreeEnsemble) else tree_engine
+    if engine is None:
+        engine = compile_model(model)
+    return engine if engine is not None and engine.is_averaging else None
+
+
+def calibrate(predict_matrix: Callable[[np.ndarray], np.ndarray], X: np.ndarray, ratings: np.ndarray,
+              coverage: float, rmse: float, engine: Optional[TreeEnsemble] = None) -> IntervalModel:
+    """Fit the interval scale so ``coverage`` of the rated rows fall inside
+
+    With an averaging engine, the scale is the coverage quantile of
+    |rating - prediction| / spread; otherwise it is the coverage quantile of
+    |rating - prediction|. Without rated rows, a normal interval around the
+    training RMSE is used.
+    """
+    if engine is not None:
+        if len(ratings):
+            predictions, spread = engine.predict_with_spread(X)
+            ratio = np.abs(ratings - np.clip(predictions, 1.0, 5.0)) / np.maximum(spread, SPREAD_FLOOR)
+            scale = float(np.quantile(ratio, coverage))
+        else:
+            scale = NormalDist().inv_cdf((1 + coverage) / 2)
+        return IntervalModel('tree_spread', scale, coverage, engine)
+
+    if len(ratings):
+        residuals = np.abs(ratings - np.clip(predict_matrix(X), 1.0, 5.0))
+        half_width = float(np.quantile(residuals, coverage))
+    else:
+        half_width = normal_half_width(rmse, coverage)
+    return IntervalModel('residual', half_width, coverage)
+
+
+def benchmark(model_path: str, validation_csv: str, batch_sizes, repeat: int, coverage: float):
+    """Time predict_many against predict_with_interval at several batch sizes"""
+    from model_registry import ServingModel, artifact_version, attach_interval, attach_tree_engine, load_model_artifact
+    from prediction_table import read_validation_records
+
+    records = read_validation_records(validation_csv)
+    if not records:
+        raise SystemExit(f"No usable rows in {validation_csv}")
+    model_data = load_model_artifact(model_path)
+    serving = ServingModel(model_path, model_data, artifact_version(model_path, model_data))
+    serving.tree_engine = attach_tree_engine(serving, serving.encoder.encode_many(records[:512]))
+    serving.interval = attach_interval(serving, coverage)
+
+    print(f"📊 INTERVAL OVERHEAD ({serving.model_name}, {serving.interval.kind}, best of {repeat}):")
+    print(f"   {'rows':>6}  {'point ms':>10}  {'interval ms':>12}  {'overhead':>9}")
+    for size in batch_sizes:
+        batch = (records * (size // len(records) + 1))[:size]
+        timings = {}
+        for name, fn in (('point', serving.predict_many), ('interval', serving.predict_with_interval)):
+            best = float('inf')
+            for _ in range(repeat):
+                started = time.perf_counter()
+                fn(batch)
+                best = min(best, time.perf_counter() - started)
+            timings[name] = best * 1000
+        overhead = (timings['interval'] / timings['point'] - 1) * 100
+        print(f"   {size:>6}  {timings['point']:>10.3f}  {timings['interval']:>12.3f}  {overhead:>8.1f}%")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark prediction interval overhead")
+    parser.add_argument('model_path', nargs='?', default='voice_call_quality_model.pkl')
+    parser.add_argument('--validation-csv', default='../data/cleaned_mycall_data.csv')
+    parser.add_argument('--batch-sizes', default='1,32,256,4096', help="Comma separated row counts")
+    parser.add_argument('--repeat', type=int, default=20, help="Timed runs per batch size")
+    parser.add_argument('--coverage', type=float, default=0.8, help="Target interval coverage")
+    args = parser.parse_args()
+
+    benchmark(args.model_path, args.validation_csv,
+              [int(size) for size in args.batch_sizes.split(',')], args.repeat, args.coverage)
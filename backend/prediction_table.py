@@ -0,0 +1,281 @@
+"""
+Precomputed prediction lookup table
+Serves predictions from a quantized lat/lon grid crossed with every categorical combination
+"""
+
+import csv
+import json
+import logging
+import os
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from feature_encoder import CATEGORICAL_FIELDS, FeatureEncoder, field_getter
+
+logger = logging.getLogger(__name__)
+
+# Bounding box covering India: (lat_min, lat_max, lon_min, lon_max)
+DEFAULT_BOUNDS = (6.0, 38.0, 68.0, 98.0)
+
+# Table axes, in storage order, before the lat/lon grid axes
+TABLE_FIELDS = CATEGORICAL_FIELDS + ('state_name', 'month')
+
+# Rows scored per model.predict call while building
+BUILD_CHUNK_ROWS = 262144
+
+
+def table_levels(encoder: FeatureEncoder) -> dict:
+    """Distinct encodings of each table field
+
+    Categorical fields and states are keyed by the one-hot column they set
+    (-1 for none), months by month number.
+    """
+    levels = {}
+    for field in CATEGORICAL_FIELDS:
+        columns = set(encoder.category_index[field].values())
+        columns.add(encoder.category_default[field])
+        levels[field] = sorted(columns)
+    levels['state_name'] = sorted(set(encoder.state_index.values()) | {-1})
+    levels['month'] = sorted({num for num, _ in encoder.month_index.values()})
+    return levels
+
+
+class PredictionTable:
+    """Model output over (categorical combination, lat, lon) grid cells
+
+    ``values`` has one axis per TABLE_FIELDS entry followed by the lat and lon
+    grid axes. Lookups bilinearly interpolate between the four surrounding
+    grid points; coordinates outside the grid return None so callers can fall
+    back to the live model.
+    """
+
+    def __init__(self, values: np.ndarray, encoder: FeatureEncoder, levels: dict,
+                 resolution: float, lat_min: float, lon_min: float, fingerprint: str = ''):
+        self.values = values
+        self.encoder = encoder
+        self.levels = levels
+        self.resolution = resolution
+        self.lat_min = lat_min
+        self.lon_min = lon_min
+        self.fingerprint = fingerprint
+        self.n_lat, self.n_lon = values.shape[-2:]
+        self.combo_shape = values.shape[:-2]
+        self._flat = values.reshape(-1, self.n_lat, self.n_lon)
+        self._positions = {field: {key: i for i, key in enumerate(levels[field])}
+                           for field in TABLE_FIELDS}
+
+    @property
+    def bounds(self) -> Tuple[float, float, float, float]:
+        return (self.lat_min, self.lat_min + (self.n_lat - 1) * self.resolution,
+                self.lon_min, self.lon_min + (self.n_lon - 1) * self.resolution)
+
+    @classmethod
+    def build(cls, model, encoder: FeatureEncoder, resolution: float = 1.0,
+              bounds: Tuple[float, float, float, float] = DEFAULT_BOUNDS,
+              dtype: str = 'float32', path: Optional[str] = None,
+              fingerprint: str = '') -> 'PredictionTable':
+        """Score the model over every grid cell, writing straight to ``path`` when given"""
+        lat_min, lat_max, lon_min, lon_max = bounds
+        n_lat = max(2, int(np.ceil((lat_max - lat_min) / resolution)) + 1)
+        n_lon = max(2, int(np.ceil((lon_max - lon_min) / resolution)) + 1)
+        levels = table_levels(encoder)
+        combo_shape = tuple(len(levels[field]) for field in TABLE_FIELDS)
+
+        if path is not None:
+            # Build under a temporary name so readers never map a half-written table
+            values = np.lib.format.open_memmap(path + '.tmp', mode='w+', dtype=dtype,
+                                               shape=combo_shape + (n_lat, n_lon))
+        else:
+            values = np.empty(combo_shape + (n_lat, n_lon), dtype=dtype)
+        flat = values.reshape(-1, n_lat * n_lon)
+
+        # One encoded row per categorical combination, coordinates left at zero
+        combos = _combo_matrix(encoder, levels, combo_shape)
+        lat_grid, lon_grid = np.meshgrid(lat_min + resolution * np.arange(n_lat),
+                                         lon_min + resolution * np.arange(n_lon), indexing='ij')
+        lat_grid = lat_grid.ravel().astype(np.float32)
+        lon_grid = lon_grid.ravel().astype(np.float32)
+        n_grid = lat_grid.size
+
+        combos_per_chunk = max(1, BUILD_CHUNK_ROWS // n_grid)
+        for start in range(0, len(combos), combos_per_chunk):
+            block = combos[start:start + combos_per_chunk]
+            X = np.repeat(block, n_grid, axis=0)
+            if encoder.latitude_idx >= 0:
+                X[:, encoder.latitude_idx] = np.tile(lat_grid, len(block))
+            if encoder.longitude_idx >= 0:
+                X[:, encoder.longitude_idx] = np.tile(lon_grid, len(block))
+            flat[start:start + len(block)] = model.predict(X).reshape(len(block), n_grid)
+
+        table = cls(values, encoder, levels, resolution, lat_min, lon_min, fingerprint)
+        if path is not None:
+            values.flush()
+            table._write_meta(path, dtype)
+            os.replace(path + '.tmp', path)
+        logger.info(f"Prediction table built: {values.size:,} cells, "
+                    f"{values.nbytes / 1e6:.1f} MB at {resolution}° resolution")
+        return table
+
+    @classmethod
+    def load(cls, path: str, encoder: FeatureEncoder, mmap: bool = True) -> 'PredictionTable':
+        """Load a saved table, memory-mapped read-only by default"""
+        with open(path + '.json') as f:
+            meta = json.load(f)
+        if meta['feature_columns'] != encoder.feature_columns:
+            raise ValueError("Prediction table was built for different feature columns")
+        values = np.load(path, mmap_mode='r' if mmap else None)
+        return cls(values, encoder, meta['levels'], meta['resolution'],
+                   meta['lat_min'], meta['lon_min'], meta['fingerprint'])
+
+    @classmethod
+    def load_or_build(cls, path: str, model, encoder: FeatureEncoder, resolution: float = 1.0,
+                      bounds: Tuple[float, float, float, float] = DEFAULT_BOUNDS,
+                      dtype: str = 'float32', fingerprint: str = '') -> 'PredictionTable':
+        """Reuse the table at ``path`` if it matches, otherwise rebuild it there"""
+        try:
+            table = cls.load(path, encoder)
+            if (table.fingerprint == fingerprint and table.resolution == resolution
+                    and table.values.dtype == np.dtype(dtype)
+                    and np.allclose(table.bounds[::2], bounds[::2])
+                    and table.bounds[1] >= bounds[1] and table.bounds[3] >= bounds[3]):
+                logger.info(f"Prediction table loaded from {path}")
+                return table
+        except (FileNotFoundError, ValueError, KeyError):
+            pass
+        return cls.build(model, encoder, resolution, bounds, dtype, path, fingerprint)
+
+    def _write_meta(self, path: str, dtype: str):
+        meta = {
+            'feature_columns': self.encoder.feature_columns,
+            'levels': self.levels,
+            'resolution': self.resolution,
+            'lat_min': self.lat_min,
+            'lon_min': self.lon_min,
+            'dtype': dtype,
+            'fingerprint': self.fingerprint,
+        }
+        with open(path + '.json', 'w') as f:
+            json.dump(meta, f, indent=2)
+
+    def _level_key(self, field: str, value) -> int:
+        if field == 'state_name':
+            return self.encoder.state_to_index(value)
+        if field == 'month':
+            return self.encoder.month_to_features(value)[0]
+        return self.encoder.category_to_index(field, value)
+
+    def predict_one(self, operator: str, network_type: str, inout_travelling: str,
+                    calldrop_category: str, latitude: float, longitude: float,
+                    state_name: str, month: str) -> Optional[float]:
+        """Interpolated prediction for one row, or None when the table cannot answer"""
+        fi = (latitude - self.lat_min) / self.resolution
+        fj = (longitude - self.lon_min) / self.resolution
+        if not (0.0 <= fi <= self.n_lat - 1 and 0.0 <= fj <= self.n_lon - 1):
+            return None
+
+        position = []
+        for field, value in zip(TABLE_FIELDS, (operator, network_type, inout_travelling,
+                                               calldrop_category, state_name, month)):
+            pos = self._positions[field].get(self._level_key(field, value))
+            if pos is None:
+                return None
+            position.append(pos)
+
+        i0 = min(int(fi), self.n_lat - 2)
+        j0 = min(int(fj), self.n_lon - 2)
+        ti = fi - i0
+        tj = fj - j0
+        cell = self.values[tuple(position)][i0:i0 + 2, j0:j0 + 2]
+        return float((1 - ti) * ((1 - tj) * cell[0, 0] + tj * cell[0, 1])
+                     + ti * ((1 - tj) * cell[1, 0] + tj * cell[1, 1]))
+
+    def predict_many(self, records: List) -> np.ndarray:
+        """Interpolated predictions for many rows, NaN where the table cannot answer"""
+        n_rows = len(records)
+        get = field_getter(records)
+        result = np.full(n_rows, np.nan)
+
+        fi = (np.array([get(r, 'latitude') for r in records], dtype=np.float64)
+              - self.lat_min) / self.resolution
+        fj = (np.array([get(r, 'longitude') for r in records], dtype=np.float64)
+              - self.lon_min) / self.resolution
+        ok = (fi >= 0) & (fi <= self.n_lat - 1) & (fj >= 0) & (fj <= self.n_lon - 1)
+
+        positions = []
+        for field in TABLE_FIELDS:
+            table = self._positions[field]
+            pos = np.fromiter((table.get(self._level_key(field, get(r, field)), -1) for r in records),
+                              dtype=np.intp, count=n_rows)
+            ok &= pos >= 0
+            positions.append(pos)
+
+        if not ok.any():
+            return result
+
+        combo = np.ravel_multi_index([pos[ok] for pos in positions], self.combo_shape)
+        fi = fi[ok]
+        fj = fj[ok]
+        i0 = np.minimum(fi.astype(np.intp), self.n_lat - 2)
+        j0 = np.minimum(fj.astype(np.intp), self.n_lon - 2)
+        ti = fi - i0
+        tj = fj - j0
+        v = self._flat
+        result[ok] = ((1 - ti) * ((1 - tj) * v[combo, i0, j0] + tj * v[combo, i0, j0 + 1])
+                      + ti * ((1 - tj) * v[combo, i0 + 1, j0] + tj * v[combo, i0 + 1, j0 + 1]))
+        return result
+
+    def max_abs_error(self, model, records: List) -> Tuple[float, int]:
+        """Max absolute difference from the live model over the rows the table covers"""
+        predictions = self.predict_many(records)
+        covered = np.flatnonzero(~np.isnan(predictions))
+        if covered.size == 0:
+            return float('nan'), 0
+        live = model.predict(self.encoder.encode_many([records[i] for i in covered]))
+        return float(np.max(np.abs(live - predictions[covered]))), int(covered.size)
+
+
+def _combo_matrix(encoder: FeatureEncoder, levels: dict, combo_shape: tuple) -> np.ndarray:
+    """Encoded feature rows for every categorical combination, in table order"""
+    positions = np.indices(combo_shape).reshape(len(combo_shape), -1)
+    n_combos = positions.shape[1]
+    matrix = np.zeros((n_combos, encoder.n_features), dtype=np.float32)
+    rows = np.arange(n_combos)
+
+    for axis, field in enumerate(TABLE_FIELDS[:-1]):
+        cols = np.asarray(levels[field], dtype=np.intp)[positions[axis]]
+        hot = cols >= 0
+        matrix[rows[hot], cols[hot]] = 1.0
+
+    month_num = np.asarray(levels['month'])[positions[-1]]
+    if encoder.month_idx >= 0:
+        matrix[:, encoder.month_idx] = month_num
+    if encoder.quarter_idx >= 0:
+        matrix[:, encoder.quarter_idx] = (month_num - 1) // 3 + 1
+    return matrix
+
+
+def read_validation_records(path: str) -> List[dict]:
+    """Read rows with valid coordinates from a cleaned MyCall CSV"""
+    records = []
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        for row in csv.DictReader(f):
+            try:
+                latitude = float(row['latitude'])
+                longitude = float(row['longitude'])
+            except (KeyError, TypeError, ValueError):
+                continue
+            if latitude <= 0 or not row.get('state_name'):
+                continue
+            records.append({
+                'operator': row['operator'],
+                'network_type': row['network_type'],
+                'inout_travelling': row['inout_travelling'],
+                'calldrop_category': row['calldrop_category'],
+                'latitude': latitude,
+                'longitude': longitude,
+                'state_name': row['state_name'],
+                'month': row.get('month', 'January'),
+                'rating': float(row['rating']) if row.get('rating') else None,
+            })
+    return records
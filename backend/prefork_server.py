@@ -0,0 +1,330 @@
+"""
+Pre-fork production server
+Loads the model once in a master process and forks uvicorn workers that share it copy-on-write
+"""
+
+import argparse
+import gc
+import logging
+import os
+import select
+import signal
+import socket
+import time
+from typing import Dict, List, Optional
+
+logger = logging.getLogger('prefork')
+
+# Seconds a new worker has to finish its startup before it is abandoned
+READY_TIMEOUT = 60.0
+
+# Seconds a stopping worker gets to finish in-flight requests before SIGKILL
+GRACEFUL_TIMEOUT = 30.0
+
+
+def available_cores() -> List[int]:
+    """CPUs this process may run on, trimmed to the container's CPU quota"""
+    if hasattr(os, 'sched_getaffinity'):
+        cores = sorted(os.sched_getaffinity(0))
+    else:
+        cores = list(range(os.cpu_count() or 1))
+    try:
+        # cgroup v2 quota, e.g. "200000 100000" for two CPUs or "max 100000"
+        with open('/sys/fs/cgroup/cpu.max') as f:
+            quota, period = f.read().split()
+        if quota != 'max':
+            cores = cores[:max(1, int(int(quota) / int(period)))]
+    except (OSError, ValueError):
+        pass
+    return cores
+
+
+def memory_usage(pid: int) -> Optional[Dict[str, int]]:
+    """Rss, Pss and shared/private bytes of a process, from /proc/<pid>/smaps_rollup"""
+    fields = {}
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == 'kB':
+                    fields[parts[0].rstrip(':')] = int(parts[1]) * 1024
+    except OSError:
+        return None
+    return {
+        'rss': fields.get('Rss', 0),
+        'pss': fields.get('Pss', 0),
+        'shared': fields.get('Shared_Clean', 0) + fields.get('Shared_Dirty', 0),
+        'private': fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0),
+    }
+
+
+def bind_socket(host: str, port: int, backlog: int = 2048) -> socket.socket:
+    """Listening socket created once in the master and inherited by every worker"""
+    family = socket.AF_INET6 if ':' in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(app, sock: socket.socket, ready_fd: int, log_level: str):
+    """Serve app on the inherited socket; writes to ready_fd once startup has finished"""
+    import asyncio
+    import uvicorn
+
+    # Drop the master's handlers; uvicorn installs its own for SIGINT/SIGTERM
+    for signum in (signal.SIGHUP, signal.SIGUSR1, signal.SIGTERM, signal.SIGINT):
+        signal.signal(signum, signal.SIG_DFL)
+
+    config = uvicorn.Config(app, log_level=log_level, lifespan='on')
+    server = uvicorn.Server(config)
+
+    async def notify_when_started():
+        while not server.started and not server.should_exit:
+            await asyncio.sleep(0.05)
+        os.write(ready_fd, b'1' if server.started else b'0')
+        os.close(ready_fd)
+
+    async def serve():
+        notifier = asyncio.create_task(notify_when_started())
+        await server.serve(sockets=[sock])
+        notifier.cancel()
+
+    asyncio.run(serve())
+
+
+class PreforkServer:
+    """Master process supervising a fixed number of uvicorn workers
+
+    The app module (and with it the model, validation rows, spatial index and
+    aggregates) is imported once here before forking, so its pages are shared
+    by every worker until one of them writes to them. ``gc.freeze`` keeps the
+    cyclic collector in the workers from touching, and so copying, those
+    objects.
+
+    Signals: SIGHUP reloads the model in the master and replaces the workers
+    one at a time (the workers' /admin/reload sends it), SIGUSR1 logs
+    per-worker memory, SIGTERM/SIGINT stop.
+    """
+
+    def __init__(self, app, registry, model_path: str, sock: socket.socket, workers: int,
+                 cores: List[int], pin_cpus: bool = False, log_level: str = 'info',
+                 graceful_timeout: float = GRACEFUL_TIMEOUT, memory_report_interval: float = 0.0):
+        self.app = app
+        self.registry = registry
+        self.model_path = model_path
+        self.sock = sock
+        self.n_workers = workers
+        self.cores = cores
+        self.pin_cpus = pin_cpus
+        self.log_level = log_level
+        self.graceful_timeout = graceful_timeout
+        self.memory_report_interval = memory_report_interval
+        # pid -> worker slot
+        self.workers: Dict[int, int] = {}
+        self._pending: List[str] = []
+        self._stopping = False
+
+    def _signal(self, action: str):
+        return lambda signum, frame: self._pending.append(action)
+
+    def spawn(self, slot: int) -> Optional[int]:
+        """Fork a worker for slot; returns its pid once it is serving, or None"""
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            code = 1
+            try:
+                if self.pin_cpus:
+                    os.sched_setaffinity(0, {self.cores[slot % len(self.cores)]})
+                run_worker(self.app, self.sock, write_fd, self.log_level)
+                code = 0
+            except BaseException:
+                logger.exception(f"Worker {os.getpid()} crashed")
+            finally:
+                os._exit(code)
+
+        os.close(write_fd)
+        try:
+            readable, _, _ = select.select([read_fd], [], [], READY_TIMEOUT)
+            ready = bool(readable) and os.read(read_fd, 1) == b'1'
+        finally:
+            os.close(read_fd)
+        if not ready:
+            logger.error(f"Worker {pid} did not start within {READY_TIMEOUT:.0f}s")
+            self.stop_worker(pid)
+            return None
+        self.workers[pid] = slot
+        logger.info(f"Worker {pid} serving (slot {slot})")
+        return pid
+
+    def stop_worker(self, pid: int):
+        """SIGTERM, let uvicorn drain in-flight requests, then SIGKILL"""
+        self.workers.pop(pid, None)
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            return
+        deadline = time.monotonic() + self.graceful_timeout
+        while time.monotonic() < deadline:
+            try:
+                done, _ = os.waitpid(pid, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if done:
+                return
+            time.sleep(0.05)
+        logger.warning(f"Worker {pid} did not stop within {self.graceful_timeout:.0f}s, killing it")
+        os.kill(pid, signal.SIGKILL)
+        os.waitpid(pid, 0)
+
+    def reap(self):
+        """Collect exited workers and replace the ones that died unexpectedly"""
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if not pid:
+                return
+            slot = self.workers.pop(pid, None)
+            if slot is not None and not self._stopping:
+                logger.error(f"Worker {pid} exited with status {os.waitstatus_to_exitcode(status)}, replacing it")
+                self.spawn(slot)
+
+    def rolling_restart(self):
+        """Reload the model in the master, then replace workers one at a time
+
+        Each replacement is serving before its predecessor is told to stop, and
+        all of them accept on the same socket, so capacity never drops below
+        the configured worker count and no connection is refused.
+        """
+        # Let the collector reach the old model again once nothing refers to it
+        gc.unfreeze()
+        try:
+            self.registry.load(self.model_path)
+        except Exception as e:
+            logger.error(f"Model reload failed, keeping the current workers: {str(e)}")
+            return
+        gc.collect()
+        gc.freeze()
+        for pid, slot in sorted(self.workers.items(), key=lambda item: item[1]):
+            if self.spawn(slot) is None:
+                logger.error("Rolling restart aborted; remaining workers keep the previous model")
+                return
+            self.stop_worker(pid)
+        logger.info(f"Rolling restart finished, serving model {self.registry.active.version}")
+        self.report_memory()
+
+    def report_memory(self):
+        """Log Rss, Pss and shared/private memory of the master and every worker
+
+        Rss counts shared pages in full for every process; Pss splits them
+        between the processes sharing them. With working copy-on-write, each
+        worker's Pss is far below its Rss and most of its Rss is shared.
+        """
+        rows = [('master', os.getpid())] + [(f'worker {slot}', pid)
+                                             for pid, slot in sorted(self.workers.items(), key=lambda i: i[1])]
+        total_rss = total_pss = 0
+        logger.info(f"{'process':10s} {'pid':>7s} {'rss MB':>9s} {'pss MB':>9s} {'shared MB':>10s} {'private MB':>11s}")
+        for name, pid in rows:
+            usage = memory_usage(pid)
+            if usage is None:
+                continue
+            total_rss += usage['rss']
+            total_pss += usage['pss']
+            logger.info(f"{name:10s} {pid:7d} {usage['rss'] / 1e6:9.1f} {usage['pss'] / 1e6:9.1f} "
+                        f"{usage['shared'] / 1e6:10.1f} {usage['private'] / 1e6:11.1f}")
+        if total_rss:
+            logger.info(f"Total: {total_rss / 1e6:,.1f} MB rss, {total_pss / 1e6:,.1f} MB pss "
+                        f"({1 - total_pss / total_rss:.0%} saved by sharing)")
+
+    def run(self):
+        signal.signal(signal.SIGHUP, self._signal('reload'))
+        signal.signal(signal.SIGUSR1, self._signal('report'))
+        signal.signal(signal.SIGTERM, self._signal('stop'))
+        signal.signal(signal.SIGINT, self._signal('stop'))
+
+        # Everything allocated so far is shared state; keep the collector off it
+        gc.collect()
+        gc.freeze()
+
+        for slot in range(self.n_workers):
+            if self.spawn(slot) is None:
+                self.shutdown()
+                raise SystemExit("❌ Worker failed to start")
+        logger.info(f"{self.n_workers} workers serving on {self.sock.getsockname()}")
+        self.report_memory()
+
+        next_report = time.monotonic() + self.memory_report_interval
+        while True:
+            while self._pending:
+                action = self._pending.pop(0)
+                if action == 'stop':
+                    self.shutdown()
+                    return
+                if action == 'reload':
+                    self.rolling_restart()
+                elif action == 'report':
+                    self.report_memory()
+            self.reap()
+            if self.memory_report_interval and time.monotonic() >= next_report:
+                self.report_memory()
+                next_report = time.monotonic() + self.memory_report_interval
+            time.sleep(0.2)
+
+    def shutdown(self):
+        self._stopping = True
+        logger.info(f"Stopping {len(self.workers)} workers")
+        for pid in list(self.workers):
+            os.kill(pid, signal.SIGTERM)
+        for pid in list(self.workers):
+            self.stop_worker(pid)
+        self.sock.close()
+
+
+if __name__ == "__main__":
+    cores = available_cores()
+    parser = argparse.ArgumentParser(description="Serve the prediction API from pre-forked workers")
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=int(os.getenv('WEB_WORKERS', '0')) or len(cores),
+                        help="Worker processes (default: WEB_WORKERS, else available cores)")
+    parser.add_argument('--pin-cpus', action='store_true', help="Pin each worker to its own core")
+    parser.add_argument('--graceful-timeout', type=float, default=GRACEFUL_TIMEOUT,
+                        help="Seconds a stopping worker gets to finish its requests")
+    parser.add_argument('--memory-report-interval', type=float, default=0.0,
+                        help="Log per-worker memory every this many seconds (0: only at start and on SIGUSR1)")
+    parser.add_argument('--log-level', default='info')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    workers = max(1, min(args.workers, len(cores)))
+    if workers < args.workers:
+        logger.warning(f"{args.workers} workers requested but only {len(cores)} cores available; using {workers}")
+
+    # Split the cores between the workers' inference pools instead of giving each one all of them
+    os.environ.setdefault('INFERENCE_WORKERS', str(max(1, len(cores) // workers)))
+
+    sock = bind_socket(args.host, args.port)
+
+    # Tells the workers' /admin/reload to hand reloads to this process
+    os.environ['PREFORK_MASTER_PID'] = str(os.getpid())
+
+    # Importing the API loads the model and data once, before any worker exists
+    import fastapi_backend as api
+
+    if api.registry.active is None:
+        raise SystemExit("❌ No model loaded; set MODEL_PATH")
+    if api.INFERENCE_EXECUTOR == 'process':
+        logger.warning("INFERENCE_EXECUTOR=process reloads the model in every pool process; "
+                       "use the thread executor to share it between workers")
+    if api.MODEL_WATCH_ENABLED:
+        logger.warning("MODEL_WATCH makes every worker load its own copy of a new model; "
+                       "send SIGHUP to the master for a shared rolling reload instead")
+
+    PreforkServer(api.app, api.registry, api.MODEL_PATH, sock, workers, cores, args.pin_cpus,
+                  args.log_level, args.graceful_timeout, args.memory_report_interval).run()
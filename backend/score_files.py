@@ -0,0 +1,233 @@
+"""
+Offline bulk scoring for MyCall CSV exports
+Splits files into chunks, scores them across a process pool and writes per-chunk outputs
+with rating_pred and prediction interval columns
+"""
+
+import argparse
+import glob
+import json
+import os
+import shutil
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from ingest import file_sha256
+from model_bundle import is_bundle
+from model_registry import (
+    ServingModel, artifact_version, attach_interval, attach_tree_engine, load_model_artifact
+)
+from mycall_loader import SENTINEL_COORDINATES, STATE_SENTINELS
+from prediction_interval import IntervalModel, spread_engine
+from stream_scoring import OUTPUT_COLUMNS, month_from_filename
+
+DEFAULT_MODEL_PATH = ('voice_call_quality_model_bundle' if is_bundle('voice_call_quality_model_bundle')
+                      else 'voice_call_quality_model.pkl')
+STRING_FIELDS = ('operator', 'network_type', 'inout_travelling', 'calldrop_category', 'state_name')
+# Records the model version, chunk size and input checksum a file's parts were scored with
+RUN_FILE = '_run.json'
+
+# Loaded once per worker process by _init_worker
+_serving: Optional[ServingModel] = None
+
+
+def load_scoring_model(model_path: str) -> ServingModel:
+    """The model with its flat-array tree engine attached"""
+    model_data = load_model_artifact(model_path)
+    serving = ServingModel(model_path, model_data, artifact_version(model_path, model_data))
+    serving.tree_engine = attach_tree_engine(serving, serving.encoder.sample_rows(512))
+    return serving
+
+
+def calibrate_interval(serving: ServingModel, coverage: float, method: str) -> Tuple[str, float, float]:
+    """Interval (kind, scale, coverage), calibrated once and shared with every worker"""
+    serving.interval = attach_interval(serving, coverage, method)
+    return serving.interval.kind, serving.interval.scale, serving.interval.coverage
+
+
+def _init_worker(model_path: str, interval: Tuple[str, float, float]):
+    global _serving
+    _serving = load_scoring_model(model_path)
+    kind, scale, coverage = interval
+    engine = spread_engine(_serving.model, _serving.tree_engine) if kind == 'tree_spread' else None
+    _serving.interval = IntervalModel(kind, scale, coverage, engine)
+
+
+def score_frame(frame: pd.DataFrame, default_month: str) -> np.ndarray:
+    """(n, 3) predictions and interval bounds for a raw chunk
+
+    Rows with unusable or placeholder (-1, NA) locations get NaN.
+    """
+    latitude = pd.to_numeric(frame['latitude'], errors='coerce')
+    longitude = pd.to_numeric(frame['longitude'], errors='coerce')
+    valid = (latitude.notna() & longitude.notna()
+             & ~latitude.isin(SENTINEL_COORDINATES) & ~longitude.isin(SENTINEL_COORDINATES)
+             & ~frame['state_name'].isin(STATE_SENTINELS)).to_numpy()
+
+    inputs = pd.DataFrame({field: frame[field].fillna('').astype(str) for field in STRING_FIELDS})
+    inputs['latitude'] = latitude
+    inputs['longitude'] = longitude
+    inputs['month'] = (frame['month'].fillna(default_month).astype(str)
+                       if 'month' in frame.columns else default_month)
+
+    scored = np.full((len(frame), 3), np.nan)
+    if valid.any():
+        X = _serving.encoder.encode_frame(inputs[valid])
+        if _serving.interval.per_row:
+            predictions, half_widths = _serving.interval.predict(X)
+        else:
+            predictions = _serving.predict_matrix(X)
+            half_widths = np.full(len(predictions), _serving.interval.scale)
+        bounds = np.column_stack([predictions, predictions - half_widths, predictions + half_widths])
+        scored[valid] = np.round(np.clip(bounds, 1.0, 5.0), 2)
+    return scored
+
+
+def write_frame(frame: pd.DataFrame, path: str, fmt: str):
+    """Write atomically so a crash never leaves a part that looks complete"""
+    tmp_path = path + '.tmp'
+    if fmt == 'parquet':
+        frame.to_parquet(tmp_path, index=False)
+    else:
+        frame.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+def score_chunk(frame: pd.DataFrame, default_month: str, out_path: str, fmt: str) -> int:
+    """Worker task: score one chunk and write its part file"""
+    for column, values in zip(OUTPUT_COLUMNS, score_frame(frame, default_month).T):
+        frame[column] = values
+    write_frame(frame, out_path, fmt)
+    return len(frame)
+
+
+def part_path(out_dir: str, source: str, index: int, fmt: str) -> str:
+    stem = os.path.splitext(os.path.basename(source))[0]
+    return os.path.join(out_dir, stem, f'part-{index:05d}.{fmt}')
+
+
+def check_resume(parts_dir: str, run: dict, resume: bool):
+    """Record how a file's parts were scored; refuse to resume onto parts scored differently
+
+    Parts are matched to chunks by index alone, so resuming is only safe with
+    the same model, the same chunk size and an unchanged input file.
+    """
+    run_path = os.path.join(parts_dir, RUN_FILE)
+    if resume and glob.glob(os.path.join(parts_dir, 'part-*')):
+        previous = {}
+        if os.path.exists(run_path):
+            with open(run_path) as f:
+                previous = json.load(f)
+        changed = [key for key in run if previous.get(key) != run[key]]
+        if changed:
+            raise SystemExit(f"❌ {parts_dir} holds parts scored with a different {', '.join(changed)}; "
+                             f"rerun with --no-resume or another --out-dir")
+    with open(run_path + '.tmp', 'w') as f:
+        json.dump(run, f, indent=2)
+    os.replace(run_path + '.tmp', run_path)
+
+
+def merge_csv_parts(out_dir: str, source: str) -> str:
+    """Concatenate a file's CSV parts into <stem>_scored.csv"""
+    stem = os.path.splitext(os.path.basename(source))[0]
+    parts = sorted(glob.glob(os.path.join(out_dir, stem, 'part-*.csv')))
+    merged = os.path.join(out_dir, f'{stem}_scored.csv')
+    with open(merged, 'w', newline='') as out:
+        for i, part in enumerate(parts):
+            with open(part) as f:
+                header = f.readline()
+                if i == 0:
+                    out.write(header)
+                for line in f:
+                    out.write(line)
+    return merged
+
+
+def score_files(inputs: List[str], model_path: str, out_dir: str, chunk_rows: int,
+                workers: int, fmt: str, resume: bool, merge: bool,
+                coverage: float = 0.8, interval_method: str = 'auto'):
+    if fmt == 'parquet':
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise SystemExit("Parquet output needs pyarrow: pip install pyarrow")
+
+    serving = load_scoring_model(model_path)
+    interval = calibrate_interval(serving, coverage, interval_method)
+    print(f"📐 Prediction intervals: {interval[0]}, {interval[2]:.0%} coverage, scale {interval[1]:.4f}")
+
+    started = time.perf_counter()
+    total_rows = 0
+    skipped_chunks = 0
+    max_in_flight = workers * 2
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(model_path, interval)) as pool:
+        for source in inputs:
+            file_started = time.perf_counter()
+            file_rows = 0
+            default_month = month_from_filename(source)
+            parts_dir = os.path.dirname(part_path(out_dir, source, 0, fmt))
+            if not resume and os.path.isdir(parts_dir):
+                # Stale parts past the new last chunk would otherwise be merged in
+                shutil.rmtree(parts_dir)
+            os.makedirs(parts_dir, exist_ok=True)
+            check_resume(parts_dir, {'model_version': serving.version, 'chunk_rows': chunk_rows,
+                                     'source_sha256': file_sha256(source)}, resume)
+
+            pending = set()
+            reader = pd.read_csv(source, chunksize=chunk_rows, encoding='utf-8-sig',
+                                 dtype=str, keep_default_na=False, na_values=[''])
+            for index, chunk in enumerate(reader):
+                out_path = part_path(out_dir, source, index, fmt)
+                if resume and os.path.exists(out_path):
+                    skipped_chunks += 1
+                    continue
+
+                # Bound in-flight chunks so memory stays flat on huge files
+                if len(pending) >= max_in_flight:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    file_rows += sum(future.result() for future in done)
+                pending.add(pool.submit(score_chunk, chunk, default_month, out_path, fmt))
+
+            done, _ = wait(pending)
+            file_rows += sum(future.result() for future in done)
+            total_rows += file_rows
+
+            elapsed = time.perf_counter() - file_started
+            print(f"✅ {os.path.basename(source)}: {file_rows:,} rows scored "
+                  f"in {elapsed:.2f}s ({file_rows / elapsed if elapsed else 0:,.0f} rows/sec)")
+            if merge and fmt == 'csv':
+                print(f"   Merged output: {merge_csv_parts(out_dir, source)}")
+
+    elapsed = time.perf_counter() - started
+    print(f"\n📊 Scored {total_rows:,} rows from {len(inputs)} file(s) in {elapsed:.2f}s "
+          f"({total_rows / elapsed if elapsed else 0:,.0f} rows/sec)")
+    if skipped_chunks:
+        print(f"   Resumed: {skipped_chunks} chunk(s) already scored were skipped")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score MyCall CSV exports with the trained model")
+    parser.add_argument('inputs', nargs='+', help="CSV files or glob patterns, e.g. '../data/*_MyCall_*.csv'")
+    parser.add_argument('--model', default=DEFAULT_MODEL_PATH, help="Model bundle directory or pickle")
+    parser.add_argument('--out-dir', default='scored', help="Directory for per-chunk outputs")
+    parser.add_argument('--chunk-rows', type=int, default=50000, help="Rows per chunk")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Worker processes")
+    parser.add_argument('--format', choices=('csv', 'parquet'), default='csv', help="Output format")
+    parser.add_argument('--no-resume', dest='resume', action='store_false',
+                        help="Rescore chunks that already have output files")
+    parser.add_argument('--merge', action='store_true', help="Concatenate CSV parts per input file")
+    parser.add_argument('--interval', choices=('auto', 'residual'), default='auto',
+                        help="Per-tree spread for random forests, or a constant residual width")
+    parser.add_argument('--interval-coverage', type=float, default=0.8, help="Target interval coverage")
+    args = parser.parse_args()
+
+    paths = sorted({path for pattern in args.inputs for path in (glob.glob(pattern) or [pattern])})
+    score_files(paths, args.model, args.out_dir, args.chunk_rows, args.workers,
+                args.format, args.resume, args.merge,
+                args.interval_coverage, args.interval)
@@ -7,56 +7,29 @@ X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_
 print(f"Training set: {X_train.shape[0]:,} samples")
 print(f"Test set: {X_test.shape[0]:,} samples")
 
-# Initialize models
-models = {
-    'Random Forest': RandomForestRegressor(n_estimators=100, random_state=42),
-    'Gradient Boosting': GradientBoostingRegressor(random_state=42),
-    'Linear Regression': LinearRegression()
-}
+# Search and cross-validate the candidate models in parallel
+from train_driver import print_leaderboard, run_search
 
-# Train and evaluate models
-model_results = {}
-trained_models = {}
+search_result = run_search(X_train, y_train, X_test, y_test, cv=5, feature_columns=feature_columns)
+print_leaderboard(search_result)
+search_result['leaderboard'].to_csv('training_leaderboard.csv', index=False)
 
-for name, model in models.items():
-    print(f"\n🔄 Training {name}...")
-    
-    # Train model
-    model.fit(X_train, y_train)
-    trained_models[name] = model
-    
-    # Predictions
-    y_pred_train = model.predict(X_train)
-    y_pred_test = model.predict(X_test)
-    
-    # Metrics
-    train_r2 = r2_score(y_train, y_pred_train)
-    test_r2 = r2_score(y_test, y_pred_test)
-    test_rmse = np.sqrt(mean_squared_error(y_test, y_pred_test))
-    test_mae = mean_absolute_error(y_test, y_pred_test)
-    
-    # Cross-validation
-    cv_scores = cross_val_score(model, X_train, y_train, cv=5, scoring='r2')
-    
-    model_results[name] = {
-        'Train R²': train_r2,
-        'Test R²': test_r2,
-        'Test RMSE': test_rmse,
-        'Test MAE': test_mae,
-        'CV R² Mean': cv_scores.mean(),
-        'CV R² Std': cv_scores.std()
-    }
-    
-    print(f"✅ {name} completed")
-    print(f"   Test R²: {test_r2:.4f}")
-    print(f"   Test RMSE: {test_rmse:.4f}")
-    print(f"   Cross-val R²: {cv_scores.mean():.4f} (±{cv_scores.std():.4f})")
+trained_models = search_result['models']
+model_results = search_result['results']
+for name, result in model_results.iterrows():
+    print(f"\n✅ {name} completed ({result['Fit Seconds']:.1f}s)")
+    print(f"   Params: {result['Params']}")
+    print(f"   Test R²: {result['Test R²']:.4f}")
+    print(f"   Test RMSE: {result['Test RMSE']:.4f}")
+    print(f"   Cross-val R²: {result['CV R² Mean']:.4f} (±{result['CV R² Std']:.4f})")
+    print(f"   Train time: {result['Train Seconds']:.2f}s, size: {result['Size KB']:,.0f} KB, "
+          f"latency: {result['Latency ms']:.3f} ms/row")
 
 # Results summary
 print(f"\n📊 MODEL PERFORMANCE COMPARISON:")
 print("=" * 45)
 
-results_df = pd.DataFrame(model_results).T
+results_df = model_results.drop(columns=['Params']).astype(float)
 print(results_df.round(4))
 
 # Best model selection
@@ -67,6 +40,7 @@ print(f"   R² Score: {results_df.loc[best_model_name, 'Test R²']:.4f}")
 print(f"   RMSE: {results_df.loc[best_model_name, 'Test RMSE']:.4f}")
 
 # Feature importance analysis
+feature_importance = pd.DataFrame(columns=['feature', 'importance'])
 if hasattr(best_model, 'feature_importances_'):
     print(f"\n🔍 FEATURE IMPORTANCE ANALYSIS ({best_model_name}):")
     print("-" * 50)
@@ -15,7 +15,10 @@ model_data = {
         'rmse': float(results_df.loc[best_model_name, 'Test RMSE']),
         'mae': float(results_df.loc[best_model_name, 'Test MAE'])
     },
-    'feature_importance': feature_importance.to_dict('records')[:10]
+    'feature_importance': feature_importance.to_dict('records')[:10],
+    'geo_aggregates': geo_aggregates.to_arrays() if geo_aggregates is not None else None,
+    # The test split, never seen in training; prediction intervals are calibrated on it
+    'holdout': {'X': np.asarray(X_test, dtype=np.float32), 'y': np.asarray(y_test, dtype=np.float64)}
 }
 
 # Save model using pickle
@@ -24,62 +27,29 @@ with open('voice_call_quality_model.pkl', 'wb') as f:
 
 print("✅ Model saved as 'voice_call_quality_model.pkl'")
 
+# Save the memory-mappable bundle the API serves from
+from model_bundle import load_bundle, save_bundle
+
+manifest = save_bundle('voice_call_quality_model_bundle', model_data)
+bundle_engine = load_bundle('voice_call_quality_model_bundle').engine
+parity = float(np.max(np.abs(bundle_engine.predict(X_test) - best_model.predict(X_test))))
+print(f"✅ Model bundle saved as 'voice_call_quality_model_bundle' "
+      f"({manifest['engine']['kind']}, checksum {manifest['checksum'][:12]}, "
+      f"max diff vs model.predict: {parity:.2e})")
+
 # Create prediction function for API
+from feature_encoder import FeatureEncoder
+
+encoder = FeatureEncoder(feature_columns, geo_aggregates)
+
 def predict_call_quality(operator, network_type, inout_travelling, calldrop_category, 
                         latitude, longitude, state_name, month):
     """
     Predict call quality rating based on input parameters
     """
-    # Create feature vector
-    features = {col: 0 for col in feature_columns}
-    
-    # Set basic features
-    features['latitude'] = latitude
-    features['longitude'] = longitude
-    features['month_num'] = month_mapping.get(month, 1)
-    features['quarter'] = ((features['month_num'] - 1) // 3) + 1
-    
-    # Set call quality features
-    if calldrop_category == 'Call Dropped':
-        features['is_call_dropped'] = 1
-    elif calldrop_category == 'Poor Voice Quality':
-        features['is_poor_quality'] = 1
-    
-    # Set location features
-    if inout_travelling == 'Indoor':
-        features['is_indoor'] = 1
-    elif inout_travelling == 'Outdoor':
-        features['is_outdoor'] = 1
-    elif inout_travelling == 'Travelling':
-        features['is_travelling'] = 1
-    
-    # Set network features
-    if network_type == '4G':
-        features['is_4g'] = 1
-    elif network_type == '3G':
-        features['is_3g'] = 1
-    elif network_type == '2G':
-        features['is_2g'] = 1
-    else:
-        features['is_unknown_network'] = 1
-    
-    # Set operator features
-    if operator == 'Airtel':
-        features['is_airtel'] = 1
-    elif operator == 'RJio':
-        features['is_rjio'] = 1
-    elif operator == 'VI':
-        features['is_vi'] = 1
-    elif operator == 'BSNL':
-        features['is_bsnl'] = 1
-    
-    # Set state features
-    state_col = f'is_{state_name.lower().replace(" ", "_")}'
-    if state_col in features:
-        features[state_col] = 1
-    
-    # Convert to array and predict
-    feature_array = np.array([list(features.values())])
+    # Encode with the same encoder the API uses
+    feature_array = encoder.encode_one(operator, network_type, inout_travelling, calldrop_category,
+                                       latitude, longitude, state_name, month)
     prediction = best_model.predict(feature_array)[0]
     
     # Ensure prediction is within valid range
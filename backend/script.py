@@ -1,13 +1,17 @@
 # ENHANCED VOICE CALL QUALITY PREDICTION SYSTEM
 # Building ML-based predictive models with advanced features
 
+import os
 import pandas as pd
 import numpy as np
-from sklearn.model_selection import train_test_split, cross_val_score, GridSearchCV
+from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
 from sklearn.linear_model import LinearRegression
 from sklearn.preprocessing import LabelEncoder, StandardScaler
 from sklearn.metrics import mean_squared_error, r2_score, mean_absolute_error
+from feature_encoder import GEO_AGGREGATE_COLUMNS, TRAINING_CATEGORY_DEFAULTS, FeatureEncoder, feature_columns_for
+from geo_aggregates import GeoAggregates, out_of_fold_features
+from ingest import IngestStore
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -21,22 +25,12 @@ csv_files = ['January_MyCall_2023.csv', 'February_MyCall_2023.csv', 'March_MyCal
              'July_MyCall_2023.csv', 'August_MyCall_2023.csv', 'September_MyCall_2023.csv', 
              'October_MyCall_2023.csv']
 
-# Load and clean data
-all_data = []
-for file in csv_files:
-    try:
-        df_temp = pd.read_csv(file)
-        month = file.split('_')[0]
-        df_temp['month'] = month
-        all_data.append(df_temp)
-    except FileNotFoundError:
-        continue
-
-# Combine and clean
-df_raw = pd.concat(all_data, ignore_index=True)
-df = df_raw.drop_duplicates()
-df = df[(df['latitude'] > 0) | (df['state_name'].notna())]
-df = df.dropna(subset=['state_name'])
+# Ingest new or changed month files into the cleaned store, then train from it
+store = IngestStore('mycall_store')
+for name, entry in store.ingest(csv_files).items():
+    status = "unchanged" if entry['skipped'] else f"{entry['rows_stored']:,} rows ingested"
+    print(f"   {name}: {status}")
+df = store.load()
 
 print(f"✅ Dataset loaded: {len(df):,} clean records")
 
@@ -49,75 +43,39 @@ df['lat_rounded'] = df['latitude'].round(1)
 df['lon_rounded'] = df['longitude'].round(1)
 df['geo_cluster'] = df['lat_rounded'].astype(str) + '_' + df['lon_rounded'].astype(str)
 
-# 2. Call quality binary features
-df['is_call_dropped'] = (df['calldrop_category'] == 'Call Dropped').astype(int)
-df['is_poor_quality'] = (df['calldrop_category'] == 'Poor Voice Quality').astype(int)
-df['is_satisfactory'] = (df['calldrop_category'] == 'Satisfactory').astype(int)
-
-# 3. Location context features
-df['is_indoor'] = (df['inout_travelling'] == 'Indoor').astype(int)
-df['is_outdoor'] = (df['inout_travelling'] == 'Outdoor').astype(int)
-df['is_travelling'] = (df['inout_travelling'] == 'Travelling').astype(int)
-
-# 4. Network technology features
-df['is_4g'] = (df['network_type'] == '4G').astype(int)
-df['is_3g'] = (df['network_type'] == '3G').astype(int)
-df['is_2g'] = (df['network_type'] == '2G').astype(int)
-df['is_unknown_network'] = (df['network_type'] == 'Unknown').astype(int)
-
-# 5. Operator features
-df['is_airtel'] = (df['operator'] == 'Airtel').astype(int)
-df['is_rjio'] = (df['operator'] == 'RJio').astype(int)
-df['is_vi'] = (df['operator'] == 'VI').astype(int)
-df['is_bsnl'] = (df['operator'] == 'BSNL').astype(int)
+# Historical count, rating and drop rate per cluster and per (cluster, operator, network),
+# shipped with the model so the API joins them in with a hash lookup. Opt-in with
+# GEO_FEATURES=1: models using them cannot be served from the prediction table
+GEO_FEATURES = os.getenv('GEO_FEATURES', '0') == '1'
+geo_aggregates = GeoAggregates.fit_frame(df) if GEO_FEATURES else None
 
-# 6. Temporal features
-month_mapping = {
-    'January': 1, 'February': 2, 'March': 3, 'April': 4, 'May': 5, 'June': 6,
-    'July': 7, 'August': 8, 'September': 9, 'October': 10
-}
-df['month_num'] = df['month'].map(month_mapping)
-df['quarter'] = ((df['month_num'] - 1) // 3) + 1
-
-# 7. State-based features (top performing states)
-top_states = df['state_name'].value_counts().head(10).index
-for state in top_states:
-    df[f'is_{state.lower().replace(" ", "_")}'] = (df['state_name'] == state).astype(int)
+# 2-7. Indicator and temporal features come from the shared FeatureEncoder,
+# which the API also uses, so training and serving encode rows identically
+state_counts = df['state_name'].value_counts()
+top_states = state_counts[state_counts > 0].head(10).index
+feature_columns = feature_columns_for(top_states, geo_aggregates=GEO_FEATURES)
+encoder = FeatureEncoder(feature_columns, geo_aggregates, TRAINING_CATEGORY_DEFAULTS)
 
 print(f"✅ Feature engineering completed")
 print(f"   - Geographic clustering: {df['geo_cluster'].nunique()} unique locations")
-print(f"   - Binary quality indicators: 3 features")
+if geo_aggregates is not None:
+    print(f"   - Geo aggregates: {len(GEO_AGGREGATE_COLUMNS)} features "
+          f"({len(geo_aggregates):,} clusters, {geo_aggregates.nbytes / 1024:,.0f} KB table)")
+print(f"   - Binary quality indicators: 2 features")
 print(f"   - Location context: 3 features") 
 print(f"   - Network technology: 4 features")
 print(f"   - Operator identification: 4 features")
 print(f"   - Temporal features: 2 features")
 print(f"   - State indicators: {len(top_states)} top states")
 
-# Prepare ML features
-feature_columns = [
-    # Core features
-    'latitude', 'longitude', 'month_num', 'quarter',
-    # Call quality indicators
-    'is_call_dropped', 'is_poor_quality',
-    # Location context
-    'is_indoor', 'is_outdoor', 'is_travelling',
-    # Network technology
-    'is_4g', 'is_3g', 'is_2g', 'is_unknown_network',
-    # Operators
-    'is_airtel', 'is_rjio', 'is_vi', 'is_bsnl'
-]
-
-# Add top state features
-for state in top_states:
-    state_col = f'is_{state.lower().replace(" ", "_")}'
-    if state_col in df.columns:
-        feature_columns.append(state_col)
-
 print(f"\n📊 MACHINE LEARNING FEATURES:")
 print(f"Total features: {len(feature_columns)}")
 print(f"Target variable: rating (1-5 scale)")
 
-X = df[feature_columns].fillna(0)
+X = pd.DataFrame(encoder.encode_frame(df), columns=feature_columns, index=df.index)
+if geo_aggregates is not None:
+    # Each row's aggregates come from the other folds, so its own rating never feeds its features
+    X[list(GEO_AGGREGATE_COLUMNS)] = out_of_fold_features(df)
 y = df['rating']
 
 print(f"Feature matrix shape: {X.shape}")
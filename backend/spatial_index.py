@@ -0,0 +1,165 @@
+"""
+Grid spatial index over historical calls
+Answers k-nearest-call queries by scanning only the grid cells around a coordinate
+"""
+
+import math
+from typing import List
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180.0
+
+
+def haversine_km(lat: float, lon: float, latitudes: np.ndarray, longitudes: np.ndarray) -> np.ndarray:
+    """Great-circle distance from one point to many, in km"""
+    lat1 = math.radians(lat)
+    lat2 = np.radians(latitudes)
+    dlat = lat2 - lat1
+    dlon = np.radians(longitudes - lon)
+    a = np.sin(dlat / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class SpatialIndex:
+    """Historical calls bucketed into a lat/lon grid, stored cell by cell
+
+    Points are sorted by row-major cell id, and ``offsets`` holds where each
+    cell starts, so a square block of cells is one slice per grid row. A query
+    grows the block until it has k calls and no unscanned cell can hold a
+    closer one, then ranks the candidates by haversine distance.
+    """
+
+    def __init__(self, latitude, longitude, rating, dropped, operator, network_type,
+                 cell_degrees: float = 0.25):
+        latitude = np.asarray(latitude, dtype=np.float64)
+        longitude = np.asarray(longitude, dtype=np.float64)
+        self.cell = cell_degrees
+        self.lat_min = float(latitude.min()) if len(latitude) else 0.0
+        self.lon_min = float(longitude.min()) if len(longitude) else 0.0
+        rows = self._row(latitude)
+        cols = self._col(longitude)
+        self.n_rows = int(rows.max()) + 1 if len(rows) else 1
+        self.n_cols = int(cols.max()) + 1 if len(cols) else 1
+
+        cell_ids = rows * self.n_cols + cols
+        order = np.argsort(cell_ids, kind='stable')
+        self.offsets = np.searchsorted(cell_ids[order], np.arange(self.n_rows * self.n_cols + 1))
+
+        self.latitude = latitude[order]
+        self.longitude = longitude[order]
+        self.rating = np.asarray(rating, dtype=np.float32)[order]
+        self.dropped = np.asarray(dropped, dtype=bool)[order]
+
+        # Categorical columns as small codes plus their labels
+        self.operators, operator_codes = np.unique(np.asarray(operator, dtype=object).astype(str),
+                                                   return_inverse=True)
+        self.network_types, network_codes = np.unique(np.asarray(network_type, dtype=object).astype(str),
+                                                      return_inverse=True)
+        self.operator = operator_codes.astype(np.uint8)[order]
+        self.network_type = network_codes.astype(np.uint8)[order]
+
+    def __len__(self) -> int:
+        return len(self.latitude)
+
+    @classmethod
+    def from_records(cls, records: List[dict], cell_degrees: float = 0.25) -> 'SpatialIndex':
+        """Build from rated rows such as read_validation_records output"""
+        rated = [r for r in records if r.get('rating') is not None]
+        return cls(
+            latitude=[r['latitude'] for r in rated],
+            longitude=[r['longitude'] for r in rated],
+            rating=[r['rating'] for r in rated],
+            dropped=[r['calldrop_category'] == 'Call Dropped' for r in rated],
+            operator=[r['operator'] for r in rated],
+            network_type=[r['network_type'] for r in rated],
+            cell_degrees=cell_degrees,
+        )
+
+    def _row(self, latitude):
+        return np.floor((np.asarray(latitude) - self.lat_min) / self.cell).astype(np.int64)
+
+    def _col(self, longitude):
+        return np.floor((np.asarray(longitude) - self.lon_min) / self.cell).astype(np.int64)
+
+    def _block(self, row: int, col: int, radius: int) -> np.ndarray:
+        """Indices of every point in the square of cells within radius of (row, col)"""
+        col_lo = max(col - radius, 0)
+        col_hi = min(col + radius, self.n_cols - 1)
+        if col_lo > col_hi:
+            return np.empty(0, dtype=np.int64)
+        ranges = []
+        for r in range(max(row - radius, 0), min(row + radius, self.n_rows - 1) + 1):
+            start = self.offsets[r * self.n_cols + col_lo]
+            stop = self.offsets[r * self.n_cols + col_hi + 1]
+            if stop > start:
+                ranges.append(np.arange(start, stop))
+        return np.concatenate(ranges) if ranges else np.empty(0, dtype=np.int64)
+
+    def _covered_km(self, latitude: float, longitude: float, radius: int, row: int, col: int) -> float:
+        """Distance within which every point is guaranteed to be inside the block"""
+        # Where the query sits inside its own cell, so each side's margin is exact
+        lat_in_cell = (latitude - self.lat_min) / self.cell - row
+        lon_in_cell = (longitude - self.lon_min) / self.cell - col
+        lat_margin = min(radius + lat_in_cell, radius + 1 - lat_in_cell) * self.cell
+        lon_margin = min(radius + lon_in_cell, radius + 1 - lon_in_cell) * self.cell
+        # A degree of longitude is shortest at the block's widest latitude
+        widest_lat = min(abs(latitude) + (radius + 1) * self.cell, 89.0)
+        margin_km = min(lat_margin * KM_PER_DEGREE,
+                        lon_margin * KM_PER_DEGREE * math.cos(math.radians(widest_lat)))
+        return max(margin_km, 0.0)
+
+    def nearest(self, latitude: float, longitude: float, k: int) -> tuple:
+        """(indices, distances_km) of the k nearest calls, closest first"""
+        k = min(k, len(self))
+        if k == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+
+        row = int(self._row(latitude))
+        col = int(self._col(longitude))
+        # A block this wide covers the whole grid, wherever the query is
+        max_radius = max(self.n_rows, self.n_cols) + abs(row) + abs(col)
+        radius = 1
+        while True:
+            candidates = self._block(row, col, radius)
+            if len(candidates) >= k:
+                distances = haversine_km(latitude, longitude,
+                                         self.latitude[candidates], self.longitude[candidates])
+                nearest = np.argpartition(distances, k - 1)[:k] if len(candidates) > k else np.arange(k)
+                kth = distances[nearest].max()
+                if radius >= max_radius or kth <= self._covered_km(latitude, longitude, radius, row, col):
+                    ranked = nearest[np.argsort(distances[nearest], kind='stable')]
+                    return candidates[ranked], distances[ranked]
+            radius = min(radius * 2, max_radius)
+
+    def summary(self, latitude: float, longitude: float, k: int) -> dict:
+        """The k nearest calls plus their aggregate rating, drop rate and operator mix"""
+        indices, distances = self.nearest(latitude, longitude, k)
+        neighbours = [
+            {
+                'latitude': float(self.latitude[i]),
+                'longitude': float(self.longitude[i]),
+                'rating': float(self.rating[i]),
+                'call_dropped': bool(self.dropped[i]),
+                'operator': str(self.operators[self.operator[i]]),
+                'network_type': str(self.network_types[self.network_type[i]]),
+                'distance_km': round(float(d), 3),
+            }
+            for i, d in zip(indices, distances)
+        ]
+        if not len(indices):
+            return {'neighbours': [], 'count': 0, 'avg_rating': None, 'rating_std': None,
+                    'drop_rate': None, 'operator_mix': {}, 'max_distance_km': None}
+
+        counts = np.bincount(self.operator[indices], minlength=len(self.operators))
+        return {
+            'neighbours': neighbours,
+            'count': len(indices),
+            'avg_rating': round(float(self.rating[indices].mean()), 3),
+            'rating_std': round(float(self.rating[indices].std()), 3),
+            'drop_rate': round(float(self.dropped[indices].mean()), 4),
+            'operator_mix': {str(name): round(float(c) / len(indices), 4)
+                             for name, c in zip(self.operators, counts) if c},
+            'max_distance_km': round(float(distances[-1]), 3),
+        }
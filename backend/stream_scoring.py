@@ -0,0 +1,162 @@
+"""
+Chunked CSV/NDJSON scoring
+Reads an uploaded file in fixed-size row chunks and streams it back with rating_pred and interval columns
+"""
+
+import asyncio
+import codecs
+import csv
+import io
+import json
+import os
+from itertools import islice
+from typing import AsyncIterator, Awaitable, BinaryIO, Callable, List, Optional
+
+import numpy as np
+
+from feature_encoder import MONTH_MAPPING
+from mycall_loader import SENTINEL_COORDINATES, STATE_SENTINELS
+
+REQUEST_FIELDS = ('operator', 'network_type', 'inout_travelling', 'calldrop_category',
+                  'latitude', 'longitude', 'state_name', 'month')
+PREDICTION_COLUMN = 'rating_pred'
+INTERVAL_COLUMNS = ('interval_low', 'interval_high')
+OUTPUT_COLUMNS = (PREDICTION_COLUMN,) + INTERVAL_COLUMNS
+
+
+def month_from_filename(path: str) -> str:
+    """'March_MyCall_2023.csv' -> 'March', the convention used by the training script"""
+    month = os.path.basename(path).split('_')[0]
+    return month if month in MONTH_MAPPING else ''
+
+
+def is_utf8(file: BinaryIO, block_size: int = 1 << 20) -> bool:
+    """Decode the whole file once, so bad bytes are caught before any output is sent"""
+    decoder = codecs.getincrementaldecoder('utf-8-sig')()
+    try:
+        for block in iter(lambda: file.read(block_size), b''):
+            decoder.decode(block)
+        decoder.decode(b'', final=True)
+    except UnicodeDecodeError:
+        return False
+    finally:
+        file.seek(0)
+    return True
+
+
+def to_record(row: dict, default_month: str) -> Optional[dict]:
+    """Pull the model inputs out of a raw row, or None if they are unusable
+
+    Rows without a month, or with placeholder coordinates or state (the
+    -1/NA rows of the raw exports), are not scored.
+    """
+    try:
+        record = {
+            'operator': str(row['operator']),
+            'network_type': str(row['network_type']),
+            'inout_travelling': str(row['inout_travelling']),
+            'calldrop_category': str(row['calldrop_category']),
+            'latitude': float(row['latitude']),
+            'longitude': float(row['longitude']),
+            'state_name': str(row['state_name']),
+            'month': str(row.get('month') or default_month),
+        }
+    except (KeyError, TypeError, ValueError):
+        return None
+    if (not record['month'] or record['state_name'] in STATE_SENTINELS
+            or record['latitude'] in SENTINEL_COORDINATES or record['longitude'] in SENTINEL_COORDINATES):
+        return None
+    return record
+
+
+class CsvChunks:
+    """CSV reader yielding row chunks and writing them back with predictions"""
+
+    media_type = 'text/csv'
+
+    def __init__(self, file: BinaryIO, chunk_rows: int, default_month: str):
+        self.text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+        self.reader = csv.DictReader(self.text)
+        self.chunk_rows = chunk_rows
+        self.default_month = default_month
+        self.fieldnames: List[str] = []
+
+    def header(self) -> str:
+        self.fieldnames = list(self.reader.fieldnames or [])
+        out = io.StringIO()
+        csv.writer(out).writerow(self.fieldnames + list(OUTPUT_COLUMNS))
+        return out.getvalue()
+
+    def read(self) -> List[dict]:
+        return list(islice(self.reader, self.chunk_rows))
+
+    def format(self, rows: List[dict], predictions: List[Optional[tuple]]) -> str:
+        out = io.StringIO()
+        writer = csv.writer(out)
+        for row, prediction in zip(rows, predictions):
+            writer.writerow([row.get(name, '') for name in self.fieldnames]
+                            + (['', '', ''] if prediction is None else list(prediction)))
+        return out.getvalue()
+
+
+class NdjsonChunks:
+    """NDJSON reader yielding object chunks and writing them back with predictions"""
+
+    media_type = 'application/x-ndjson'
+
+    def __init__(self, file: BinaryIO, chunk_rows: int, default_month: str):
+        self.text = io.TextIOWrapper(file, encoding='utf-8-sig')
+        self.chunk_rows = chunk_rows
+        self.default_month = default_month
+
+    def header(self) -> str:
+        return ''
+
+    def read(self) -> List[dict]:
+        rows = []
+        while len(rows) < self.chunk_rows:
+            line = self.text.readline()
+            if not line:
+                break
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError:
+                row = None
+            rows.append(row if isinstance(row, dict) else {'error': 'invalid JSON object'})
+        return rows
+
+    def format(self, rows: List[dict], predictions: List[Optional[tuple]]) -> str:
+        return ''.join(json.dumps({**row, **dict(zip(OUTPUT_COLUMNS, prediction or (None, None, None)))}) + '\n'
+                       for row, prediction in zip(rows, predictions))
+
+
+async def score_chunks(chunks, predict: Callable[[List[dict]], Awaitable[np.ndarray]]
+                       ) -> AsyncIterator[str]:
+    """Yield the scored file chunk by chunk; only one chunk is held in memory
+
+    ``predict`` returns an (n, 2) array of predictions and interval
+    half-widths; each row gets the clipped prediction and interval bounds.
+    """
+    header = await asyncio.to_thread(chunks.header)
+    if header:
+        yield header
+
+    while True:
+        rows = await asyncio.to_thread(chunks.read)
+        if not rows:
+            break
+
+        records = [to_record(row, chunks.default_month) for row in rows]
+        valid = [i for i, record in enumerate(records) if record is not None]
+        predictions: List[Optional[tuple]] = [None] * len(rows)
+        if valid:
+            scored = await predict([records[i] for i in valid])
+            scores, half_widths = scored[:, 0], scored[:, 1]
+            bounds = np.clip(np.column_stack([scores, scores - half_widths, scores + half_widths]), 1.0, 5.0)
+            for i, (score, low, high) in zip(valid, bounds.round(2).tolist()):
+                predictions[i] = (score, low, high)
+
+        yield chunks.format(rows, predictions)
@@ -0,0 +1,222 @@
+"""
+Synthetic MyCall data generator
+Fits the joint distributions of the cleaned data and streams seeded, arbitrarily large datasets
+"""
+
+import argparse
+import csv
+import glob
+import os
+import time
+from typing import Dict, Iterator, List
+
+import numpy as np
+
+from feature_encoder import MONTH_MAPPING
+from mycall_loader import COORDINATE_SENTINELS, STATE_SENTINELS
+from prediction_table import read_validation_records
+
+# Columns of the monthly exports, in file order
+RAW_COLUMNS = ('operator', 'inout_travelling', 'network_type', 'rating', 'calldrop_category',
+               'latitude', 'longitude', 'state_name')
+
+# Fields sampled together from their observed joint distribution
+JOINT_FIELDS = ('operator', 'inout_travelling', 'network_type', 'calldrop_category', 'state_name')
+
+# Coordinates are sampled per state from 0.1° cells, then placed uniformly inside the cell
+CELL_DEGREES = 0.1
+
+# Rows generated per chunk; each chunk has its own seeded stream
+CHUNK_ROWS = 1_000_000
+
+
+class MyCallDistribution:
+    """Empirical distributions fitted to cleaned MyCall rows
+
+    - the (operator, context, network, drop category, state) tuple, jointly
+    - the 0.1° coordinate cell given the state
+    - the rating given the drop category and operator
+    - the month, and the share of rows with placeholder location fields
+    """
+
+    def __init__(self, levels: Dict[str, List[str]], combos: np.ndarray, combo_weights: np.ndarray,
+                 cell_state: np.ndarray, cell_lat: np.ndarray, cell_lon: np.ndarray, cell_weights: np.ndarray,
+                 rating_weights: np.ndarray, month_weights: np.ndarray, placeholder_rate: float = 0.0):
+        self.levels = levels
+        self.combos = np.asarray(combos, dtype=np.int32)
+        self.combo_cdf = _cdf(combo_weights)
+        self.placeholder_rate = placeholder_rate
+        self.month_cdf = _cdf(month_weights)
+
+        # Cells sorted by state, with CDF values offset by the state index, so a
+        # row of state s draws its cell with one search for s + u
+        order = np.lexsort((cell_lon, cell_lat, cell_state))
+        self.cell_state = np.asarray(cell_state, dtype=np.int32)[order]
+        self.cell_lat = np.asarray(cell_lat, dtype=np.float64)[order]
+        self.cell_lon = np.asarray(cell_lon, dtype=np.float64)[order]
+        weights = np.asarray(cell_weights, dtype=np.float64)[order]
+        self.cell_cdf = np.empty(len(weights))
+        n_states = len(levels['state_name'])
+        for state in range(n_states):
+            in_state = self.cell_state == state
+            if in_state.any():
+                self.cell_cdf[in_state] = state + _cdf(weights[in_state])
+
+        # (drop category, operator, rating 1..5) cumulative probabilities
+        rating_weights = np.asarray(rating_weights, dtype=np.float64)
+        totals = rating_weights.sum(axis=2, keepdims=True)
+        # Pairs never seen fall back to the drop category's overall rating mix
+        fallback = rating_weights.sum(axis=1, keepdims=True)
+        rating_weights = np.where(totals > 0, rating_weights, np.broadcast_to(fallback, rating_weights.shape))
+        self.rating_cdf = np.cumsum(rating_weights, axis=2) / rating_weights.sum(axis=2, keepdims=True)
+
+    @classmethod
+    def fit(cls, records: List[dict], placeholder_rate: float = 0.0) -> 'MyCallDistribution':
+        """Fit to rated rows with valid coordinates, e.g. read_validation_records output"""
+        records = [r for r in records if r.get('rating') is not None]
+        if not records:
+            raise ValueError("No rated rows to fit")
+        levels = {field: sorted({r[field] for r in records}) for field in JOINT_FIELDS}
+        index = {field: {value: i for i, value in enumerate(values)} for field, values in levels.items()}
+        codes = np.array([[index[field][r[field]] for field in JOINT_FIELDS] for r in records], dtype=np.int32)
+
+        combos, combo_counts = np.unique(codes, axis=0, return_counts=True)
+
+        state = codes[:, JOINT_FIELDS.index('state_name')]
+        lat_cell = np.round(np.array([r['latitude'] for r in records]) / CELL_DEGREES).astype(np.int64)
+        lon_cell = np.round(np.array([r['longitude'] for r in records]) / CELL_DEGREES).astype(np.int64)
+        cells, cell_counts = np.unique(np.column_stack([state, lat_cell, lon_cell]), axis=0, return_counts=True)
+
+        ratings = np.clip(np.array([int(r['rating']) for r in records]), 1, 5)
+        rating_counts = np.zeros((len(levels['calldrop_category']), len(levels['operator']), 5))
+        np.add.at(rating_counts, (codes[:, JOINT_FIELDS.index('calldrop_category')],
+                                  codes[:, JOINT_FIELDS.index('operator')], ratings - 1), 1)
+
+        month_counts = np.zeros(len(MONTH_MAPPING))
+        for r in records:
+            month_counts[MONTH_MAPPING.get(r['month'], 1) - 1] += 1
+
+        return cls(levels, combos, combo_counts, cells[:, 0], cells[:, 1] * CELL_DEGREES,
+                   cells[:, 2] * CELL_DEGREES, cell_counts, rating_counts, month_counts, placeholder_rate)
+
+    def sample(self, n_rows: int, rng: np.random.Generator) -> Dict[str, np.ndarray]:
+        """Codes, ratings and coordinates for n_rows synthetic calls"""
+        combo = np.searchsorted(self.combo_cdf, rng.random(n_rows), side='right')
+        codes = self.combos[np.minimum(combo, len(self.combos) - 1)]
+        columns = {field: np.ascontiguousarray(codes[:, i]) for i, field in enumerate(JOINT_FIELDS)}
+
+        state = columns['state_name']
+        cell = np.searchsorted(self.cell_cdf, state + rng.random(n_rows), side='right')
+        cell = np.minimum(cell, len(self.cell_cdf) - 1)
+        jitter = rng.uniform(-CELL_DEGREES / 2, CELL_DEGREES / 2, size=(2, n_rows))
+        columns['latitude'] = (self.cell_lat[cell] + jitter[0]).astype(np.float32)
+        columns['longitude'] = (self.cell_lon[cell] + jitter[1]).astype(np.float32)
+
+        cdf = self.rating_cdf[columns['calldrop_category'], columns['operator']]
+        columns['rating'] = (1 + (rng.random(n_rows)[:, None] >= cdf[:, :4]).sum(axis=1)).astype(np.int8)
+
+        columns['month'] = np.minimum(np.searchsorted(self.month_cdf, rng.random(n_rows), side='right'),
+                                      len(MONTH_MAPPING) - 1).astype(np.int32)
+
+        # Raw exports carry rows with -1 coordinates and an NA state
+        columns['placeholder'] = rng.random(n_rows) < self.placeholder_rate if self.placeholder_rate else None
+        return columns
+
+
+def _cdf(weights) -> np.ndarray:
+    weights = np.asarray(weights, dtype=np.float64)
+    cdf = np.cumsum(weights) / weights.sum()
+    cdf[-1] = 1.0
+    return cdf
+
+
+def placeholder_share(paths: List[str]) -> float:
+    """Share of raw export rows whose state or coordinates are placeholders"""
+    rows = placeholders = 0
+    for path in paths:
+        with open(path, newline='', encoding='utf-8-sig') as f:
+            for row in csv.DictReader(f):
+                rows += 1
+                if row.get('state_name') in STATE_SENTINELS + ('',) or row.get('latitude') in COORDINATE_SENTINELS:
+                    placeholders += 1
+    return placeholders / rows if rows else 0.0
+
+
+def generate_tables(distribution: MyCallDistribution, n_rows: int, seed: int,
+                    include_month: bool = False, chunk_rows: int = CHUNK_ROWS) -> Iterator:
+    """Yield pyarrow tables of at most chunk_rows rows in the export schema
+
+    Chunk i is drawn from its own stream seeded with (seed, i), so the output
+    depends only on the seed, row count and chunk size.
+    """
+    import pyarrow as pa
+
+    labels = {field: pa.array(values, type=pa.string()) for field, values in distribution.levels.items()}
+    labels['state_name'] = pa.array(distribution.levels['state_name'] + ['NA'], type=pa.string())
+    month_labels = pa.array(list(MONTH_MAPPING), type=pa.string())
+    na_state = len(distribution.levels['state_name'])
+
+    for chunk, start in enumerate(range(0, n_rows, chunk_rows)):
+        size = min(chunk_rows, n_rows - start)
+        columns = distribution.sample(size, np.random.default_rng([seed, chunk]))
+        placeholder = columns['placeholder']
+        if placeholder is not None:
+            columns['latitude'][placeholder] = -1
+            columns['longitude'][placeholder] = -1
+            columns['state_name'][placeholder] = na_state
+
+        arrays = {}
+        for name in RAW_COLUMNS:
+            if name in labels:
+                # Gather the label strings by code in Arrow, never building Python strings
+                arrays[name] = labels[name].take(pa.array(columns[name]))
+            else:
+                arrays[name] = pa.array(columns[name])
+        if include_month:
+            arrays['month'] = month_labels.take(pa.array(columns['month']))
+        yield pa.table(arrays)
+
+
+def write_dataset(distribution: MyCallDistribution, path: str, n_rows: int, seed: int = 42,
+                  fmt: str = 'csv', include_month: bool = False, chunk_rows: int = CHUNK_ROWS) -> float:
+    """Stream n_rows synthetic rows to path as CSV or Parquet; returns rows per second"""
+    import pyarrow.csv as pa_csv
+    import pyarrow.parquet as pq
+
+    started = time.perf_counter()
+    writer = None
+    try:
+        for table in generate_tables(distribution, n_rows, seed, include_month, chunk_rows):
+            if writer is None:
+                writer = (pq.ParquetWriter(path, table.schema) if fmt == 'parquet'
+                          else pa_csv.CSVWriter(path, table.schema))
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+    return n_rows / (time.perf_counter() - started)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic MyCall data fitted to the cleaned dataset")
+    parser.add_argument('output', help="Output file (.csv or .parquet)")
+    parser.add_argument('--rows', type=int, default=10_000_000, help="Rows to generate")
+    parser.add_argument('--seed', type=int, default=42, help="Random seed; same seed, same data")
+    parser.add_argument('--source', default='../data/cleaned_mycall_data.csv', help="Cleaned CSV to fit")
+    parser.add_argument('--raw', default=None,
+                        help="Glob of raw monthly exports to copy the placeholder-row share from")
+    parser.add_argument('--format', choices=['csv', 'parquet'], default=None,
+                        help="Output format, inferred from the file name when omitted")
+    parser.add_argument('--include-month', action='store_true', help="Add a month column")
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS, help="Rows per generated chunk")
+    args = parser.parse_args()
+
+    fmt = args.format or ('parquet' if args.output.endswith('.parquet') else 'csv')
+    share = placeholder_share(sorted(glob.glob(args.raw))) if args.raw else 0.0
+    distribution = MyCallDistribution.fit(read_validation_records(args.source), share)
+    print(f"📊 Fitted {len(distribution.combos):,} category combinations, {len(distribution.cell_cdf):,} "
+          f"coordinate cells, {share:.1%} placeholder rows")
+
+    rate = write_dataset(distribution, args.output, args.rows, args.seed, fmt, args.include_month, args.chunk_rows)
+    size_mb = os.path.getsize(args.output) / 1e6
+    print(f"✅ {args.rows:,} rows written to '{args.output}' ({size_mb:,.1f} MB, {rate:,.0f} rows/sec)")
@@ -0,0 +1,52 @@
+"""
+The ingest store holds the same rows as the training script's original cleaning
+"""
+
+import glob
+import os
+
+import pytest
+
+pd = pytest.importorskip('pandas')
+pytest.importorskip('pyarrow')
+
+from ingest import IngestStore
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'data')
+HEADER = '"operator","inout_travelling","network_type","rating","calldrop_category","latitude","longitude","state_name"\n'
+
+
+def baseline_clean(paths):
+    """Load, drop_duplicates and filter exactly as the original script.py did"""
+    frames = []
+    for path in paths:
+        df = pd.read_csv(path)
+        df['month'] = os.path.basename(path).split('_')[0]
+        frames.append(df)
+    df = pd.concat(frames, ignore_index=True).drop_duplicates()
+    df = df[(df['latitude'] > 0) | (df['state_name'].notna())]
+    return df.dropna(subset=['state_name'])
+
+
+def test_nearby_calls_are_not_duplicates(tmp_path):
+    # These coordinates are equal once narrowed to float32
+    source = tmp_path / 'March_MyCall_2023.csv'
+    source.write_text(HEADER
+                      + '"Airtel","Indoor","4G","3","Satisfactory","13.0093419","77.4477873","Karnataka"\n'
+                      + '"Airtel","Indoor","4G","3","Satisfactory","13.0093420","77.4477873","Karnataka"\n'
+                      + '"Airtel","Indoor","4G","3","Satisfactory","13.0093420","77.4477873","Karnataka"\n')
+    store = IngestStore(str(tmp_path / 'store'))
+    store.ingest([str(source)])
+    assert len(store.load()) == 2
+
+
+@pytest.mark.skipif(not glob.glob(os.path.join(DATA_DIR, '*_MyCall_2023.csv')), reason="monthly exports not present")
+def test_store_matches_baseline_cleaning(tmp_path):
+    paths = sorted(glob.glob(os.path.join(DATA_DIR, '*_MyCall_2023.csv')))
+    store = IngestStore(str(tmp_path / 'store'))
+    store.ingest(paths)
+    assert len(store.load()) == len(baseline_clean(paths))
+
+    # Ingesting again is a no-op
+    assert all(entry['skipped'] for entry in store.ingest(paths).values())
+    assert len(store.load()) == len(baseline_clean(paths))
@@ -0,0 +1,111 @@
+"""
+Parity of the flat-array tree engine with sklearn's own predict
+"""
+
+import numpy as np
+import pytest
+
+pytest.importorskip('sklearn')
+
+from sklearn.ensemble import GradientBoostingRegressor, RandomForestRegressor
+from sklearn.linear_model import LinearRegression
+
+from feature_encoder import FeatureEncoder, feature_columns_for
+from hist_gbm import CategoricalHistGradientBoosting
+from tree_engine import TreeEnsemble, check_parity, compile_model
+
+TOLERANCE = 1e-9
+TOP_STATES = ['Karnataka', 'Maharashtra', 'Delhi', 'Tamil Nadu']
+
+
+@pytest.fixture(scope='module')
+def encoder():
+    return FeatureEncoder(feature_columns_for(TOP_STATES))
+
+
+@pytest.fixture(scope='module')
+def training_data(encoder):
+    """Encoded random inputs with a rating driven by both categorical and numeric columns"""
+    X = encoder.sample_rows(800, seed=1)
+    rng = np.random.default_rng(1)
+    weights = rng.normal(0, 0.6, size=X.shape[1])
+    # Scale columns to at most 1, so coordinates and month do not drown out the one-hot columns
+    y = 3.0 + (X / np.abs(X).max(axis=0).clip(1)) @ weights + rng.normal(0, 0.2, size=len(X))
+    return X, np.clip(y, 1.0, 5.0)
+
+
+@pytest.fixture(scope='module')
+def test_rows(encoder):
+    return encoder.sample_rows(2000, seed=7)
+
+
+def assert_parity(model, X):
+    engine = TreeEnsemble.from_model(model)
+    np.testing.assert_allclose(engine.predict(X), model.predict(X), rtol=0, atol=TOLERANCE)
+    assert check_parity(model, engine, X) <= TOLERANCE
+
+
+def test_gradient_boosting_parity(training_data, test_rows):
+    model = GradientBoostingRegressor(n_estimators=60, max_depth=4, random_state=0).fit(*training_data)
+    # The default init estimator predicts the training mean, which the engine carries as its base
+    engine = TreeEnsemble.from_model(model)
+    assert engine.base == pytest.approx(float(np.ravel(model.init_.constant_)[0]))
+    assert engine.base != 0.0
+    assert_parity(model, test_rows)
+
+
+def test_gradient_boosting_zero_init_parity(training_data, test_rows):
+    model = GradientBoostingRegressor(n_estimators=40, max_depth=3, init='zero', random_state=0)
+    model.fit(*training_data)
+    assert TreeEnsemble.from_model(model).base == 0.0
+    assert_parity(model, test_rows)
+
+
+def test_random_forest_parity(training_data, test_rows):
+    model = RandomForestRegressor(n_estimators=25, max_depth=8, random_state=0).fit(*training_data)
+    assert_parity(model, test_rows)
+
+    engine = TreeEnsemble.from_model(model)
+    assert engine.is_averaging
+    predictions, spread = engine.predict_with_spread(test_rows)
+    np.testing.assert_allclose(predictions, model.predict(test_rows), rtol=0, atol=TOLERANCE)
+    per_tree = np.stack([tree.predict(test_rows) for tree in model.estimators_], axis=1)
+    np.testing.assert_allclose(spread, per_tree.std(axis=1), rtol=0, atol=TOLERANCE)
+
+
+def test_hist_gradient_boosting_parity(encoder, training_data, test_rows):
+    model = CategoricalHistGradientBoosting(feature_columns=encoder.feature_columns, max_iter=60,
+                                            min_samples_leaf=10, early_stopping=False, random_state=0)
+    model.fit(*training_data)
+
+    # The export has to cover native categorical splits, not only numeric ones
+    categorical_splits = 0
+    for predictors in model.model_._predictors:
+        nodes = predictors[0].nodes
+        categorical_splits += int(np.sum(nodes['is_categorical'].astype(bool) & ~nodes['is_leaf'].astype(bool)))
+    assert categorical_splits > 0
+    assert TreeEnsemble.from_model(model).base == pytest.approx(float(np.ravel(model.model_._baseline_prediction)[0]))
+    assert_parity(model, test_rows)
+
+
+def test_hist_gradient_boosting_rows_without_a_category(encoder, training_data):
+    model = CategoricalHistGradientBoosting(feature_columns=encoder.feature_columns, max_iter=30,
+                                            min_samples_leaf=10, early_stopping=False, random_state=0)
+    model.fit(*training_data)
+    # A state outside the top states leaves its whole one-hot group unset
+    rows = encoder.encode_many([{'operator': 'Airtel', 'network_type': '4G', 'inout_travelling': 'Indoor',
+                                 'calldrop_category': 'Satisfactory', 'latitude': 26.8, 'longitude': 80.9,
+                                 'state_name': 'Uttar Pradesh', 'month': 'March'}])
+    assert_parity(model, rows)
+
+
+def test_saved_engine_round_trip(tmp_path, training_data, test_rows):
+    model = GradientBoostingRegressor(n_estimators=20, max_depth=3, random_state=0).fit(*training_data)
+    path = str(tmp_path / 'engine.npz')
+    TreeEnsemble.from_model(model).save(path)
+    np.testing.assert_allclose(TreeEnsemble.load(path).predict(test_rows), model.predict(test_rows),
+                               rtol=0, atol=TOLERANCE)
+
+
+def test_unsupported_models_do_not_compile(training_data):
+    assert compile_model(LinearRegression().fit(*training_data)) is None
@@ -0,0 +1,315 @@
+"""
+Parallel model selection for the call quality models
+Runs hyperparameter search and cross-validation folds across cores with early pruning
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import pickle
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+from sklearn.ensemble import GradientBoostingRegressor, RandomForestRegressor
+from sklearn.linear_model import LinearRegression
+from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+from sklearn.model_selection import KFold, ParameterGrid
+
+from hist_gbm import CategoricalHistGradientBoosting
+
+# Model families and the parameters every candidate of that family shares
+ESTIMATORS = {
+    'Random Forest': (RandomForestRegressor, {'random_state': 42, 'n_jobs': 1}),
+    'Gradient Boosting': (GradientBoostingRegressor, {'random_state': 42}),
+    'Linear Regression': (LinearRegression, {}),
+    'Hist Gradient Boosting': (CategoricalHistGradientBoosting, {'random_state': 42}),
+}
+
+# Families that need the feature column names to find the one-hot groups
+NEEDS_FEATURE_COLUMNS = {'Hist Gradient Boosting'}
+
+# Default search space; each grid includes the original untuned configuration
+DEFAULT_SEARCH = {
+    'Random Forest': {'n_estimators': [100], 'max_depth': [None, 12], 'min_samples_leaf': [1, 5]},
+    'Gradient Boosting': {'n_estimators': [100, 200], 'learning_rate': [0.1, 0.05], 'max_depth': [3]},
+    'Linear Regression': {},
+    'Hist Gradient Boosting': {'learning_rate': [0.1, 0.05], 'max_leaf_nodes': [31, 63], 'max_iter': [200]},
+}
+
+# Single-row predictions timed per finalist
+LATENCY_REPEATS = 50
+
+
+def make_estimator(family: str, params: dict, feature_columns: Optional[List[str]] = None):
+    estimator_cls, base_params = ESTIMATORS[family]
+    if family in NEEDS_FEATURE_COLUMNS:
+        base_params = dict(base_params, feature_columns=feature_columns)
+    return estimator_cls(**base_params, **params)
+
+
+class TrainingCache:
+    """On-disk cache of encoded matrices and fold splits
+
+    Arrays are keyed by a hash of their contents and saved as .npy, so
+    workers memory-map them instead of receiving a pickled copy, and a rerun
+    on the same data skips re-encoding and re-splitting.
+    """
+
+    def __init__(self, path: str = 'train_cache'):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def put_arrays(self, X: np.ndarray, y: np.ndarray) -> str:
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        y = np.ascontiguousarray(y, dtype=np.float64)
+        digest = hashlib.sha256()
+        digest.update(str(X.shape).encode())
+        digest.update(X.tobytes())
+        digest.update(y.tobytes())
+        key = digest.hexdigest()[:16]
+        for name, array in (('X', X), ('y', y)):
+            path = self._path(f'{name}_{key}.npy')
+            if not os.path.exists(path):
+                np.save(path + '.tmp.npy', array)
+                os.replace(path + '.tmp.npy', path)
+        return key
+
+    def arrays(self, key: str):
+        return (np.load(self._path(f'X_{key}.npy'), mmap_mode='r'),
+                np.load(self._path(f'y_{key}.npy'), mmap_mode='r'))
+
+    def folds(self, key: str, n_splits: int) -> List[tuple]:
+        """KFold splits for the cached arrays, the same splits cross_val_score(cv=n) uses"""
+        path = self._path(f'folds_{key}_k{n_splits}.npz')
+        if not os.path.exists(path):
+            _, y = self.arrays(key)
+            splits = list(KFold(n_splits=n_splits).split(np.zeros(len(y))))
+            np.savez(path + '.tmp.npz', **{f'{part}_{i}': idx for i, split in enumerate(splits)
+                                          for part, idx in zip(('train', 'val'), split)})
+            os.replace(path + '.tmp.npz', path)
+        with np.load(path) as data:
+            return [(data[f'train_{i}'], data[f'val_{i}']) for i in range(n_splits)]
+
+
+def _fit_fold(cache_path: str, key: str, family: str, params: dict, feature_columns,
+              train_idx: np.ndarray, val_idx: np.ndarray) -> tuple:
+    """Worker task: fit one candidate on one fold, return (r2, seconds)"""
+    started = time.perf_counter()
+    X, y = TrainingCache(cache_path).arrays(key)
+    model = make_estimator(family, params, feature_columns)
+    model.fit(X[train_idx], y[train_idx])
+    score = r2_score(y[val_idx], model.predict(X[val_idx]))
+    return score, time.perf_counter() - started
+
+
+def _fit_final(cache_path: str, key: str, family: str, params: dict, feature_columns,
+               X_test: np.ndarray, y_test: np.ndarray) -> tuple:
+    """Worker task: fit one candidate on the full training set, score and time it"""
+    started = time.perf_counter()
+    X, y = TrainingCache(cache_path).arrays(key)
+    model = make_estimator(family, params, feature_columns)
+    model.fit(X, y)
+    fit_seconds = time.perf_counter() - started
+
+    y_pred_train = model.predict(X)
+    batch_started = time.perf_counter()
+    y_pred_test = model.predict(X_test)
+    batch_seconds = time.perf_counter() - batch_started
+
+    row = X_test[:1]
+    latencies = []
+    for _ in range(LATENCY_REPEATS):
+        row_started = time.perf_counter()
+        model.predict(row)
+        latencies.append(time.perf_counter() - row_started)
+
+    metrics = {
+        'Train R²': r2_score(y, y_pred_train),
+        'Test R²': r2_score(y_test, y_pred_test),
+        'Test RMSE': float(np.sqrt(mean_squared_error(y_test, y_pred_test))),
+        'Test MAE': mean_absolute_error(y_test, y_pred_test),
+        'Train Seconds': fit_seconds,
+        'Size KB': len(pickle.dumps(model)) / 1024,
+        'Latency ms': float(np.median(latencies)) * 1000,
+        'Batch µs/row': batch_seconds / max(len(X_test), 1) * 1e6,
+    }
+    return model, metrics, fit_seconds, time.perf_counter() - started
+
+
+class Candidate:
+    """One hyperparameter configuration and its fold results"""
+
+    def __init__(self, family: str, params: dict):
+        self.family = family
+        self.params = params
+        self.scores: List[float] = []
+        self.seconds = 0.0
+        self.pruned_after: Optional[int] = None
+
+    @property
+    def label(self) -> str:
+        if not self.params:
+            return self.family
+        return f"{self.family} ({', '.join(f'{k}={v}' for k, v in sorted(self.params.items()))})"
+
+    @property
+    def cv_mean(self) -> float:
+        return float(np.mean(self.scores)) if self.scores else float('-inf')
+
+
+def prune(candidates: List[Candidate], folds_done: int, eta: int) -> List[Candidate]:
+    """Successive halving within each family: keep the best 1/eta by mean CV R²"""
+    survivors = []
+    for family in dict.fromkeys(c.family for c in candidates):
+        group = sorted((c for c in candidates if c.family == family),
+                       key=lambda c: c.cv_mean, reverse=True)
+        keep = max(1, math.ceil(len(group) / eta))
+        survivors.extend(group[:keep])
+        for candidate in group[keep:]:
+            candidate.pruned_after = folds_done
+    return survivors
+
+
+def run_search(X_train, y_train, X_test, y_test, search: Optional[Dict[str, dict]] = None,
+               cv: int = 5, n_jobs: int = -1, eta: int = 2, cache_dir: str = 'train_cache',
+               feature_columns: Optional[List[str]] = None, verbose: bool = True) -> dict:
+    """Cross-validate every candidate, prune as folds complete, refit each family's best
+
+    Returns the leaderboard DataFrame (one row per candidate), a per-family
+    results DataFrame in the shape script (1).py reports, and the refitted
+    models keyed by family.
+    """
+    search = DEFAULT_SEARCH if search is None else search
+    if feature_columns is None:
+        # Without column names the categorical families cannot find their groups
+        search = {family: grid for family, grid in search.items() if family not in NEEDS_FEATURE_COLUMNS}
+    started = time.perf_counter()
+
+    cache = TrainingCache(cache_dir)
+    key = cache.put_arrays(np.asarray(X_train), np.asarray(y_train))
+    folds = cache.folds(key, cv)
+    X_test = np.asarray(X_test, dtype=np.float32)
+    y_test = np.asarray(y_test, dtype=np.float64)
+
+    candidates = [Candidate(family, params) for family, grid in search.items()
+                  for params in ParameterGrid(grid)]
+    alive = list(candidates)
+
+    with Parallel(n_jobs=n_jobs) as parallel:
+        # One fold per rung while there is something to prune, then the rest at once
+        fold = 0
+        while fold < cv:
+            contested = len(alive) > len({c.family for c in alive})
+            rung = [fold] if contested else list(range(fold, cv))
+            results = parallel(delayed(_fit_fold)(cache_dir, key, c.family, c.params, feature_columns, *folds[f])
+                               for c in alive for f in rung)
+            for i, (score, seconds) in enumerate(results):
+                candidate = alive[i // len(rung)]
+                candidate.scores.append(score)
+                candidate.seconds += seconds
+            fold += len(rung)
+            if fold < cv:
+                alive = prune(alive, fold, eta)
+            if verbose:
+                print(f"   Folds {fold}/{cv}: {len(alive)} candidate(s) still in the running")
+
+        finals = parallel(delayed(_fit_final)(cache_dir, key, c.family, c.params, feature_columns,
+                                              X_test, y_test)
+                          for c in alive)
+
+    rows = []
+    results = {}
+    models = {}
+    for candidate in candidates:
+        row = {
+            'Model': candidate.label,
+            'Family': candidate.family,
+            'CV R² Mean': candidate.cv_mean,
+            'CV R² Std': float(np.std(candidate.scores)),
+            'Folds': len(candidate.scores),
+            'Status': (f'pruned after fold {candidate.pruned_after}'
+                       if candidate.pruned_after is not None else 'finalist'),
+            'Fit Seconds': candidate.seconds,
+        }
+        if candidate in alive:
+            model, metrics, _, seconds = finals[alive.index(candidate)]
+            row.update(metrics)
+            row['Fit Seconds'] += seconds
+            models[candidate.family] = model
+            results[candidate.family] = {**metrics, 'CV R² Mean': row['CV R² Mean'],
+                                         'CV R² Std': row['CV R² Std'],
+                                         'Params': candidate.params, 'Fit Seconds': row['Fit Seconds']}
+        rows.append(row)
+
+    leaderboard = (pd.DataFrame(rows)
+                   .sort_values(['Folds', 'CV R² Mean'], ascending=False)
+                   .reset_index(drop=True))
+    return {
+        'leaderboard': leaderboard,
+        'results': pd.DataFrame(results).T,
+        'models': models,
+        'wall_seconds': time.perf_counter() - started,
+    }
+
+
+def print_leaderboard(search_result: dict):
+    leaderboard = search_result['leaderboard']
+    columns = ['Model', 'Status', 'CV R² Mean', 'CV R² Std', 'Test R²', 'Test RMSE',
+               'Train Seconds', 'Size KB', 'Latency ms', 'Fit Seconds']
+    print(f"\n🏁 MODEL SEARCH LEADERBOARD ({len(leaderboard)} candidates, "
+          f"{search_result['wall_seconds']:.1f}s wall):")
+    print(leaderboard.reindex(columns=columns).round(4).to_string(index=False))
+
+
+if __name__ == "__main__":
+    from sklearn.model_selection import train_test_split
+
+    from feature_encoder import (
+        GEO_AGGREGATE_COLUMNS, TRAINING_CATEGORY_DEFAULTS, FeatureEncoder, feature_columns_for
+    )
+    from geo_aggregates import out_of_fold_features
+    from ingest import IngestStore
+
+    parser = argparse.ArgumentParser(description="Parallel model search over the ingested MyCall data")
+    parser.add_argument('--store', default='mycall_store', help="Ingest store directory")
+    parser.add_argument('--search', help="JSON file mapping model family to a parameter grid")
+    parser.add_argument('--cv', type=int, default=5, help="Cross-validation folds")
+    parser.add_argument('--jobs', type=int, default=-1, help="Parallel workers (-1 = all cores)")
+    parser.add_argument('--eta', type=int, default=2, help="Keep 1/eta of each family per pruning rung")
+    parser.add_argument('--cache-dir', default='train_cache', help="Matrix and fold cache directory")
+    parser.add_argument('--report', default='training_leaderboard.csv', help="Leaderboard CSV path")
+    parser.add_argument('--geo-features', action='store_true',
+                        help="Add the geo aggregate features (the served model then cannot use PREDICTION_TABLE)")
+    args = parser.parse_args()
+
+    search = None
+    if args.search:
+        with open(args.search) as f:
+            search = json.load(f)
+        unknown = set(search) - set(ESTIMATORS)
+        if unknown:
+            raise SystemExit(f"Unknown model families: {', '.join(sorted(unknown))}")
+
+    df = IngestStore(args.store).load()
+    state_counts = df['state_name'].value_counts()
+    feature_columns = feature_columns_for(state_counts[state_counts > 0].head(10).index,
+                                          geo_aggregates=args.geo_features)
+    X = FeatureEncoder(feature_columns, category_defaults=TRAINING_CATEGORY_DEFAULTS).encode_frame(df)
+    if args.geo_features:
+        X[:, [feature_columns.index(col) for col in GEO_AGGREGATE_COLUMNS]] = out_of_fold_features(df)
+    y = df['rating'].to_numpy()
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
+
+    result = run_search(X_train, y_train, X_test, y_test, search, args.cv, args.jobs, args.eta,
+                        args.cache_dir, feature_columns)
+    print_leaderboard(result)
+    result['leaderboard'].to_csv(args.report, index=False)
+    print(f"✅ Leaderboard saved as '{args.report}'")
@@ -0,0 +1,196 @@
+"""
+Flat array-based inference engine for tree ensembles
+Exports fitted sklearn trees to contiguous NumPy arrays and evaluates them in batch
+"""
+
+from typing import Optional
+
+import numpy as np
+
+# Rows traversed per chunk, bounds the (rows x trees) node index matrix
+PREDICT_CHUNK_ROWS = 4096
+
+
+def _tree_list(model) -> tuple:
+    """Return (trees, scale, base) describing how the ensemble combines its trees"""
+    name = type(model).__name__
+    if name == 'GradientBoostingRegressor':
+        init = model.init_
+        if isinstance(init, str) and init == 'zero':
+            base = 0.0
+        elif hasattr(init, 'constant_'):
+            base = float(np.ravel(init.constant_)[0])
+        else:
+            raise ValueError(f"Unsupported GradientBoosting init estimator: {type(init).__name__}")
+        trees = [est.tree_ for est in model.estimators_[:, 0]]
+        return trees, float(model.learning_rate), base
+    if name in ('RandomForestRegressor', 'ExtraTreesRegressor'):
+        trees = [est.tree_ for est in model.estimators_]
+        return trees, 1.0 / len(trees), 0.0
+    if name in ('DecisionTreeRegressor', 'ExtraTreeRegressor'):
+        return [model.tree_], 1.0, 0.0
+    raise ValueError(f"Unsupported model type: {name}")
+
+
+def export_tree_ensemble(model) -> dict:
+    """Flatten a fitted tree ensemble into contiguous arrays
+
+    Nodes of all trees are concatenated; child pointers are global node
+    indices and -1 marks a leaf. A prediction is
+    ``base + scale * sum(value[leaf] for each tree)``.
+    """
+    if type(model).__name__ == 'CategoricalHistGradientBoosting':
+        # Its categorical splits are expanded into one-hot threshold chains by the model
+        return model.export_tree_ensemble()
+
+    trees, scale, base = _tree_list(model)
+
+    sizes = np.array([tree.node_count for tree in trees], dtype=np.int64)
+    roots = np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype(np.int32)
+
+    feature = np.concatenate([tree.feature for tree in trees]).astype(np.int32)
+    threshold = np.concatenate([tree.threshold for tree in trees]).astype(np.float64)
+    value = np.concatenate([tree.value[:, 0, 0] for tree in trees]).astype(np.float64)
+    left = np.concatenate([np.where(tree.children_left >= 0, tree.children_left + offset, -1)
+                           for tree, offset in zip(trees, roots)]).astype(np.int32)
+    right = np.concatenate([np.where(tree.children_right >= 0, tree.children_right + offset, -1)
+                            for tree, offset in zip(trees, roots)]).astype(np.int32)
+
+    # Leaves never read a feature; point them at column 0 so gathers stay in range
+    feature[left < 0] = 0
+
+    return {
+        'feature': feature,
+        'threshold': threshold,
+        'left': left,
+        'right': right,
+        'value': value,
+        'roots': roots,
+        'max_depth': np.int32(max(tree.max_depth for tree in trees)),
+        'scale': np.float64(scale),
+        'base': np.float64(base),
+        'n_features': np.int32(model.n_features_in_),
+    }
+
+
+class TreeEnsemble:
+    """Pure-NumPy evaluator for an exported tree ensemble
+
+    All trees advance one level per step for the whole batch, so a predict
+    costs max_depth vectorized gathers instead of per-tree Python dispatch.
+    """
+
+    def __init__(self, feature, threshold, left, right, value, roots,
+                 max_depth, scale, base, n_features):
+        self.feature = np.ascontiguousarray(feature, dtype=np.int32)
+        self.threshold = np.ascontiguousarray(threshold, dtype=np.float64)
+        self.left = np.ascontiguousarray(left, dtype=np.int32)
+        self.right = np.ascontiguousarray(right, dtype=np.int32)
+        self.value = np.ascontiguousarray(value, dtype=np.float64)
+        self.roots = np.ascontiguousarray(roots, dtype=np.int32)
+        self.max_depth = int(max_depth)
+        self.scale = float(scale)
+        self.base = float(base)
+        self.n_features = int(n_features)
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    @classmethod
+    def from_model(cls, model) -> 'TreeEnsemble':
+        return cls(**export_tree_ensemble(model))
+
+    @classmethod
+    def load(cls, path: str) -> 'TreeEnsemble':
+        with np.load(path) as arrays:
+            return cls(**{name: arrays[name] for name in arrays.files})
+
+    def save(self, path: str):
+        np.savez(path, **self.arrays())
+
+    def arrays(self) -> dict:
+        return {
+            'feature': self.feature,
+            'threshold': self.threshold,
+            'left': self.left,
+            'right': self.right,
+            'value': self.value,
+            'roots': self.roots,
+            'max_depth': np.int32(self.max_depth),
+            'scale': np.float64(self.scale),
+            'base': np.float64(self.base),
+            'n_features': np.int32(self.n_features),
+        }
+
+    def predict(self, X) -> np.ndarray:
+        """Predict for a (n_rows, n_features) matrix"""
+        # sklearn trees compare float32 inputs against float64 thresholds
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"Expected input with {self.n_features} features, got shape {X.shape}")
+
+        if len(X) <= PREDICT_CHUNK_ROWS:
+            return self._predict_chunk(X)
+        return np.concatenate([self._predict_chunk(X[start:start + PREDICT_CHUNK_ROWS])
+                               for start in range(0, len(X), PREDICT_CHUNK_ROWS)])
+
+    @property
+    def is_averaging(self) -> bool:
+        """True for bagged ensembles (random forests), where each tree is a full prediction"""
+        return self.n_trees > 1 and self.base == 0.0 and abs(self.scale * self.n_trees - 1.0) < 1e-9
+
+    def predict_with_spread(self, X) -> tuple:
+        """Predictions and the standard deviation across per-tree predictions
+
+        Both come from the same leaf gather, so the spread costs one extra
+        reduction over the (rows x trees) leaf values. The spread is only
+        meaningful for averaging ensembles.
+        """
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features:
+            raise ValueError(f"Expected input with {self.n_features} features, got shape {X.shape}")
+
+        predictions = np.empty(len(X))
+        spread = np.empty(len(X))
+        for start in range(0, len(X), PREDICT_CHUNK_ROWS):
+            values = self.value[self._leaves(X[start:start + PREDICT_CHUNK_ROWS])]
+            stop = start + len(values)
+            predictions[start:stop] = self.base + self.scale * values.sum(axis=1)
+            spread[start:stop] = values.std(axis=1)
+        return predictions, spread
+
+    def leaf_values(self, X) -> np.ndarray:
+        """Per-tree leaf values for each row, shape (n_rows, n_trees)"""
+        X = np.asarray(X, dtype=np.float32)
+        return self.value[self._leaves(X)]
+
+    def _leaves(self, X: np.ndarray) -> np.ndarray:
+        n_rows = len(X)
+        rows = np.arange(n_rows)[:, None]
+        node = np.repeat(self.roots[None, :], n_rows, axis=0)
+        for _ in range(self.max_depth):
+            left = self.left[node]
+            is_split = left >= 0
+            if not is_split.any():
+                break
+            go_left = X[rows, self.feature[node]] <= self.threshold[node]
+            node = np.where(is_split, np.where(go_left, left, self.right[node]), node)
+        return node
+
+    def _predict_chunk(self, X: np.ndarray) -> np.ndarray:
+        return self.base + self.scale * self.value[self._leaves(X)].sum(axis=1)
+
+
+def compile_model(model) -> Optional[TreeEnsemble]:
+    """Compile a model to a TreeEnsemble, or None if it is not a supported tree model"""
+    try:
+        return TreeEnsemble.from_model(model)
+    except (ValueError, AttributeError):
+        return None
+
+
+def check_parity(model, engine: TreeEnsemble, X) -> float:
+    """Max absolute difference between the engine and model.predict on X"""
+    X = np.asarray(X, dtype=np.float32)
+    return float(np.max(np.abs(engine.predict(X) - model.predict(X)))) if len(X) else 0.0